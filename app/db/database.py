@@ -0,0 +1,106 @@
+import os
+from typing import Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+def async_database_url(url: str) -> str:
+    """
+    Map plain DATABASE_URL schemes onto their async drivers.
+    """
+    if url.startswith("postgresql://") or url.startswith("postgres://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url.split("://", 1)[1]
+    return url
+
+
+def _serialize_sqlite_writers(engine: AsyncEngine) -> None:
+    # SQLite has a single writer. Taking the write lock at BEGIN makes
+    # concurrent transactions queue on busy_timeout instead of failing
+    # with "database is locked" when a reader tries to upgrade.
+    @event.listens_for(engine.sync_engine, "connect")
+    def on_connect(dbapi_connection, _):
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        # WAL stays consistent without an fsync on every commit
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA busy_timeout=30000")
+        cursor.close()
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def on_begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def create_engine(url: str, echo: bool = False) -> AsyncEngine:
+    url = async_database_url(url)
+    if url.startswith("sqlite"):
+        if ":memory:" in url or url.endswith("://"):
+            # Every session must share the one in-memory database
+            engine = create_async_engine(url, echo=echo, poolclass=StaticPool)
+        else:
+            # aiosqlite defaults to NullPool. SQLite has one writer anyway,
+            # and waiting on the pool is cheaper than the busy handler's
+            # sleep-and-retry
+            engine = create_async_engine(
+                url, echo=echo, poolclass=AsyncAdaptedQueuePool, pool_size=1, max_overflow=0
+            )
+        _serialize_sqlite_writers(engine)
+        return engine
+
+    return create_async_engine(
+        url,
+        echo=echo,
+        pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        pool_timeout=float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30")),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800")),
+        # Drop connections the server closed while they sat idle in the pool
+        pool_pre_ping=True,
+    )
+
+
+def create_engine_from_env() -> Optional[AsyncEngine]:
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        return None
+    return create_engine(url, echo=os.getenv("DB_ECHO", "false").lower() == "true")
+
+
+def create_session_factory(engine: AsyncEngine) -> async_sessionmaker:
+    # Records are converted to schemas before the session closes
+    return async_sessionmaker(engine, expire_on_commit=False)
+
+
+async def create_tables(engine: AsyncEngine) -> None:
+    # Registers the mapped tables on Base.metadata
+    import app.db.models  # noqa: F401
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_upgrade_tables)
+
+
+def _upgrade_tables(conn) -> None:
+    # create_all skips tables that already exist. Add the nullable columns
+    # and the indexes introduced since, so older databases pick them up
+    # without a migration tool
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
@@ -0,0 +1,83 @@
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import JSON, DateTime, Float, ForeignKey, Index, Integer, String, Text, text
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from app.db.database import Base
+
+# Partial indexes only cover bets that can still be joined
+_JOINABLE = text("status IN ('PENDING', 'ACTIVE')")
+
+
+class BetRecord(Base):
+    __tablename__ = "bets"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    match_id: Mapped[str] = mapped_column(String(64), index=True)
+    stake_amount: Mapped[float] = mapped_column(Float)
+    conditions: Mapped[list] = mapped_column(JSON)
+    condition_logic: Mapped[str] = mapped_column(String(8), default="AND")
+    status: Mapped[str] = mapped_column(String(16), default="PENDING")
+    created_by: Mapped[int] = mapped_column(Integer)
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+    time_limit_minutes: Mapped[int] = mapped_column(Integer)
+    # created_at + time_limit_minutes, stored so expiry is an index range scan
+    expires_at: Mapped[datetime] = mapped_column(DateTime)
+    min_kd_ratio: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    required_game_mode: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    required_map: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    max_participants: Mapped[int] = mapped_column(Integer, default=2)
+    participant_count: Mapped[int] = mapped_column(Integer, default=1)
+    escrow_address: Mapped[str] = mapped_column(String(64))
+    escrow_seed: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)
+    # Verification job that moved the bet to SETTLING
+    settlement_job: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    winner_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+
+    participants: Mapped[List["BetParticipantRecord"]] = relationship(
+        back_populates="bet",
+        lazy="selectin",
+        order_by="BetParticipantRecord.joined_at",
+    )
+
+    __table_args__ = (
+        # GET /bets/active: equality filters first, then the stake range/order
+        Index("ix_bets_active_stake", "stake_amount", "id",
+              postgresql_where=_JOINABLE, sqlite_where=_JOINABLE),
+        Index("ix_bets_active_mode_stake", "required_game_mode", "stake_amount", "id",
+              postgresql_where=_JOINABLE, sqlite_where=_JOINABLE),
+        Index("ix_bets_active_map_stake", "required_map", "stake_amount", "id",
+              postgresql_where=_JOINABLE, sqlite_where=_JOINABLE),
+        Index("ix_bets_active_expiry", "expires_at",
+              postgresql_where=_JOINABLE, sqlite_where=_JOINABLE),
+    )
+
+
+class BetParticipantRecord(Base):
+    __tablename__ = "bet_participants"
+
+    # One row per user per bet, so a double join is a key violation
+    bet_id: Mapped[int] = mapped_column(ForeignKey("bets.id", ondelete="CASCADE"), primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    joined_at: Mapped[datetime] = mapped_column(DateTime)
+
+    bet: Mapped[BetRecord] = relationship(back_populates="participants")
+
+
+class VerificationRecord(Base):
+    __tablename__ = "bet_verifications"
+
+    # Verification queue job id
+    id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    bet_id: Mapped[int] = mapped_column(ForeignKey("bets.id", ondelete="CASCADE"), index=True)
+    verified_by: Mapped[int] = mapped_column(Integer)
+    status: Mapped[str] = mapped_column(String(16))
+    match_stats: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    # Screenshot digest, set only on the verification counted in player
+    # stats; a unique index, so each screenshot counts once across workers
+    stats_digest: Mapped[Optional[str]] = mapped_column(String(64), nullable=True, unique=True, index=True)
+    # Player stats sync reads new rows by creation time
+    created_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime)
@@ -1,7 +1,23 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from app.services.screenshot_upload import UploadSizeLimitMiddleware
+from app.services.metrics import registry
+from app.services.rate_limit import RateLimitMiddleware
+from app.services.request_context import RequestContextMiddleware, configure_logging
+from app.routers import bet, feed
 
-app = FastAPI(title="COD P2P Betting Platform")
+# JSON log lines tagged with the request id
+configure_logging()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The feed starts first so startup work can publish events, and stops last
+    async with feed.lifespan(app), bet.lifespan(app):
+        yield
+
+app = FastAPI(title="COD P2P Betting Platform", lifespan=lifespan)
 
 # CORS settings
 app.add_middleware(
@@ -12,6 +28,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reject oversized screenshot uploads before they are spooled
+app.add_middleware(UploadSizeLimitMiddleware)
+
+# Per-user upload rate, checked before the size limit and any body read
+app.add_middleware(RateLimitMiddleware, limiter=bet.verify_rate_limiter)
+
+# Outermost: request ids and latency cover everything below
+app.add_middleware(RequestContextMiddleware)
+
+# Real-time bet events (WebSocket and SSE)
+app.include_router(feed.router, prefix="/bets/feed", tags=["feed"])
+app.include_router(bet.router, prefix="/bets", tags=["bets"])
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 def root():
     return {"message": "COD P2P Betting Platform running."} 
\ No newline at end of file
@@ -1,17 +1,122 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Header, Query, Response
+from pydantic import ValidationError
 from typing import List, Optional
 from datetime import datetime, timedelta
 from app.schemas.bet_schemas import (
-    BetCreate, BetOut, BetVerification, BetJoinRequest,
-    BetType, BetCondition
+    BetCreate, BetOut, BetVerification, BetJoinRequest, BetStatus,
+    BetType, BetCondition, VerificationJobOut, VerificationJobStatus
 )
-from app.services.llm_ocr_service import LLMOCRService
-from app.services.solana_service import SolanaService
+from app.services.ocr_batcher import OCRRequestCoalescer
+from app.services.service_container import ServiceContainer
+from app.services.screenshot_upload import read_screenshot
+from app.services.verification_queue import VerificationQueue, VerificationRejected
+from app.services.condition_engine import ConditionEngine, compile_conditions
+from app.services.bet_index import JOINABLE_STATUSES, ActiveBetIndex
+from app.services.response_cache import ActiveBetsResponseCache, etag_matches
+from app.services.bet_repository import BetRepository, BetJoinRejected
+from app.services.join_reservations import JoinReservations
+from app.services.bet_events import BetEventType
+from app.services.expiry_scheduler import ExpiryScheduler
+from app.services.rate_limit import UserRateLimiter
+from app.services.fingerprint_index import ScreenshotReuseDetector
+from app.services.player_stats import PlayerStatsStore
+from app.services.metrics import STAGE_SECONDS, registry
+from app.routers.feed import bet_feed
+import asyncio
+import itertools
 import json
+import logging
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
-llm_service = LLMOCRService()
-solana_service = SolanaService()
+# OpenAI and Solana clients; warmed on startup and closed on shutdown
+services = ServiceContainer.from_env()
+llm_service = services.llm_service
+solana_service = services.solana_service
+ocr_coalescer = OCRRequestCoalescer.from_env(llm_service)
+condition_engine = ConditionEngine()
+active_bets = ActiveBetIndex()
+# Encoded /active pages, dropped whenever the index changes
+active_bets_cache = ActiveBetsResponseCache.from_env(active_bets)
+# Postgres/SQLite when DATABASE_URL is set, otherwise in-memory only
+bet_repository = BetRepository.from_env()
+bet_id_sequence = itertools.count(1)  # Used when there is no database
+join_reservations = JoinReservations.from_env()
+# Per-user upload rate on /verify, applied by RateLimitMiddleware before the
+# body is read; shared across workers with the redis backend
+verify_rate_limiter = UserRateLimiter.from_env("verify")
+# Perceptual index of past uploads; None unless FINGERPRINT_INDEX_DIR is set
+reuse_detector = ScreenshotReuseDetector.from_env()
+if reuse_detector is None:
+    logger.warning("FINGERPRINT_INDEX_DIR is not set; verified matches won't count toward player stats")
+# K/D per player from validated match stats; rebuilt from the DB on startup
+player_stats = PlayerStatsStore.from_env(bet_repository.iter_match_stats if bet_repository else None)
+
+# Component counters scraped by GET /metrics
+registry.register_collector("services", services.stats)
+registry.register_collector("ocr_cache", llm_service.cache.stats)
+registry.register_collector("ocr_batcher", ocr_coalescer.stats)
+registry.register_collector("solana_rpc", solana_service.client.stats)
+registry.register_collector("solana_cache", solana_service.cache.stats)
+registry.register_collector("join_reservations", join_reservations.stats)
+registry.register_collector("active_bets_cache", active_bets_cache.stats)
+registry.register_collector("vision_limiter", llm_service.limiter.stats)
+registry.register_collector("verify_rate_limit", verify_rate_limiter.stats)
+registry.register_collector("player_stats", player_stats.stats)
+if llm_service.local_ocr:
+    registry.register_collector("local_ocr", llm_service.local_ocr.stats)
+if solana_service.settlements:
+    registry.register_collector("settlement", solana_service.settlements.stats)
+if reuse_detector:
+    registry.register_collector("screenshot_reuse", reuse_detector.stats)
+
+async def refund_cancelled_bets(bets: List[BetOut]):
+    # Concurrent refunds share cancel_bets transactions on chain
+    refunded = await asyncio.gather(*(
+        solana_service.refund_bet(bet.escrow_address, str(bet.created_by), bet.escrow_seed)
+        for bet in bets
+    ))
+    for bet, success in zip(bets, refunded):
+        if not success:
+            # Already CANCELLED, so a retry would find nothing to refund
+            logger.error(
+                "Refund of expired bet failed, escrow needs a manual refund",
+                extra={"bet_id": bet.id, "escrow_address": bet.escrow_address}
+            )
+        active_bets.remove(bet.id)
+        condition_engine.unregister(bet.id)
+        await join_reservations.forget(bet.id)
+        await bet_feed.publish(
+            BetEventType.EXPIRED, bet.model_copy(update={"status": BetStatus.CANCELLED})
+        )
+
+async def expire_bets(bet_ids: List[int]):
+    """
+    Close the join window of bets past their time limit. Bets nobody joined
+    are cancelled and refunded; bets with joiners just leave the listing.
+    """
+    if bet_repository:
+        cancelled = await bet_repository.expire_bets(bet_ids)
+    else:
+        cancelled = [
+            bet for bet in map(active_bets.get, bet_ids)
+            if bet is not None and bet.status == BetStatus.PENDING
+        ]
+    await refund_cancelled_bets(cancelled)
+
+    cancelled_ids = {bet.id for bet in cancelled}
+    for bet_id in bet_ids:
+        closed_bet = None if bet_id in cancelled_ids else active_bets.remove(bet_id)
+        if closed_bet is not None:
+            await bet_feed.publish(BetEventType.EXPIRED, closed_bet)
+
+expiry_scheduler = ExpiryScheduler.from_env(expire_bets)
+registry.register_collector("expiry_scheduler", expiry_scheduler.stats)
 
 @router.post("/create", response_model=BetOut)
 async def create_bet(bet: BetCreate):
@@ -27,208 +132,548 @@ async def create_bet(bet: BetCreate):
                         detail=f"Target value for {condition.type} must be numeric"
                     )
 
-        # Create escrow account for the bet
+        # Compile once up front; also rejects bad operators and custom expressions
+        try:
+            compile_conditions(bet.conditions, bet.condition_logic)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        # Create escrow account for the bet; the seed (32 bytes, the PDA
+        # seed limit) is kept so settlement can derive its accounts. The
+        # on-chain deadline is taken before the row's created_at, so the
+        # expiry scheduler never cancels before the program allows it
+        escrow_seed = uuid.uuid4().hex
         escrow_address = await solana_service.create_escrow(
             bet_amount=bet.stake_amount,
-            creator_pubkey=str(bet.user_id)  # In reality, get from user's wallet
+            creator_pubkey=str(bet.user_id),  # In reality, get from user's wallet
+            bet_seed=escrow_seed,
+            deadline=int(time.time()) + bet.time_limit_minutes * 60
         )
         
         if not escrow_address:
             raise HTTPException(status_code=400, detail="Failed to create escrow")
         
         # Create bet record
-        bet_out = BetOut(
-            id=1,  # In reality, from DB
-            match_id=bet.match_id,
-            stake_amount=bet.stake_amount,
-            conditions=bet.conditions,
-            status="PENDING",
-            created_by=bet.user_id,
-            created_at=datetime.utcnow(),
-            time_limit_minutes=bet.time_limit_minutes,
-            min_kd_ratio=bet.min_kd_ratio,
-            required_game_mode=bet.required_game_mode,
-            required_map=bet.required_map,
-            max_participants=bet.max_participants,
-            current_participants=[bet.user_id],
-            escrow_address=escrow_address
-        )
-        
+        if bet_repository:
+            bet_out = await bet_repository.create_bet(bet, escrow_address, escrow_seed)
+        else:
+            bet_out = BetOut(
+                id=next(bet_id_sequence),
+                match_id=bet.match_id,
+                stake_amount=bet.stake_amount,
+                conditions=bet.conditions,
+                condition_logic=bet.condition_logic,
+                status="PENDING",
+                created_by=bet.user_id,
+                created_at=datetime.utcnow(),
+                time_limit_minutes=bet.time_limit_minutes,
+                min_kd_ratio=bet.min_kd_ratio,
+                required_game_mode=bet.required_game_mode,
+                required_map=bet.required_map,
+                max_participants=bet.max_participants,
+                current_participants=[bet.user_id],
+                escrow_address=escrow_address,
+                escrow_seed=escrow_seed
+            )
+
+        condition_engine.register(bet_out.id, bet_out.match_id, bet_out.conditions, bet_out.condition_logic)
+        active_bets.add(bet_out)
+        expiry_scheduler.schedule_bet(bet_out)
+        await bet_feed.publish(BetEventType.CREATED, bet_out)
+
         return bet_out
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/join")
 async def join_bet(join_request: BetJoinRequest):
     try:
-        # In reality, get bet details from DB
-        bet = {
-            "id": join_request.bet_id,
-            "stake_amount": join_request.stake_amount,
-            "escrow_address": "mock_escrow",
-            "min_kd_ratio": 1.5,
-            "current_participants": [1],
-            "max_participants": 2,
-            "time_limit_minutes": 30,
-            "created_at": datetime.utcnow() - timedelta(minutes=10)
-        }
-        
+        # Without a DB, settled and expired bets have left the index too
+        indexed_bet = (
+            await bet_repository.get_bet(join_request.bet_id) if bet_repository
+            else active_bets.get(join_request.bet_id)
+        )
+        if not indexed_bet:
+            raise HTTPException(status_code=404, detail="Bet not found")
+        bet = indexed_bet.model_dump()
+
+        if bet["status"] not in JOINABLE_STATUSES:
+            raise HTTPException(status_code=400, detail="Bet is no longer open")
+
         # Validate time limit
         time_elapsed = datetime.utcnow() - bet["created_at"]
         if time_elapsed > timedelta(minutes=bet["time_limit_minutes"]):
             raise HTTPException(status_code=400, detail="Bet time limit exceeded")
 
-        # Validate max participants
-        if len(bet["current_participants"]) >= bet["max_participants"]:
-            raise HTTPException(status_code=400, detail="Bet is full")
-
-        # Validate K/D ratio if required
-        if bet["min_kd_ratio"] and join_request.player_stats:
-            kd_ratio = join_request.player_stats.get("kd_ratio", 0)
+        # Validate K/D ratio if required, against the joiner's verified
+        # matches in the bet's mode and map (client-sent stats are ignored)
+        if bet["min_kd_ratio"]:
+            kd_ratio = player_stats.kd_ratio(
+                join_request.user_id, bet.get("required_game_mode"), bet.get("required_map")
+            )
+            if kd_ratio is None:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"At least {player_stats.min_matches} verified matches are required "
+                           f"to join a bet with a minimum K/D ratio"
+                )
             if kd_ratio < bet["min_kd_ratio"]:
                 raise HTTPException(
                     status_code=400,
-                    detail=f"K/D ratio {kd_ratio} below minimum {bet['min_kd_ratio']}"
+                    detail=f"K/D ratio {kd_ratio:.2f} below minimum {bet['min_kd_ratio']}"
                 )
-        
-        # Join the bet on Solana
-        success = await solana_service.join_bet(
-            escrow_address=bet["escrow_address"],
-            joiner_pubkey=str(join_request.user_id),
-            bet_amount=join_request.stake_amount
-        )
-        
+
+        # Reserve a participant slot before any funds move; two joiners can't
+        # both take the last one, and joins on other bets are unaffected
+        try:
+            await join_reservations.reserve(
+                join_request.bet_id,
+                join_request.user_id,
+                bet["current_participants"],
+                bet["max_participants"]
+            )
+        except BetJoinRejected as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        try:
+            # Join the bet on Solana; the slot stays held however long it takes
+            async with join_reservations.hold(join_request.bet_id, join_request.user_id):
+                success = await solana_service.join_bet(
+                    escrow_address=bet["escrow_address"],
+                    joiner_pubkey=str(join_request.user_id),
+                    bet_amount=join_request.stake_amount,
+                    bet_seed=bet.get("escrow_seed")
+                )
+        except Exception:
+            await join_reservations.release(join_request.bet_id, join_request.user_id)
+            raise
+
         if not success:
+            await join_reservations.release(join_request.bet_id, join_request.user_id)
             raise HTTPException(status_code=400, detail="Failed to join bet")
-        
+
+        try:
+            # Refused if the hold lapsed anyway (e.g. the worker stalled),
+            # since the slot may have gone to another joiner
+            if not await join_reservations.confirm(join_request.bet_id, join_request.user_id):
+                raise BetJoinRejected("Join reservation expired")
+            if bet_repository:
+                try:
+                    await bet_repository.join_bet(join_request.bet_id, join_request.user_id)
+                except Exception:
+                    await join_reservations.leave(join_request.bet_id, join_request.user_id)
+                    raise
+        except Exception as e:
+            # The reservation expired, the bet closed (expired, settled)
+            # while the transfer was in flight, or the write itself failed;
+            # the stake is already in escrow, so hand it back
+            refunded = await solana_service.leave_bet(
+                escrow_address=bet["escrow_address"],
+                joiner_pubkey=str(join_request.user_id),
+                bet_amount=join_request.stake_amount,
+                bet_seed=bet.get("escrow_seed")
+            )
+            logger.error(
+                "Joined bet on chain but couldn't record the join, stake %s: %s",
+                "refunded" if refunded else "needs a manual refund", e,
+                extra={"bet_id": join_request.bet_id, "user_id": join_request.user_id}
+            )
+            if isinstance(e, BetJoinRejected):
+                raise HTTPException(status_code=409, detail=str(e))
+            raise
+
+        joined_bet = active_bets.join(join_request.bet_id, join_request.user_id)
+        await bet_feed.publish(BetEventType.JOINED, joined_bet or {
+            **bet,
+            "current_participants": bet["current_participants"] + [join_request.user_id],
+        })
+
         return {"message": "Successfully joined bet"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/verify")
-async def verify_bet(
-    bet_verification: BetVerification,
-    screenshot: UploadFile = File(...)
-):
-    try:
-        # Process the COD screenshot
-        contents = await screenshot.read()
-        match_stats = await llm_service.process_image(contents)
-        
-        if not match_stats:
-            raise HTTPException(status_code=400, detail="Failed to process match stats")
-            
-        # Validate the stats
-        if not llm_service.validate_stats(match_stats):
-            raise HTTPException(status_code=400, detail="Invalid match stats")
-
-        # Get bet conditions from DB (mock for now)
-        bet_conditions = [
+async def find_bet(bet_id: int) -> Optional[BetOut]:
+    # Full bets and bets this worker hasn't synced yet aren't in the index
+    bet = active_bets.get(bet_id)
+    if bet is None and bet_repository:
+        bet = await bet_repository.get_bet(bet_id)
+    return bet
+
+async def ocr_stage(job: dict):
+    # Process the COD screenshot; high-stake bets get model slots first
+    bet = await find_bet(job["bet_id"])
+    match_stats = await ocr_coalescer.process_image(
+        job["image"], job["digest"], priority=bet.stake_amount if bet else 0.0
+    )
+    if not match_stats:
+        # Usually an upstream error or unparseable response, worth a retry
+        raise RuntimeError("Failed to process match stats")
+    job["match_stats"] = match_stats
+
+async def validate_stage(job: dict):
+    # Validate the stats; later stages read the coerced values
+    match_stats = llm_service.validate_stats(job["match_stats"])
+    if match_stats is None:
+        raise VerificationRejected("Invalid match stats")
+    job["match_stats"] = match_stats
+
+def verification_row(job: dict, status: VerificationJobStatus, error: Optional[str] = None) -> dict:
+    return {
+        "id": job["job_id"],
+        "bet_id": job["bet_id"],
+        "verified_by": job["verified_by"],
+        "status": status.value,
+        "match_stats": job["match_stats"],
+        "error": error,
+    }
+
+async def record_verification(job: dict, status: VerificationJobStatus, error: Optional[str] = None):
+    await bet_repository.record_verifications([verification_row(job, status, error)])
+
+async def player_stats_stage(job: dict):
+    # Every validated match counts, won or lost, so K/D isn't skewed towards
+    # winning screenshots. Only a participant's first submission of a
+    # screen counts; resubmissions, reused screenshots and bets the player
+    # isn't in would otherwise pad K/D. The key comes from the reuse
+    # detector, so re-encoded or cropped copies don't count again; without
+    # the detector no match counts
+    bet = await find_bet(job["bet_id"])
+    key = job.get("stats_key")
+    counts = (
+        key is not None
+        and bet is not None
+        and job["verified_by"] in bet.current_participants
+        and not job.get("reused_from")
+    )
+    if bet_repository:
+        # Stored first so other workers and restarts see it; the unique
+        # key settles which verification of a screen counts
+        counts = await bet_repository.record_match_stats(
+            verification_row(job, VerificationJobStatus.RUNNING), key if counts else None
+        )
+        job["stats_recorded"] = True
+    if counts:
+        player_stats.record(job["verified_by"], job["match_stats"], match_id=key)
+
+async def finish_verification(job: dict, status: VerificationJobStatus, error: Optional[str]):
+    # The stats row is written as RUNNING; give it the job's final status so
+    # rejected and dead-lettered jobs don't stay RUNNING. The settle stage
+    # records successes along with the settlement
+    if job.get("stats_recorded") and status != VerificationJobStatus.SUCCEEDED:
+        await record_verification(job, status, error)
+
+async def check_conditions(job: dict):
+    match_stats = job["match_stats"]
+
+    # Conditions are compiled when the bet is created or loaded
+    predicate = condition_engine.predicate(job["bet_id"])
+    if predicate is None and bet_repository:
+        # Created on another worker, or full and dropped by the sync
+        bet = await bet_repository.get_bet(job["bet_id"])
+        if bet is None:
+            raise VerificationRejected("Bet not found")
+        if bet.status in JOINABLE_STATUSES:
+            predicate = condition_engine.register(bet.id, bet.match_id, bet.conditions, bet.condition_logic)
+        else:
+            predicate = compile_conditions(bet.conditions, bet.condition_logic)
+    elif predicate is None:
+        # Bet not registered in this process (no DB yet), use mock conditions
+        predicate = compile_conditions([
             BetCondition(
                 type=BetType.KILLS,
                 target_value=20,
                 comparison=">",
                 description="Must get more than 20 kills"
             )
-        ]
+        ])
 
-        # Verify game mode and map if required
-        if bet_verification.game_mode:
-            if match_stats["game_info"]["mode"] != bet_verification.game_mode:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Game mode does not match requirement"
-                )
+    # Verify game mode and map if required
+    if job["game_mode"]:
+        if match_stats["game_info"]["mode"] != job["game_mode"]:
+            raise VerificationRejected("Game mode does not match requirement")
 
-        if bet_verification.map_name:
-            if match_stats["game_info"]["map"] != bet_verification.map_name:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Map does not match requirement"
-                )
+    if job["map_name"]:
+        if match_stats["game_info"]["map"] != job["map_name"]:
+            raise VerificationRejected("Map does not match requirement")
 
-        # Check if conditions are met
-        conditions_met = True
-        for condition in bet_conditions:
-            if condition.type == BetType.KILLS:
-                player_kills = match_stats["player_stats"]["kills"]
-                target = int(condition.target_value)
-                if condition.comparison == ">":
-                    conditions_met = player_kills > target
-                elif condition.comparison == ">=":
-                    conditions_met = player_kills >= target
-                # Add other comparisons as needed
-
-            if not conditions_met:
-                break
-
-        if not conditions_met:
-            raise HTTPException(
-                status_code=400,
-                detail="Bet conditions not met"
-            )
-            
-        # Settle the bet on Solana
-        success = await solana_service.settle_bet(
-            escrow_address="mock_escrow",
-            winner_pubkey=str(bet_verification.verified_by)
+    match_id = condition_engine.match_id(job["bet_id"])
+    if match_id is None:
+        met = predicate(match_stats)
+    else:
+        # One pass over every open bet on the match; the others these stats
+        # win for the player settle along with this one
+        results = condition_engine.evaluate_match(match_id, match_stats)
+        met = results.pop(job["bet_id"])
+        won = [await find_bet(bet_id) for bet_id, bet_met in results.items() if bet_met]
+        job["match_bet_ids"] = [bet.id for bet in won if match_bet_won(bet, job)]
+
+    # Check if conditions are met
+    if not met:
+        raise VerificationRejected("Bet conditions not met")
+
+def match_bet_won(bet: Optional[BetOut], job: dict) -> bool:
+    # The player must be in the bet, and its mode and map requirements are
+    # checked against the screenshot since the form only named one bet
+    game_info = job["match_stats"].get("game_info", {})
+    return (
+        bet is not None
+        and job["verified_by"] in bet.current_participants
+        and (not bet.required_game_mode or game_info.get("mode") == bet.required_game_mode)
+        and (not bet.required_map or game_info.get("map") == bet.required_map)
+    )
+
+async def settle_stage(job: dict):
+    winner_pubkey = str(job["verified_by"])  # In reality, the winner's wallet
+    # Claim the bets before paying out, so a second job for the same bet is
+    # rejected and a retry of this one knows the payout may have landed
+    claims = []
+    for bet_id in [job["bet_id"], *job.get("match_bet_ids", [])]:
+        if bet_repository:
+            resuming = await bet_repository.claim_settlement(bet_id, job["job_id"])
+            bet = await bet_repository.get_bet(bet_id) if resuming is not None else None
+        else:
+            # In-memory mode: only this job's own retries are guarded
+            resuming = job.get("settling", False)
+            bet = active_bets.get(bet_id)
+        if bet_id == job["bet_id"]:
+            if resuming is None:
+                raise VerificationRejected("Bet already settled")
+        elif bet is None:
+            # Settled by another verification since the conditions stage
+            continue
+        claims.append((bet_id, bet, resuming))
+    job["settling"] = True
+
+    async def pay(bet: Optional[BetOut], resuming: bool) -> bool:
+        if resuming and bet and await solana_service.is_settled(bet.escrow_seed, winner_pubkey):
+            # Paid out before a crash or failed write; only the DB is behind
+            return True
+        # Settle the bet on Solana; with a settler keypair and the bet's
+        # seed this goes through the batched settle_bets pipeline
+        return await solana_service.settle_bet(
+            escrow_address=bet.escrow_address if bet else "mock_escrow",
+            winner_pubkey=winner_pubkey,
+            bet_seed=bet.escrow_seed if bet else None
         )
-        
-        if not success:
-            raise HTTPException(status_code=400, detail="Failed to settle bet")
-        
-        return {
-            "message": "Bet verified and settled",
-            "winner_id": bet_verification.verified_by,
-            "match_stats": match_stats,
-            "conditions_met": True
-        }
+
+    # Concurrent payouts share settle_bets transactions
+    paid = await asyncio.gather(*(pay(bet, resuming) for _, bet, resuming in claims))
+    if not all(paid):
+        # The claims stay with this job, so the retry resumes every payout
+        raise RuntimeError("Failed to settle bet")
+
+    settled_ids = [bet_id for bet_id, _, _ in claims]
+    if bet_repository:
+        await bet_repository.settle_bets([(bet_id, job["verified_by"]) for bet_id in settled_ids])
+        await record_verification(job, VerificationJobStatus.SUCCEEDED)
+
+    for bet_id, bet, _ in claims:
+        settled_bet = active_bets.remove(bet_id) or bet
+        condition_engine.unregister(bet_id)
+        expiry_scheduler.cancel(bet_id)
+        await join_reservations.forget(bet_id)
+        await bet_feed.publish(BetEventType.SETTLED, {
+            **(settled_bet.model_dump(mode="json") if settled_bet else {"id": bet_id}),
+            "status": "COMPLETED",
+            "winner_id": job["verified_by"],
+        })
+
+    job["result"] = {
+        "message": "Bet verified and settled",
+        "winner_id": job["verified_by"],
+        "match_stats": job["match_stats"],
+        "conditions_met": True,
+        # This bet and the other bets on the match the same stats won
+        "settled_bet_ids": settled_ids
+    }
+
+verification_queue = VerificationQueue.from_env([
+    ("ocr", ocr_stage),
+    ("validate", validate_stage),
+    ("player_stats", player_stats_stage),
+    ("conditions", check_conditions),
+    ("settle", settle_stage),
+], on_finish=finish_verification)
+
+async def sync_open_bets():
+    """
+    Bring the index that serves /active, the compiled conditions and the
+    expiry schedule in line with the DB, picking up bets created, joined
+    or closed on other workers.
+    """
+    changed, removed = active_bets.sync(await bet_repository.list_active(limit=None))
+    for bet in changed:
+        condition_engine.register(bet.id, bet.match_id, bet.conditions, bet.condition_logic)
+        expiry_scheduler.schedule_bet(bet)
+    for bet in removed:
+        # Loaded again from the DB if a verification still needs them
+        condition_engine.unregister(bet.id)
+        expiry_scheduler.cancel(bet.id)
+
+async def run_open_bets_sync(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await sync_open_bets()
+        except Exception:
+            logger.exception("Syncing open bets from the DB failed")
+
+async def load_open_bets():
+    if not bet_repository:
+        return
+    await bet_repository.create_tables()
+    # Bets that ran out while we were down are refunded right away
+    await refund_cancelled_bets(await bet_repository.expire_bets())
+    await sync_open_bets()
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Startup and shutdown of everything the bet routes depend on; entered
+    from the app's lifespan in app.main.
+    """
+    # Holds startup for the client warm-up, see SERVICE_WARMUP
+    await services.start()
+    await load_open_bets()
+    # Rebuilt before any queued job can record a match
+    await player_stats.start()
+    await verification_queue.start()
+    await expiry_scheduler.start()
+    open_bets_sync = None
+    if bet_repository:
+        open_bets_sync = asyncio.create_task(
+            run_open_bets_sync(float(os.getenv("OPEN_BETS_SYNC_SECONDS", "5")))
+        )
+    try:
+        yield
+    finally:
+        if open_bets_sync is not None:
+            open_bets_sync.cancel()
+            await asyncio.gather(open_bets_sync, return_exceptions=True)
+        await verification_queue.stop()
+        await expiry_scheduler.stop()
+        await player_stats.stop()
+        await services.close()
+        if bet_repository:
+            await bet_repository.close()
+
+def bet_verification_form(bet_verification: str = Form(...)) -> BetVerification:
+    # A JSON model can't share a multipart body with the file, so it comes
+    # in as a JSON-encoded form field
+    try:
+        return BetVerification.model_validate_json(bet_verification)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=json.loads(e.json()))
+
+@router.post("/verify", status_code=202)
+async def verify_bet(
+    bet_verification: BetVerification = Depends(bet_verification_form),
+    screenshot: UploadFile = File(...),
+    x_user_id: Optional[int] = Header(default=None)
+):
+    """
+    Queue a screenshot for verification and return the job id right away.
+    OCR, validation and settlement run on the verification workers;
+    poll GET /bets/verify/{job_id} for the outcome. Send X-User-Id so the
+    upload rate limit applies per user rather than per client address.
+    """
+    try:
+        # The rate limit was charged to X-User-Id before the body was read
+        if x_user_id is not None and x_user_id != bet_verification.verified_by:
+            raise HTTPException(status_code=400, detail="X-User-Id does not match verified_by")
+
+        # Copy the COD screenshot out of the spooled upload
+        with STAGE_SECONDS.time("upload_read"):
+            upload = await read_screenshot(screenshot)
+
+        # Same screenshot already submitted for a different bet; the
+        # fingerprint of its first submission keys the match in player stats
+        reused, stats_key = [], None
+        if reuse_detector:
+            with STAGE_SECONDS.time("fingerprint"):
+                reused, stats_key = await reuse_detector.check(
+                    upload.data, bet_verification.bet_id, bet_verification.verified_by
+                )
+        if reused:
+            logger.warning(
+                "Screenshot reuse detected",
+                extra={
+                    "bet_id": bet_verification.bet_id,
+                    "verified_by": bet_verification.verified_by,
+                    "matches": reused[:5],
+                }
+            )
+            if reuse_detector.reject:
+                raise HTTPException(status_code=409, detail="Screenshot was already submitted for another bet")
+
+        job_id = await verification_queue.enqueue({
+            "image": upload.data,
+            "digest": upload.digest,
+            "stats_key": stats_key,
+            "bet_id": bet_verification.bet_id,
+            "verified_by": bet_verification.verified_by,
+            "game_mode": bet_verification.game_mode,
+            "map_name": bet_verification.map_name,
+            # Kept on the job record for review
+            "reused_from": reused[:5]
+        })
+
+        return {"job_id": job_id, "status": VerificationJobStatus.QUEUED}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/verify/{job_id}", response_model=VerificationJobOut)
+async def get_verification(job_id: str, wait: float = 0):
+    """
+    Get the status of a verification job.
+    Pass wait (seconds, max 30) to long-poll until the job finishes.
+    """
+    if wait > 0:
+        job = await verification_queue.wait(job_id, min(wait, 30))
+    else:
+        job = await verification_queue.get(job_id)
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Verification job not found")
+
+    return VerificationJobOut(**job)
+
 @router.get("/active", response_model=List[BetOut])
 async def get_active_bets(
     game_mode: Optional[str] = None,
+    map_name: Optional[str] = None,
     min_stake: Optional[float] = None,
-    max_stake: Optional[float] = None
+    max_stake: Optional[float] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    if_none_match: Optional[str] = Header(default=None)
 ):
     """
-    Get list of active bets that users can join.
-    Supports filtering by game mode and stake amount.
+    Get list of active bets that users can join, ordered by stake.
+    Supports filtering by game mode, map and stake amount.
+    The next page cursor is returned in the X-Next-Cursor header.
+    Send the last ETag back in If-None-Match to get a 304 when the page
+    hasn't changed.
     """
-    # Mock active bets
-    bets = [
-        BetOut(
-            id=1,
-            match_id="COD_123",
-            stake_amount=100,
-            conditions=[
-                BetCondition(
-                    type=BetType.KILLS,
-                    target_value=20,
-                    comparison=">",
-                    description="Must get more than 20 kills"
-                )
-            ],
-            status="ACTIVE",
-            created_by=1,
-            created_at=datetime.utcnow(),
-            time_limit_minutes=30,
-            min_kd_ratio=1.5,
-            required_game_mode="Team Deathmatch",
-            required_map="Shipment",
-            max_participants=2,
-            current_participants=[1],
-            escrow_address="mock_escrow"
+    try:
+        page = active_bets_cache.page(
+            active_bets_cache.key(game_mode, map_name, min_stake, max_stake, cursor, limit)
         )
-    ]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    # Apply filters
-    if game_mode:
-        bets = [b for b in bets if b.required_game_mode == game_mode]
-    if min_stake:
-        bets = [b for b in bets if b.stake_amount >= min_stake]
-    if max_stake:
-        bets = [b for b in bets if b.stake_amount <= max_stake]
+    # Clients must revalidate, but an unchanged page costs them no body
+    headers = {"ETag": page.etag, "Cache-Control": "no-cache"}
+    if page.next_cursor:
+        headers["X-Next-Cursor"] = page.next_cursor
+    if etag_matches(if_none_match, page.etag):
+        active_bets_cache.record_not_modified()
+        return Response(status_code=304, headers=headers)
 
-    return bets 
\ No newline at end of file
+    return Response(content=page.body, media_type="application/json", headers=headers)
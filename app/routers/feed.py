@@ -0,0 +1,85 @@
+import os
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from app.services.bet_events import BetFeedHub, FeedFilter, SlowConsumer
+from app.services.metrics import registry
+
+router = APIRouter()
+bet_feed = BetFeedHub.from_env()
+registry.register_collector("bet_feed", bet_feed.stats)
+HEARTBEAT_SECONDS = float(os.getenv("BET_FEED_HEARTBEAT_SECONDS", "15"))
+
+@asynccontextmanager
+async def lifespan(app):
+    await bet_feed.start()
+    try:
+        yield
+    finally:
+        await bet_feed.stop()
+
+@router.websocket("/ws")
+async def bet_feed_websocket(
+    websocket: WebSocket,
+    game_mode: Optional[str] = None,
+    map_name: Optional[str] = None,
+    min_stake: Optional[float] = None,
+    max_stake: Optional[float] = None
+):
+    """
+    Stream bet events as JSON text frames, filtered like GET /bets/active.
+    Slow consumers are closed with code 1013 and should reconnect.
+    """
+    await websocket.accept()
+    subscription = bet_feed.subscribe(FeedFilter(game_mode, map_name, min_stake, max_stake))
+    try:
+        while True:
+            event = await subscription.next(HEARTBEAT_SECONDS)
+            if event is None:
+                await websocket.send_text('{"type":"ping"}')
+            else:
+                await websocket.send_text(event[1])
+    except SlowConsumer:
+        await websocket.close(code=1013, reason="Slow consumer")
+    except (WebSocketDisconnect, RuntimeError):
+        # Client went away between frames
+        pass
+    finally:
+        bet_feed.unsubscribe(subscription)
+
+@router.get("/sse")
+async def bet_feed_sse(
+    game_mode: Optional[str] = None,
+    map_name: Optional[str] = None,
+    min_stake: Optional[float] = None,
+    max_stake: Optional[float] = None
+):
+    """
+    Server-sent events version of the bet feed for clients without WebSockets.
+    The stream is cancelled when the client disconnects.
+    """
+    subscription = bet_feed.subscribe(FeedFilter(game_mode, map_name, min_stake, max_stake))
+
+    async def stream():
+        try:
+            while True:
+                try:
+                    event = await subscription.next(HEARTBEAT_SECONDS)
+                except SlowConsumer:
+                    yield "event: evicted\ndata: {}\n\n"
+                    return
+                if event is None:
+                    yield ": ping\n\n"
+                else:
+                    yield f"event: {event[0]}\ndata: {event[1]}\n\n"
+        finally:
+            bet_feed.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,11 +1,12 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List, Union
+from typing import Optional, List, Union, Dict
 from datetime import datetime
 from enum import Enum
 
 class BetStatus(str, Enum):
     PENDING = "PENDING"
     ACTIVE = "ACTIVE"
+    SETTLING = "SETTLING"  # payout claimed by a verification job, not yet confirmed
     COMPLETED = "COMPLETED"
     CANCELLED = "CANCELLED"
 
@@ -28,10 +29,15 @@ class BetCreate(BaseModel):
     match_id: str
     stake_amount: float
     conditions: List[BetCondition]  # Multiple conditions can be combined
+    condition_logic: str = Field(
+        default="AND",
+        description="How conditions combine: 'AND' (all must hold) or 'OR' (any)"
+    )
     user_id: int
-    time_limit_minutes: Optional[int] = Field(
+    time_limit_minutes: int = Field(
         default=30,
-        description="Time limit in minutes to join the bet"
+        gt=0,
+        description="Time limit in minutes to join the bet; also the on-chain join deadline"
     )
     min_kd_ratio: Optional[float] = Field(
         default=None,
@@ -55,6 +61,7 @@ class BetOut(BaseModel):
     match_id: str
     stake_amount: float
     conditions: List[BetCondition]
+    condition_logic: str = "AND"
     status: BetStatus
     created_by: int
     created_at: datetime
@@ -65,6 +72,8 @@ class BetOut(BaseModel):
     max_participants: int
     current_participants: List[int]
     escrow_address: str
+    # Seed of the on-chain bet and escrow PDAs; None for mock escrows
+    escrow_seed: Optional[str] = None
     winner_id: Optional[int] = None
 
     class Config:
@@ -85,5 +94,27 @@ class BetJoinRequest(BaseModel):
     stake_amount: float
     player_stats: Optional[dict] = Field(
         default=None,
-        description="Optional player stats to verify K/D ratio requirement"
-    ) 
\ No newline at end of file
+        description="Deprecated and ignored; the K/D ratio requirement is checked "
+                    "against the player's verified matches"
+    ) 
+
+class VerificationJobStatus(str, Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    RETRYING = "RETRYING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+    DEAD_LETTERED = "DEAD_LETTERED"
+
+class VerificationJobOut(BaseModel):
+    id: str
+    status: VerificationJobStatus
+    attempts: int
+    created_at: datetime
+    updated_at: datetime
+    stage_timings_ms: Dict[str, float] = Field(
+        default_factory=dict,
+        description="Wall time of each completed pipeline stage"
+    )
+    result: Optional[dict] = None
+    error: Optional[str] = None
@@ -0,0 +1,26 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict
+from typing_extensions import Annotated
+
+class PlayerStats(BaseModel):
+    # Ranges are what a single COD match can plausibly produce
+    kills: int = Field(ge=0, le=100)
+    deaths: int = Field(ge=0, le=100)
+    assists: int = Field(ge=0, le=50)
+    score: Optional[int] = Field(default=None, ge=0)
+    placement: Optional[int] = Field(default=None, ge=1)
+
+class GameInfo(BaseModel):
+    mode: Optional[str] = Field(default=None, description="Game mode, e.g. 'Team Deathmatch'")
+    map: Optional[str] = Field(default=None, description="Map name, e.g. 'Shipment'")
+
+class MatchStats(BaseModel):
+    team_scores: Dict[str, Annotated[float, Field(ge=0)]] = Field(
+        default_factory=dict,
+        description="Final score per team name"
+    )
+    player_stats: PlayerStats
+    game_info: GameInfo = Field(default_factory=GameInfo)
+
+class MatchStatsBatch(BaseModel):
+    results: List[MatchStats] = Field(description="One entry per image, in image order")
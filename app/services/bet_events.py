@@ -0,0 +1,260 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from enum import Enum
+from typing import Dict, Optional, Set, Tuple, Union
+
+from app.schemas.bet_schemas import BetOut
+
+logger = logging.getLogger(__name__)
+
+
+class BetEventType(str, Enum):
+    CREATED = "created"
+    JOINED = "joined"
+    SETTLED = "settled"
+    EXPIRED = "expired"
+
+
+# (event type, JSON text); encoded once and shared by every subscriber
+EncodedEvent = Tuple[str, str]
+
+
+class FeedFilter:
+    """
+    Same filters as GET /bets/active. Events whose bet lacks a filtered
+    field (e.g. a settlement for a bet we no longer hold) don't match.
+    """
+
+    def __init__(
+        self,
+        game_mode: Optional[str] = None,
+        map_name: Optional[str] = None,
+        min_stake: Optional[float] = None,
+        max_stake: Optional[float] = None
+    ):
+        self.game_mode = game_mode
+        self.map_name = map_name
+        self.min_stake = min_stake
+        self.max_stake = max_stake
+
+    def matches(self, bet: Dict) -> bool:
+        if self.map_name and bet.get("required_map") != self.map_name:
+            return False
+        stake = bet.get("stake_amount")
+        if self.min_stake is not None and (stake is None or stake < self.min_stake):
+            return False
+        if self.max_stake is not None and (stake is None or stake > self.max_stake):
+            return False
+        return True
+
+
+class SlowConsumer(Exception):
+    """
+    Raised to a subscriber that was evicted because its queue filled up.
+    """
+
+
+class Subscription:
+    """
+    One connected client: a bounded queue of encoded events plus its filter.
+    """
+
+    def __init__(self, feed_filter: FeedFilter, queue_size: int):
+        self.filter = feed_filter
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.evicted = False
+
+    async def next(self, timeout: float) -> Optional[EncodedEvent]:
+        """
+        Wait for the next event; None on timeout (time for a heartbeat).
+        """
+        if self.evicted:
+            raise SlowConsumer("Subscriber fell too far behind")
+        # wait_for costs a task and a timer; skip it while events are queued
+        if not self.queue.empty():
+            return self.queue.get_nowait()
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class InMemoryBroker:
+    """
+    Delivers events to this process only.
+    """
+
+    def __init__(self):
+        self.hub: Optional["BetFeedHub"] = None
+
+    async def start(self, hub: "BetFeedHub") -> None:
+        self.hub = hub
+
+    async def stop(self) -> None:
+        self.hub = None
+
+    async def publish(self, text: str) -> None:
+        if self.hub is not None:
+            self.hub.dispatch(text)
+
+
+class RedisBroker:
+    """
+    Fans events out to every uvicorn worker over Redis pub/sub; each worker
+    then delivers to its own connections.
+    """
+
+    def __init__(self, redis_url: str, channel: str = "bets:feed"):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(redis_url)
+        self.channel = channel
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self, hub: "BetFeedHub") -> None:
+        self._listener = asyncio.create_task(self._listen(hub))
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+
+    async def publish(self, text: str) -> None:
+        await self.client.publish(self.channel, text)
+
+    async def _listen(self, hub: "BetFeedHub") -> None:
+        """
+        Deliver the channel to the hub, resubscribing with backoff whenever
+        the connection drops, until cancelled. Events published while
+        disconnected are lost; clients re-read GET /bets/active as after
+        an eviction.
+        """
+        backoff = 1.0
+        while True:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                backoff = 1.0
+                async for message in pubsub.listen():
+                    data = message["data"]
+                    hub.dispatch(data.decode() if isinstance(data, bytes) else data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Bet feed subscription error, reconnecting: %s", e)
+            finally:
+                await pubsub.close()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+
+class BetFeedHub:
+    """
+    Push feed of bet created/joined/settled/expired events.
+
+    Each event is serialized once and offered to every local subscriber whose
+    filter matches; subscribers are bucketed by game mode so an event only
+    visits candidates. Queues are bounded and never block the publisher: a
+    subscriber whose queue is full is evicted and has to reconnect (and
+    re-read GET /bets/active). The broker carries events between workers.
+    """
+
+    def __init__(self, broker=None, queue_size: int = 256):
+        self.broker = broker or InMemoryBroker()
+        self.queue_size = queue_size
+
+        # Subscribers without a game mode filter see every mode
+        self._any_mode: Set[Subscription] = set()
+        self._by_mode: Dict[str, Set[Subscription]] = {}
+
+        self.published = 0
+        self.publish_errors = 0
+        self.delivered = 0
+        self.evicted = 0
+
+    @classmethod
+    def from_env(cls) -> "BetFeedHub":
+        broker = None
+        if os.getenv("BET_FEED_BROKER", "memory") == "redis":
+            broker = RedisBroker(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+        return cls(broker=broker, queue_size=int(os.getenv("BET_FEED_QUEUE_SIZE", "256")))
+
+    async def start(self) -> None:
+        await self.broker.start(self)
+
+    async def stop(self) -> None:
+        await self.broker.stop()
+
+    def subscribe(self, feed_filter: FeedFilter) -> Subscription:
+        subscription = Subscription(feed_filter, self.queue_size)
+        if feed_filter.game_mode:
+            self._by_mode.setdefault(feed_filter.game_mode, set()).add(subscription)
+        else:
+            self._any_mode.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        game_mode = subscription.filter.game_mode
+        if not game_mode:
+            self._any_mode.discard(subscription)
+            return
+        bucket = self._by_mode.get(game_mode)
+        if bucket is not None:
+            bucket.discard(subscription)
+            if not bucket:
+                del self._by_mode[game_mode]
+
+    async def publish(self, event_type: BetEventType, bet: Union[BetOut, Dict]) -> None:
+        """
+        Best effort: events are published after the bet has changed, so a
+        broker error is logged and never fails the caller. Subscribers that
+        miss an event catch up from GET /bets/active.
+        """
+        if isinstance(bet, BetOut):
+            bet = bet.model_dump(mode="json")
+        text = json.dumps({"type": event_type.value, "bet": bet, "ts": time.time()}, default=str)
+        try:
+            await self.broker.publish(text)
+        except Exception as e:
+            self.publish_errors += 1
+            logger.error("Publishing %s event for bet %s failed: %s", event_type.value, bet.get("id"), e)
+            return
+        self.published += 1
+
+    def dispatch(self, text: str) -> None:
+        """
+        Deliver an encoded event to matching local subscribers.
+        """
+        payload = json.loads(text)
+        bet = payload["bet"]
+        event: EncodedEvent = (payload["type"], text)
+
+        candidates = list(self._any_mode)
+        game_mode = bet.get("required_game_mode")
+        if game_mode in self._by_mode:
+            candidates.extend(self._by_mode[game_mode])
+
+        for subscription in candidates:
+            if subscription.evicted or not subscription.filter.matches(bet):
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                # Never let one slow client hold up the rest
+                subscription.evicted = True
+                self.evicted += 1
+                self.unsubscribe(subscription)
+
+    def stats(self) -> Dict:
+        return {
+            "subscribers": len(self._any_mode) + sum(len(bucket) for bucket in self._by_mode.values()),
+            "published": self.published,
+            "publish_errors": self.publish_errors,
+            "delivered": self.delivered,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,184 @@
+import base64
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sortedcontainers import SortedList
+
+from app.schemas.bet_schemas import BetOut, BetStatus
+
+JOINABLE_STATUSES = {BetStatus.PENDING, BetStatus.ACTIVE}
+
+
+def encode_cursor(stake_amount: float, bet_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{stake_amount!r}:{bet_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    """
+    Raises ValueError for malformed cursors.
+    """
+    try:
+        stake, bet_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        return float(stake), int(bet_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def expires_at(bet: BetOut) -> datetime:
+    return bet.created_at + timedelta(minutes=bet.time_limit_minutes)
+
+
+class ActiveBetIndex:
+    """
+    In-memory order book of joinable bets for GET /bets/active.
+
+    Bets are kept in (stake_amount, id) order overall and per game mode and
+    map, so a filtered stake-range query is a bisect plus a walk over the
+    page it returns. A separate (expires_at, id) ordering lets expired bets
+    be dropped in deadline order. Every structure is updated incrementally
+    on create/join/settle/expire, and each change bumps `version` so
+    cached responses know when they are out of date.
+    """
+
+    def __init__(self):
+        self._bets: Dict[int, BetOut] = {}
+        self._by_stake = SortedList()
+        self._by_mode: Dict[str, SortedList] = {}
+        self._by_map: Dict[str, SortedList] = {}
+        self._by_mode_map: Dict[Tuple[str, str], SortedList] = {}
+        self._by_expiry = SortedList()
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._bets)
+
+    def get(self, bet_id: int) -> Optional[BetOut]:
+        return self._bets.get(bet_id)
+
+    def add(self, bet: BetOut) -> None:
+        """
+        Index a bet if it can still be joined; re-indexes existing bets.
+        """
+        self.remove(bet.id)
+        if bet.status not in JOINABLE_STATUSES or len(bet.current_participants) >= bet.max_participants:
+            return
+
+        key = (bet.stake_amount, bet.id)
+        self._bets[bet.id] = bet
+        self.version += 1
+        self._by_stake.add(key)
+        if bet.required_game_mode:
+            self._by_mode.setdefault(bet.required_game_mode, SortedList()).add(key)
+        if bet.required_map:
+            self._by_map.setdefault(bet.required_map, SortedList()).add(key)
+        if bet.required_game_mode and bet.required_map:
+            mode_map = (bet.required_game_mode, bet.required_map)
+            self._by_mode_map.setdefault(mode_map, SortedList()).add(key)
+        self._by_expiry.add((expires_at(bet), bet.id))
+
+    def join(self, bet_id: int, user_id: int) -> Optional[BetOut]:
+        """
+        Record a new participant. Full bets leave the index.
+        """
+        bet = self._bets.get(bet_id)
+        if bet is None:
+            return None
+        bet = bet.model_copy(update={
+            "current_participants": bet.current_participants + [user_id],
+            "status": BetStatus.ACTIVE,
+        })
+        self.add(bet)
+        return bet
+
+    def remove(self, bet_id: int) -> Optional[BetOut]:
+        bet = self._bets.pop(bet_id, None)
+        if bet is None:
+            return None
+        self.version += 1
+
+        key = (bet.stake_amount, bet.id)
+        self._by_stake.discard(key)
+        self._discard(self._by_mode, bet.required_game_mode, key)
+        self._discard(self._by_map, bet.required_map, key)
+        if bet.required_game_mode and bet.required_map:
+            self._discard(self._by_mode_map, (bet.required_game_mode, bet.required_map), key)
+        self._by_expiry.discard((expires_at(bet), bet.id))
+        return bet
+
+    def sync(self, bets: Iterable[BetOut]) -> Tuple[List[BetOut], List[BetOut]]:
+        """
+        Make the index hold exactly `bets`, the joinable bets in the DB.
+        Unchanged bets keep their entries, so `version` only moves if
+        something did. Returns the bets added or updated and those removed.
+        """
+        changed, seen = [], set()
+        for bet in bets:
+            seen.add(bet.id)
+            if self._bets.get(bet.id) != bet:
+                self.add(bet)
+                changed.append(bet)
+        removed = [self.remove(bet_id) for bet_id in list(self._bets) if bet_id not in seen]
+        return changed, removed
+
+    def expire(self, now: Optional[datetime] = None) -> List[BetOut]:
+        """
+        Drop every bet whose join deadline has passed, oldest first.
+        """
+        now = now or datetime.utcnow()
+        expired = []
+        while self._by_expiry and self._by_expiry[0][0] <= now:
+            expired.append(self.remove(self._by_expiry[0][1]))
+        return expired
+
+    def query(
+        self,
+        game_mode: Optional[str] = None,
+        map_name: Optional[str] = None,
+        min_stake: Optional[float] = None,
+        max_stake: Optional[float] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+        now: Optional[datetime] = None
+    ) -> Tuple[List[BetOut], Optional[str]]:
+        """
+        Returns a page of joinable bets ordered by (stake_amount, id) and
+        the cursor for the next page (None when exhausted).
+        """
+        if game_mode is not None and map_name is not None:
+            ordering = self._by_mode_map.get((game_mode, map_name))
+        elif game_mode is not None:
+            ordering = self._by_mode.get(game_mode)
+        elif map_name is not None:
+            ordering = self._by_map.get(map_name)
+        else:
+            ordering = self._by_stake
+        if not ordering:
+            return [], None
+
+        lower = (min_stake if min_stake is not None else float("-inf"), -1)
+        inclusive = (True, True)
+        if cursor:
+            cursor_key = decode_cursor(cursor)
+            if cursor_key >= lower:
+                lower, inclusive = cursor_key, (False, True)
+        upper = (max_stake if max_stake is not None else float("inf"), float("inf"))
+
+        now = now or datetime.utcnow()
+        page: List[BetOut] = []
+        for stake_amount, bet_id in ordering.irange(lower, upper, inclusive=inclusive):
+            bet = self._bets[bet_id]
+            if expires_at(bet) <= now:
+                continue
+            if len(page) == limit:
+                last = page[-1]
+                return page, encode_cursor(last.stake_amount, last.id)
+            page.append(bet)
+        return page, None
+
+    @staticmethod
+    def _discard(index: Dict, value, key: Tuple[float, int]) -> None:
+        if value is None or value not in index:
+            return
+        index[value].discard(key)
+        if not index[value]:
+            del index[value]
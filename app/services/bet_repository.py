@@ -0,0 +1,416 @@
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, delete, func, insert, or_, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.db.database import create_engine_from_env, create_session_factory, create_tables
+from app.db.models import BetParticipantRecord, BetRecord, VerificationRecord
+from app.schemas.bet_schemas import BetCreate, BetOut, BetStatus
+
+JOINABLE_STATUSES = [BetStatus.PENDING.value, BetStatus.ACTIVE.value]
+SETTLEABLE_STATUSES = JOINABLE_STATUSES + [BetStatus.SETTLING.value]
+
+
+class BetJoinRejected(Exception):
+    """
+    The bet exists but can't be joined (closed, expired, full or already joined).
+    """
+
+
+def _to_bet_out(record: BetRecord, participants: Optional[List[int]] = None) -> BetOut:
+    return BetOut(
+        id=record.id,
+        match_id=record.match_id,
+        stake_amount=record.stake_amount,
+        conditions=record.conditions,
+        condition_logic=record.condition_logic,
+        status=record.status,
+        created_by=record.created_by,
+        created_at=record.created_at,
+        time_limit_minutes=record.time_limit_minutes,
+        min_kd_ratio=record.min_kd_ratio,
+        required_game_mode=record.required_game_mode,
+        required_map=record.required_map,
+        max_participants=record.max_participants,
+        current_participants=(
+            participants if participants is not None
+            else [participant.user_id for participant in record.participants]
+        ),
+        escrow_address=record.escrow_address,
+        escrow_seed=record.escrow_seed,
+        winner_id=record.winner_id,
+    )
+
+
+def _bet_row(
+    bet: BetCreate, escrow_address: str, escrow_seed: Optional[str], created_at: datetime
+) -> Dict:
+    return {
+        "match_id": bet.match_id,
+        "stake_amount": bet.stake_amount,
+        "conditions": [condition.model_dump(mode="json") for condition in bet.conditions],
+        "condition_logic": bet.condition_logic,
+        "status": BetStatus.PENDING.value,
+        "created_by": bet.user_id,
+        "created_at": created_at,
+        "time_limit_minutes": bet.time_limit_minutes,
+        "expires_at": created_at + timedelta(minutes=bet.time_limit_minutes),
+        "min_kd_ratio": bet.min_kd_ratio,
+        "required_game_mode": bet.required_game_mode,
+        "required_map": bet.required_map,
+        "max_participants": bet.max_participants,
+        "participant_count": 1,
+        "escrow_address": escrow_address,
+        "escrow_seed": escrow_seed,
+    }
+
+
+class BetRepository:
+    """
+    Async persistence for bets, participants and verifications.
+
+    join_bet locks the bet row (SELECT ... FOR UPDATE on Postgres) and claims
+    the participant slot with a guarded UPDATE, so max_participants holds
+    under concurrent joins on any backend. create_bets, settle_bets and
+    record_verifications write whole bursts in one statement.
+    """
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.session_factory = create_session_factory(engine)
+
+    @classmethod
+    def from_env(cls) -> Optional["BetRepository"]:
+        # No DATABASE_URL means the in-memory prototype mode
+        engine = create_engine_from_env()
+        return cls(engine) if engine is not None else None
+
+    async def create_tables(self) -> None:
+        await create_tables(self.engine)
+
+    async def close(self) -> None:
+        await self.engine.dispose()
+
+    async def create_bet(self, bet: BetCreate, escrow_address: str, escrow_seed: Optional[str] = None) -> BetOut:
+        return (await self.create_bets([(bet, escrow_address, escrow_seed)]))[0]
+
+    async def create_bets(self, bets: Sequence[Tuple[BetCreate, str, Optional[str]]]) -> List[BetOut]:
+        """
+        Insert (bet, escrow_address, escrow_seed) triples and their creators
+        as participants, two statements in total.
+        """
+        if not bets:
+            return []
+        created_at = datetime.utcnow()
+        rows = [
+            _bet_row(bet, escrow_address, escrow_seed, created_at)
+            for bet, escrow_address, escrow_seed in bets
+        ]
+
+        async with self.session_factory() as session, session.begin():
+            result = await session.execute(
+                insert(BetRecord).returning(BetRecord.id, sort_by_parameter_order=True),
+                rows
+            )
+            ids = result.scalars().all()
+            await session.execute(insert(BetParticipantRecord), [
+                {"bet_id": bet_id, "user_id": row["created_by"], "joined_at": created_at}
+                for bet_id, row in zip(ids, rows)
+            ])
+
+        return [
+            _to_bet_out(BetRecord(id=bet_id, **row), [row["created_by"]])
+            for bet_id, row in zip(ids, rows)
+        ]
+
+    async def get_bet(self, bet_id: int) -> Optional[BetOut]:
+        async with self.session_factory() as session:
+            record = await session.get(BetRecord, bet_id)
+            return _to_bet_out(record) if record else None
+
+    async def get_bets_for_match(self, match_id: str) -> List[BetOut]:
+        async with self.session_factory() as session:
+            result = await session.scalars(
+                select(BetRecord).where(BetRecord.match_id == match_id).order_by(BetRecord.id)
+            )
+            return [_to_bet_out(record) for record in result]
+
+    async def list_active(
+        self,
+        game_mode: Optional[str] = None,
+        map_name: Optional[str] = None,
+        min_stake: Optional[float] = None,
+        max_stake: Optional[float] = None,
+        after: Optional[Tuple[float, int]] = None,
+        limit: Optional[int] = 50,
+        now: Optional[datetime] = None
+    ) -> List[BetOut]:
+        """
+        Joinable bets in (stake_amount, id) order; `after` is the last
+        (stake_amount, id) of the previous page.
+        """
+        query = select(BetRecord).where(
+            BetRecord.status.in_(JOINABLE_STATUSES),
+            BetRecord.expires_at > (now or datetime.utcnow()),
+            BetRecord.participant_count < BetRecord.max_participants,
+        )
+        if game_mode:
+            query = query.where(BetRecord.required_game_mode == game_mode)
+        if map_name:
+            query = query.where(BetRecord.required_map == map_name)
+        if min_stake is not None:
+            query = query.where(BetRecord.stake_amount >= min_stake)
+        if max_stake is not None:
+            query = query.where(BetRecord.stake_amount <= max_stake)
+        if after is not None:
+            query = query.where(tuple_(BetRecord.stake_amount, BetRecord.id) > tuple_(*after))
+        query = query.order_by(BetRecord.stake_amount, BetRecord.id).limit(limit)
+
+        async with self.session_factory() as session:
+            return [_to_bet_out(record) for record in await session.scalars(query)]
+
+    async def join_bet(self, bet_id: int, user_id: int, now: Optional[datetime] = None) -> Optional[BetOut]:
+        """
+        Add a participant. Returns None if the bet doesn't exist and raises
+        BetJoinRejected if it can't be joined.
+        """
+        now = now or datetime.utcnow()
+        async with self.session_factory() as session, session.begin():
+            record = await session.get(BetRecord, bet_id, with_for_update=True)
+            if record is None:
+                return None
+            if record.status not in JOINABLE_STATUSES:
+                raise BetJoinRejected("Bet is no longer open")
+            if now > record.expires_at:
+                raise BetJoinRejected("Bet time limit exceeded")
+            if any(participant.user_id == user_id for participant in record.participants):
+                raise BetJoinRejected("Already joined this bet")
+
+            # The row lock covers Postgres; the guard keeps SQLite honest too
+            result = await session.execute(
+                update(BetRecord)
+                .where(
+                    BetRecord.id == bet_id,
+                    BetRecord.participant_count < BetRecord.max_participants
+                )
+                .values(
+                    participant_count=BetRecord.participant_count + 1,
+                    status=BetStatus.ACTIVE.value
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != 1:
+                raise BetJoinRejected("Bet is full")
+
+            session.add(BetParticipantRecord(bet_id=bet_id, user_id=user_id, joined_at=now))
+            try:
+                await session.flush()
+            except IntegrityError:
+                raise BetJoinRejected("Already joined this bet")
+
+            participants = await session.scalars(
+                select(BetParticipantRecord.user_id)
+                .where(BetParticipantRecord.bet_id == bet_id)
+                .order_by(BetParticipantRecord.joined_at)
+            )
+            bet = _to_bet_out(record, list(participants))
+            return bet.model_copy(update={"status": BetStatus.ACTIVE})
+
+    async def leave_bet(self, bet_id: int, user_id: int) -> None:
+        """
+        Undo a join, e.g. when the on-chain transfer failed.
+        """
+        async with self.session_factory() as session, session.begin():
+            result = await session.execute(
+                delete(BetParticipantRecord).where(
+                    BetParticipantRecord.bet_id == bet_id,
+                    BetParticipantRecord.user_id == user_id
+                )
+            )
+            if result.rowcount:
+                await session.execute(
+                    update(BetRecord)
+                    .where(BetRecord.id == bet_id)
+                    .values(participant_count=BetRecord.participant_count - 1)
+                )
+
+    async def claim_settlement(self, bet_id: int, job_id: str) -> Optional[bool]:
+        """
+        Move an open bet to SETTLING on behalf of job_id, before any payout
+        is sent. Returns False for a new claim and True if job_id already
+        held it (an earlier attempt may have reached the chain). Returns
+        None if the bet is missing, closed or claimed by another job.
+        """
+        async with self.session_factory() as session, session.begin():
+            record = await session.get(BetRecord, bet_id)
+            if record is None:
+                return None
+            if record.status == BetStatus.SETTLING.value:
+                return True if record.settlement_job == job_id else None
+            # Guarded so only one of several concurrent claimers wins
+            result = await session.execute(
+                update(BetRecord)
+                .where(BetRecord.id == bet_id, BetRecord.status.in_(JOINABLE_STATUSES))
+                .values(status=BetStatus.SETTLING.value, settlement_job=job_id)
+                .execution_options(synchronize_session=False)
+            )
+            return False if result.rowcount else None
+
+    async def settle_bets(self, settlements: Sequence[Tuple[int, int]]) -> None:
+        """
+        Mark (bet_id, winner_id) pairs completed in one executemany UPDATE.
+        Unknown and already closed bet ids are ignored.
+        """
+        if not settlements:
+            return
+        bets = BetRecord.__table__
+        statement = (
+            update(bets)
+            .where(
+                bets.c.id == bindparam("bet_id"),
+                # An expanding IN can't be used with executemany
+                or_(*(bets.c.status == status for status in SETTLEABLE_STATUSES))
+            )
+            .values(status=BetStatus.COMPLETED.value, winner_id=bindparam("winner"))
+        )
+        async with self.session_factory() as session, session.begin():
+            await session.execute(statement, [
+                {"bet_id": bet_id, "winner": winner_id} for bet_id, winner_id in settlements
+            ])
+
+    async def expire_bets(
+        self,
+        bet_ids: Optional[Sequence[int]] = None,
+        now: Optional[datetime] = None
+    ) -> List[BetOut]:
+        """
+        Cancel bets nobody joined before their time limit (optionally only
+        those in bet_ids) and return them for refunding. Bets with joiners
+        stay ACTIVE. The status guard makes this safe to run from several
+        workers: each bet is returned to exactly one caller.
+        """
+        query = (
+            update(BetRecord)
+            .where(
+                BetRecord.status == BetStatus.PENDING.value,
+                BetRecord.expires_at <= (now or datetime.utcnow())
+            )
+            .values(status=BetStatus.CANCELLED.value)
+            .returning(BetRecord.id)
+            .execution_options(synchronize_session=False)
+        )
+        if bet_ids is not None:
+            if not bet_ids:
+                return []
+            query = query.where(BetRecord.id.in_(bet_ids))
+
+        async with self.session_factory() as session, session.begin():
+            ids = list((await session.execute(query)).scalars())
+            if not ids:
+                return []
+            result = await session.scalars(
+                select(BetRecord).where(BetRecord.id.in_(ids)).order_by(BetRecord.id)
+            )
+            return [_to_bet_out(record) for record in result]
+
+    async def record_verifications(self, verifications: Sequence[Dict]) -> None:
+        """
+        Upsert verification outcomes keyed by job id.
+        Each dict has id, bet_id, verified_by, status and optionally
+        match_stats and error.
+        """
+        if not verifications:
+            return
+        now = datetime.utcnow()
+        rows = [
+            {
+                "match_stats": None,
+                "error": None,
+                "created_at": now,
+                **verification,
+                "updated_at": now,
+            }
+            for verification in verifications
+        ]
+
+        if self.engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        statement = upsert(VerificationRecord)
+        statement = statement.on_conflict_do_update(
+            index_elements=[VerificationRecord.id],
+            set_={
+                "status": statement.excluded.status,
+                "match_stats": statement.excluded.match_stats,
+                "error": statement.excluded.error,
+                # Later status updates don't carry the digest; keep it
+                "stats_digest": func.coalesce(
+                    statement.excluded.stats_digest, VerificationRecord.stats_digest
+                ),
+                "updated_at": statement.excluded.updated_at,
+            }
+        )
+        async with self.session_factory() as session, session.begin():
+            await session.execute(statement, rows)
+
+    async def record_match_stats(self, verification: Dict, digest: Optional[str]) -> bool:
+        """
+        Upsert a verification (see record_verifications) that counts toward
+        player stats under digest, a key for the screenshot. Returns False,
+        storing the row without it, if digest is None or another
+        verification already counted the same screenshot.
+        """
+        if digest is not None:
+            try:
+                await self.record_verifications([{**verification, "stats_digest": digest}])
+                return True
+            except IntegrityError:
+                pass
+        await self.record_verifications([verification])
+        return False
+
+    async def iter_match_stats(
+        self, since: Optional[datetime] = None, batch_size: int = 50_000
+    ) -> AsyncIterator[List[Tuple]]:
+        """
+        Kills, deaths, mode and map of every verification counted in player
+        stats created after since, oldest first, in batches of
+        (stats_digest, verified_by, kills, deaths, game_mode, map_name,
+        created_at). The fields are extracted by the database, so no JSON
+        document is loaded, and batches page by (created_at, stats_digest).
+        """
+        stats = VerificationRecord.match_stats
+        kills = stats[("player_stats", "kills")].as_integer()
+        query = (
+            select(
+                VerificationRecord.stats_digest,
+                VerificationRecord.verified_by,
+                kills,
+                stats[("player_stats", "deaths")].as_integer(),
+                stats[("game_info", "mode")].as_string(),
+                stats[("game_info", "map")].as_string(),
+                VerificationRecord.created_at,
+            )
+            .where(VerificationRecord.stats_digest.is_not(None), kills.is_not(None))
+            .order_by(VerificationRecord.created_at, VerificationRecord.stats_digest)
+            .limit(batch_size)
+        )
+        if since is not None:
+            query = query.where(VerificationRecord.created_at > since)
+
+        after = None
+        while True:
+            page = query if after is None else query.where(
+                tuple_(VerificationRecord.created_at, VerificationRecord.stats_digest) > tuple_(*after)
+            )
+            async with self.session_factory() as session:
+                rows = [tuple(row) for row in await session.execute(page)]
+            if not rows:
+                return
+            yield rows
+            if len(rows) < batch_size:
+                return
+            after = (rows[-1][6], rows[-1][0])
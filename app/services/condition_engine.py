@@ -0,0 +1,240 @@
+import math
+import operator
+import re
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.schemas.bet_schemas import BetCondition, BetType
+
+OPERATORS = {
+    ">": operator.gt,
+    "<": operator.lt,
+    ">=": operator.ge,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+OP_CODES = {op: code for code, op in enumerate(OPERATORS)}
+_OPERATOR_FUNCS = list(OPERATORS.values())
+_NP_OPERATORS = [np.greater, np.less, np.greater_equal, np.less_equal, np.equal, np.not_equal]
+
+# Stat vector layout shared by the scalar and batched evaluators
+STAT_NAMES = ["kills", "deaths", "assists", "score", "placement", "kd_ratio", "kda_ratio"]
+STAT_INDEX = {name: index for index, name in enumerate(STAT_NAMES)}
+
+TYPE_STATS = {
+    BetType.KILLS: "kills",
+    BetType.SCORE: "score",
+    BetType.PLACEMENT: "placement",
+}
+
+_CUSTOM_EXPRESSION = re.compile(r"^\s*([a-z_]+)\s*(>=|<=|==|!=|>|<)\s*(-?\d+(?:\.\d+)?)\s*$")
+
+
+def stat_values(match_stats: Dict) -> List[float]:
+    """
+    Flatten normalized match stats into the STAT_NAMES layout as plain
+    floats. Missing stats are NaN so any condition on them evaluates false.
+    """
+    player_stats = match_stats.get("player_stats", {})
+    values = [math.nan] * len(STAT_NAMES)
+    for name in ("kills", "deaths", "assists", "score", "placement"):
+        value = player_stats.get(name)
+        if isinstance(value, (int, float)):
+            values[STAT_INDEX[name]] = float(value)
+
+    kills, deaths, assists = values[0], values[1], values[2]
+    if not math.isnan(kills) and not math.isnan(deaths):
+        values[STAT_INDEX["kd_ratio"]] = kills / max(deaths, 1)
+        if not math.isnan(assists):
+            values[STAT_INDEX["kda_ratio"]] = (kills + assists) / max(deaths, 1)
+    return values
+
+
+def compile_condition(condition: BetCondition) -> Tuple[int, int, float]:
+    """
+    Reduce a BetCondition to (stat_index, op_code, target).
+
+    KILLS/SCORE/PLACEMENT compare their stat against target_value using
+    comparison. CUSTOM conditions carry the whole check in target_value,
+    e.g. "kd_ratio >= 2" or "assists > 5", over any stat in STAT_NAMES.
+    Raises ValueError if the condition can't be compiled.
+    """
+    if condition.type == BetType.CUSTOM:
+        match = _CUSTOM_EXPRESSION.match(str(condition.target_value))
+        if not match or match.group(1) not in STAT_INDEX:
+            raise ValueError(
+                f"Custom condition must look like '<stat> <op> <number>' with stat in {STAT_NAMES}"
+            )
+        stat, comparison, target = match.groups()
+    else:
+        stat, comparison, target = TYPE_STATS[condition.type], condition.comparison, condition.target_value
+
+    if comparison not in OP_CODES:
+        raise ValueError(f"Unsupported comparison operator: {comparison}")
+    return STAT_INDEX[stat], OP_CODES[comparison], float(target)
+
+
+class CompiledConditions:
+    """
+    A bet's condition list compiled once into a predicate over match stats.
+    logic is "AND" (all conditions must hold) or "OR" (any).
+    """
+
+    def __init__(self, conditions: Sequence[BetCondition], logic: str = "AND"):
+        if logic not in ("AND", "OR"):
+            raise ValueError("Condition logic must be 'AND' or 'OR'")
+        self.logic = logic
+        self.clauses = [compile_condition(condition) for condition in conditions]
+        self._ops: List[Tuple[int, Callable, float]] = [
+            (stat, _OPERATOR_FUNCS[op], target) for stat, op, target in self.clauses
+        ]
+
+    def __call__(self, match_stats: Dict) -> bool:
+        return self.evaluate(stat_values(match_stats))
+
+    def evaluate(self, values: Sequence[float]) -> bool:
+        # A handful of clauses: plain float comparisons beat building arrays.
+        # NaN compares false under every operator but !=, so check it
+        if not self._ops:
+            return True
+        results = (
+            not math.isnan(values[stat]) and op(values[stat], target)
+            for stat, op, target in self._ops
+        )
+        return all(results) if self.logic == "AND" else any(results)
+
+
+def compile_conditions(conditions: Sequence[BetCondition], logic: str = "AND") -> CompiledConditions:
+    return CompiledConditions(conditions, logic)
+
+
+class MatchConditionBook:
+    """
+    Every open bet's compiled clauses for one match, laid out as flat arrays
+    so all bets can be checked against a match's stats in one vectorized
+    pass. Arrays are rebuilt lazily after bets are added or removed.
+    """
+
+    def __init__(self):
+        self._bets: Dict[int, CompiledConditions] = {}
+        self._dirty = True
+
+        self._bet_ids = np.empty(0, dtype=np.int64)
+        self._stats = np.empty(0, dtype=np.int64)
+        self._ops = np.empty(0, dtype=np.int8)
+        self._targets = np.empty(0, dtype=np.float64)
+        self._starts = np.empty(0, dtype=np.int64)
+        self._is_or = np.empty(0, dtype=bool)
+        self._empty = np.empty(0, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self._bets)
+
+    def add(self, bet_id: int, compiled: CompiledConditions) -> None:
+        self._bets[bet_id] = compiled
+        self._dirty = True
+
+    def remove(self, bet_id: int) -> None:
+        if self._bets.pop(bet_id, None) is not None:
+            self._dirty = True
+
+    def get(self, bet_id: int) -> Optional[CompiledConditions]:
+        return self._bets.get(bet_id)
+
+    def evaluate(self, match_stats: Dict) -> Dict[int, bool]:
+        """
+        Returns {bet_id: conditions_met} for every bet in the book.
+        """
+        if self._dirty:
+            self._rebuild()
+        if not len(self._bet_ids):
+            return {}
+
+        values = np.array(stat_values(match_stats))[self._stats]
+        clause_results = np.zeros(len(values), dtype=bool)
+        for code, np_op in enumerate(_NP_OPERATORS):
+            mask = self._ops == code
+            if mask.any():
+                clause_results[mask] = np_op(values[mask], self._targets[mask])
+        clause_results &= ~np.isnan(values)
+
+        # Per-bet reduction over contiguous clause runs
+        all_met = np.logical_and.reduceat(clause_results, self._starts)
+        any_met = np.logical_or.reduceat(clause_results, self._starts)
+        met = np.where(self._is_or, any_met, all_met) | self._empty
+        return dict(zip(self._bet_ids.tolist(), met.tolist()))
+
+    def _rebuild(self) -> None:
+        bet_ids, stats, ops, targets, starts, is_or, empty = [], [], [], [], [], [], []
+        for bet_id, compiled in self._bets.items():
+            # A bet with no clauses is trivially met; keep a placeholder clause
+            # so every bet owns at least one slot for reduceat
+            clauses = compiled.clauses or [(0, OP_CODES[">="], 0.0)]
+            bet_ids.append(bet_id)
+            starts.append(len(stats))
+            is_or.append(compiled.logic == "OR")
+            empty.append(not compiled.clauses)
+            for stat, op, target in clauses:
+                stats.append(stat)
+                ops.append(op)
+                targets.append(target)
+
+        self._bet_ids = np.array(bet_ids, dtype=np.int64)
+        self._stats = np.array(stats, dtype=np.int64)
+        self._ops = np.array(ops, dtype=np.int8)
+        self._targets = np.array(targets, dtype=np.float64)
+        self._starts = np.array(starts, dtype=np.int64)
+        self._is_or = np.array(is_or, dtype=bool)
+        self._empty = np.array(empty, dtype=bool)
+        self._dirty = False
+
+
+class ConditionEngine:
+    """
+    Compiled conditions for all open bets, grouped by match_id.
+    Bets are compiled once, when created or first loaded by a verification.
+    A verification evaluates every open bet on its match in one pass, so
+    the other bets its player won settle along with it.
+    """
+
+    def __init__(self):
+        self._books: Dict[str, MatchConditionBook] = {}
+        self._bet_matches: Dict[int, str] = {}
+
+    def register(
+        self,
+        bet_id: int,
+        match_id: str,
+        conditions: Sequence[BetCondition],
+        logic: str = "AND"
+    ) -> CompiledConditions:
+        compiled = compile_conditions(conditions, logic)
+        self.unregister(bet_id)
+        self._books.setdefault(match_id, MatchConditionBook()).add(bet_id, compiled)
+        self._bet_matches[bet_id] = match_id
+        return compiled
+
+    def unregister(self, bet_id: int) -> None:
+        match_id = self._bet_matches.pop(bet_id, None)
+        if match_id is None:
+            return
+        book = self._books[match_id]
+        book.remove(bet_id)
+        if not len(book):
+            del self._books[match_id]
+
+    def predicate(self, bet_id: int) -> Optional[CompiledConditions]:
+        match_id = self._bet_matches.get(bet_id)
+        return self._books[match_id].get(bet_id) if match_id is not None else None
+
+    def match_id(self, bet_id: int) -> Optional[str]:
+        return self._bet_matches.get(bet_id)
+
+    def evaluate_match(self, match_id: str, match_stats: Dict) -> Dict[int, bool]:
+        """
+        Check every open bet on a match against its extracted stats at once.
+        """
+        book = self._books.get(match_id)
+        return book.evaluate(match_stats) if book else {}
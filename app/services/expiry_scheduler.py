@@ -0,0 +1,183 @@
+import asyncio
+import heapq
+import logging
+import os
+import time
+from datetime import timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.schemas.bet_schemas import BetOut
+from app.services.bet_index import expires_at
+
+logger = logging.getLogger(__name__)
+
+ExpiryHandler = Callable[[List[int]], Awaitable[None]]
+
+
+def deadline_of(bet: BetOut) -> float:
+    """
+    Epoch seconds of a bet's join deadline (created_at is naive UTC).
+    """
+    deadline = expires_at(bet)
+    if deadline.tzinfo is None:
+        deadline = deadline.replace(tzinfo=timezone.utc)
+    return deadline.timestamp()
+
+
+class ExpiryScheduler:
+    """
+    Fires a handler with the ids of bets whose join deadline has passed.
+
+    Deadlines live in a binary heap, so scheduling is O(log n) and the next
+    deadline is always at the top. A single timer is armed for the earliest
+    deadline plus `resolution`, and every deadline that has passed by then
+    goes out in one call; wakeups are bounded by the number of distinct
+    deadline windows, not by the number of bets. Cancelling or rescheduling
+    only updates a dict, and the stale heap entry is skipped when it
+    surfaces (the heap is rebuilt if stale entries start to dominate).
+
+    The schedule is in memory only; on startup, reschedule the open bets
+    from the database.
+    """
+
+    def __init__(
+        self,
+        on_expire: ExpiryHandler,
+        resolution_ms: int = 1000,
+        max_batch: int = 500,
+        retry_seconds: float = 30.0
+    ):
+        self.on_expire = on_expire
+        self.resolution = resolution_ms / 1000
+        self.max_batch = max_batch
+        self.retry_seconds = retry_seconds
+
+        self._heap: List[Tuple[float, int]] = []
+        # bet_id -> current deadline; heap entries that disagree are stale
+        self._deadlines: Dict[int, float] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_at: Optional[float] = None
+        self._tasks: set = set()
+        self._running = False
+
+        self.wakeups = 0
+        self.expired = 0
+        self.failures = 0
+
+    @classmethod
+    def from_env(cls, on_expire: ExpiryHandler) -> "ExpiryScheduler":
+        return cls(
+            on_expire,
+            resolution_ms=int(os.getenv("BET_EXPIRY_RESOLUTION_MS", "1000")),
+            max_batch=int(os.getenv("BET_EXPIRY_MAX_BATCH", "500")),
+            retry_seconds=float(os.getenv("BET_EXPIRY_RETRY_SECONDS", "30")),
+        )
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    async def start(self) -> None:
+        self._running = True
+        self._arm()
+
+    async def stop(self) -> None:
+        self._running = False
+        self._disarm()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def schedule(self, bet_id: int, deadline: float) -> None:
+        """
+        Expire bet_id at `deadline` (epoch seconds), replacing any earlier
+        schedule for it.
+        """
+        self._deadlines[bet_id] = deadline
+        heapq.heappush(self._heap, (deadline, bet_id))
+        if self._running and (self._timer_at is None or deadline + self.resolution < self._timer_at):
+            self._arm()
+
+    def schedule_bet(self, bet: BetOut) -> None:
+        self.schedule(bet.id, deadline_of(bet))
+
+    def cancel(self, bet_id: int) -> None:
+        """
+        Forget a bet that was settled or otherwise closed before its deadline.
+        """
+        if self._deadlines.pop(bet_id, None) is None:
+            return
+        # Stale entries are dropped lazily; rebuild once they're the majority
+        if len(self._heap) > 1024 and len(self._heap) > 2 * len(self._deadlines):
+            self._heap = [(deadline, bet_id) for bet_id, deadline in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+    def stats(self) -> Dict:
+        return {
+            "scheduled": len(self._deadlines),
+            "heap_entries": len(self._heap),
+            "next_deadline": self._peek(),
+            "wakeups": self.wakeups,
+            "expired": self.expired,
+            "failures": self.failures,
+        }
+
+    def pop_due(self, now: float) -> List[int]:
+        """
+        Remove and return every bet whose deadline is at or before `now`.
+        """
+        due = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            deadline, bet_id = heapq.heappop(heap)
+            if self._deadlines.get(bet_id) == deadline:
+                del self._deadlines[bet_id]
+                due.append(bet_id)
+        return due
+
+    def _peek(self) -> Optional[float]:
+        # Skip stale entries so the timer isn't armed for a cancelled bet
+        heap = self._heap
+        while heap and self._deadlines.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def _arm(self) -> None:
+        self._disarm()
+        deadline = self._peek()
+        if deadline is None:
+            return
+        self._timer_at = deadline + self.resolution
+        loop = asyncio.get_running_loop()
+        self._timer = loop.call_later(max(0.0, self._timer_at - time.time()), self._fire)
+
+    def _disarm(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = None
+        self._timer_at = None
+
+    def _fire(self) -> None:
+        self._timer = None
+        self._timer_at = None
+        self.wakeups += 1
+        due = self.pop_due(time.time())
+        for start in range(0, len(due), self.max_batch):
+            self._spawn(self._expire(due[start:start + self.max_batch]))
+        self._arm()
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _expire(self, bet_ids: List[int]) -> None:
+        try:
+            await self.on_expire(bet_ids)
+            self.expired += len(bet_ids)
+        except Exception:
+            logger.exception("Error expiring bets %s...", bet_ids[:5])
+            self.failures += 1
+            retry_at = time.time() + self.retry_seconds
+            for bet_id in bet_ids:
+                if bet_id not in self._deadlines:
+                    self.schedule(bet_id, retry_at)
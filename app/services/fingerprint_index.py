@@ -0,0 +1,399 @@
+import asyncio
+import fcntl
+import io
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 256-bit dHash (16x16)
+HASH_WORDS = 4
+# The hash is split into 8 chunks of 32 bits. Two hashes within distance 7
+# agree exactly on at least one chunk (pigeonhole), so a query only scores
+# entries sharing a chunk value with it
+CHUNK_BITS = 32
+CHUNKS = 8
+MAX_RADIUS = CHUNKS - 1
+
+RECORD = np.dtype([
+    ("hash", "<u8", (HASH_WORDS,)),
+    ("bet_id", "<i8"),
+    ("user_id", "<i8"),
+    ("created_at", "<f8"),
+])
+
+_POPCOUNT8 = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+def screenshot_fingerprint(image_bytes: bytes, hash_size: int = 16) -> Optional[int]:
+    """
+    256-bit difference hash that survives re-encoding, rescaling and light
+    cropping. Unlike the OCR cache's dHash, the border trim tolerates JPEG
+    noise and neighbouring cells must differ by more than a few grey levels
+    to set a bit, so flat panels hash to stable zeros instead of noise.
+    Returns None if the bytes can't be decoded as an image.
+    """
+    try:
+        from PIL import Image, ImageChops
+
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            gray = img.convert("L")
+            background = Image.new("L", gray.size, gray.getpixel((0, 0)))
+            bbox = ImageChops.difference(gray, background).point(lambda v: 255 if v > 24 else 0).getbbox()
+            if bbox:
+                gray = gray.crop(bbox)
+            # BOX averages every source pixel, which also smooths compression noise
+            cells = np.asarray(gray.resize((hash_size + 1, hash_size), Image.BOX), dtype=np.int16)
+    except Exception:
+        return None
+
+    bits = (cells[:, :-1] - cells[:, 1:]) > 4
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def fingerprint_key(phash: int) -> str:
+    """
+    Hex form of a fingerprint; 64 characters, the size of a SHA-256 digest.
+    """
+    return f"{phash:0{HASH_WORDS * 16}x}"
+
+
+def hash_words(value: int) -> np.ndarray:
+    return np.array(
+        [(value >> (64 * (HASH_WORDS - 1 - word))) & 0xFFFFFFFFFFFFFFFF for word in range(HASH_WORDS)],
+        dtype=np.uint64,
+    )
+
+
+def chunk_column(words: np.ndarray, chunk: int) -> np.ndarray:
+    """
+    Value of one chunk for each hash; words is (n, HASH_WORDS).
+    """
+    per_word = 64 // CHUNK_BITS
+    shift = np.uint64(64 - CHUNK_BITS * (chunk % per_word + 1))
+    return ((words[:, chunk // per_word] >> shift) & np.uint64((1 << CHUNK_BITS) - 1)).astype(np.uint32)
+
+
+def hamming(words: np.ndarray, query: np.ndarray) -> np.ndarray:
+    diff = np.bitwise_xor(words, query)
+    if hasattr(np, "bitwise_count"):
+        counts = np.bitwise_count(diff)
+        # Adding the columns beats a sum over the short axis
+        distances = counts[:, 0].astype(np.int64)
+        for word in range(1, HASH_WORDS):
+            distances += counts[:, word]
+        return distances
+    return _POPCOUNT8[diff.view(np.uint8)].reshape(len(diff), -1).sum(axis=1, dtype=np.int64)
+
+
+class FingerprintIndex:
+    """
+    On-disk index of screenshot perceptual hashes for reuse detection.
+
+    Entries are appended to records.bin (fixed-size records, memory-mapped
+    read-only by every worker, so the page cache holds one copy). A sealed
+    multi-index covers the first `sealed` records: per chunk, the chunk
+    values in sorted order alongside their record ids. A radius query
+    binary-searches CHUNKS runs and scores only those candidates, plus a
+    linear scan of the unsealed tail. Once the tail passes
+    compact_threshold, the index is rebuilt in a thread and swapped in
+    through manifest.json; readers pick it up on their next query.
+
+    Appends take an exclusive flock, so several workers can share a
+    directory. Everything here blocks on file I/O; call it from an
+    executor, not the event loop.
+    """
+
+    def __init__(self, directory: str, compact_threshold: int = 20_000):
+        self.directory = directory
+        self.compact_threshold = compact_threshold
+        os.makedirs(directory, exist_ok=True)
+        self._records_path = os.path.join(directory, "records.bin")
+        self._manifest_path = os.path.join(directory, "manifest.json")
+        self._lock_path = os.path.join(directory, "append.lock")
+        self._compact_lock_path = os.path.join(directory, "compact.lock")
+        open(self._records_path, "ab").close()
+
+        self._records: Optional[np.ndarray] = None
+        self._records_size = -1
+        self._manifest_mtime = None
+        self._sealed = 0
+        self._keys: Optional[np.ndarray] = None
+        self._ids: Optional[np.ndarray] = None
+        # Contiguous copy of the unsealed hashes; records are 56 bytes apart
+        self._tail = np.empty((0, HASH_WORDS), dtype=np.uint64)
+        self._compacting = False
+        # Set on the thread holding the append lock, so add() doesn't take it twice
+        self._held = threading.local()
+        # Executor threads take turns swapping in the mapped tables
+        self._state_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return os.path.getsize(self._records_path) // RECORD.itemsize
+
+    def add(self, phash: int, bet_id: int, user_id: int, created_at: Optional[float] = None) -> None:
+        record = np.zeros(1, dtype=RECORD)
+        record["hash"][0] = hash_words(phash)
+        record["bet_id"] = bet_id
+        record["user_id"] = user_id
+        record["created_at"] = created_at if created_at is not None else time.time()
+        self.add_many(record)
+
+    def add_many(self, records: np.ndarray) -> None:
+        """
+        Append a RECORD array; used for bulk loads.
+        """
+        with self.exclusive():
+            with open(self._records_path, "ab") as f:
+                f.write(records.astype(RECORD, copy=False).tobytes())
+
+    @contextmanager
+    def exclusive(self):
+        """
+        Hold the append lock, e.g. across a query and the add that depends
+        on it, so two workers can't both miss each other's entry.
+        """
+        if getattr(self._held, "value", False):
+            yield
+            return
+        with open(self._lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._held.value = True
+            try:
+                yield
+            finally:
+                self._held.value = False
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def query(self, phash: int, radius: int) -> List[Dict]:
+        """
+        Entries within Hamming distance radius (at most MAX_RADIUS) of phash.
+        """
+        if radius > MAX_RADIUS:
+            raise ValueError(f"radius must be at most {MAX_RADIUS}")
+        with self._state_lock:
+            return self._query(phash, radius)
+
+    def _query(self, phash: int, radius: int) -> List[Dict]:
+        self._refresh()
+        if self._records is None or not len(self._records):
+            return []
+
+        query = hash_words(phash)
+        words = self._records["hash"]
+        hits = []
+        if self._sealed:
+            runs = []
+            for chunk in range(CHUNKS):
+                value = chunk_column(query[np.newaxis], chunk)[0]
+                keys = self._keys[chunk]
+                start, end = keys.searchsorted(value, "left"), keys.searchsorted(value, "right")
+                if end > start:
+                    runs.append(self._ids[chunk, start:end])
+            if runs:
+                candidates = np.unique(np.concatenate(runs)).astype(np.int64)
+                distances = hamming(words[candidates], query)
+                hits.extend(zip(candidates[distances <= radius], distances[distances <= radius]))
+
+        distances = hamming(self._tail, query)
+        (tail,) = np.nonzero(distances <= radius)
+        hits.extend(zip(tail + self._sealed, distances[tail]))
+
+        return [
+            {
+                "bet_id": int(self._records["bet_id"][index]),
+                "user_id": int(self._records["user_id"][index]),
+                "created_at": float(self._records["created_at"][index]),
+                "distance": int(distance),
+                "fingerprint": fingerprint_key(
+                    int.from_bytes(words[index].astype(">u8").tobytes(), "big")
+                ),
+            }
+            for index, distance in hits
+        ]
+
+    def maybe_compact(self) -> None:
+        """
+        Start a background compaction once the unsealed tail is long enough.
+        """
+        if self._compacting or len(self) - self._sealed < self.compact_threshold:
+            return
+        self._compacting = True
+        asyncio.get_running_loop().run_in_executor(None, self._compact_in_background)
+
+    def compact(self) -> None:
+        """
+        Seal every record appended so far. CPU-bound; run it off the loop.
+        Appends carry on meanwhile and land in the next tail.
+        """
+        with open(self._compact_lock_path, "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Another worker is already compacting
+                return
+            try:
+                count = len(self)
+                previous = self._read_manifest() or {}
+                if not count or previous.get("sealed") == count:
+                    return
+                words = np.memmap(self._records_path, dtype=RECORD, mode="r", shape=(count,))["hash"]
+
+                keys = np.empty((CHUNKS, count), dtype=np.uint32)
+                ids = np.empty((CHUNKS, count), dtype=np.uint32)
+                for chunk in range(CHUNKS):
+                    values = chunk_column(words, chunk)
+                    ids[chunk] = np.argsort(values, kind="stable")
+                    keys[chunk] = values[ids[chunk]]
+
+                keys_name, ids_name = f"keys-{count}.npy", f"ids-{count}.npy"
+                np.save(os.path.join(self.directory, keys_name), keys)
+                np.save(os.path.join(self.directory, ids_name), ids)
+                retired = [previous["keys"], previous["ids"]] if previous else []
+                temporary = self._manifest_path + ".tmp"
+                with open(temporary, "w") as f:
+                    json.dump({"sealed": count, "keys": keys_name, "ids": ids_name, "retired": retired}, f)
+                os.replace(temporary, self._manifest_path)
+                # A worker may have read the previous manifest and not loaded
+                # its tables yet, so those are only removed by the next
+                # compaction. Workers that have them mapped keep reading them.
+                for name in previous.get("retired", []):
+                    if name not in (keys_name, ids_name):
+                        try:
+                            os.remove(os.path.join(self.directory, name))
+                        except FileNotFoundError:
+                            pass
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def stats(self) -> Dict:
+        return {"entries": len(self), "sealed": self._sealed}
+
+    def _compact_in_background(self) -> None:
+        try:
+            self.compact()
+        except Exception as e:
+            logger.error("Error compacting fingerprint index: %s", e)
+        finally:
+            self._compacting = False
+
+    def _read_manifest(self) -> Optional[Dict]:
+        try:
+            with open(self._manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _refresh(self) -> None:
+        changed = False
+        size = os.path.getsize(self._records_path)
+        if size != self._records_size:
+            count = size // RECORD.itemsize
+            self._records = np.memmap(self._records_path, dtype=RECORD, mode="r", shape=(count,)) if count else None
+            self._records_size = size
+            changed = True
+
+        try:
+            mtime = os.stat(self._manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime is not None and mtime != self._manifest_mtime:
+            self._load_manifest()
+            self._manifest_mtime = mtime
+            changed = True
+
+        if changed and self._records is not None:
+            self._tail = np.ascontiguousarray(self._records["hash"][self._sealed:])
+
+    def _load_manifest(self) -> None:
+        for attempt in range(3):
+            manifest = self._read_manifest()
+            try:
+                keys = np.load(os.path.join(self.directory, manifest["keys"]), mmap_mode="r")
+                ids = np.load(os.path.join(self.directory, manifest["ids"]), mmap_mode="r")
+                break
+            except FileNotFoundError:
+                # Retired while this worker was stalled; a newer manifest is in place
+                if attempt == 2:
+                    raise
+        self._keys, self._ids, self._sealed = keys, ids, manifest["sealed"]
+
+
+class ScreenshotReuseDetector:
+    """
+    Flags a verification upload whose screenshot was already submitted
+    for a different bet, before it reaches the model. Both participants
+    of one bet uploading the same post-game screen is expected.
+
+    Matching is perceptual, so re-encoded, rescaled or cropped copies are
+    caught. A 16x16 hash can't see a single changed digit, so a match is
+    "same screen or nearly so": flag by default, and reject only where
+    that trade-off is acceptable.
+    """
+
+    def __init__(self, index: FingerprintIndex, radius: int = 4, reject: bool = False):
+        self.index = index
+        self.radius = radius
+        self.reject = reject
+
+        self.checked = 0
+        self.flagged = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["ScreenshotReuseDetector"]:
+        directory = os.getenv("FINGERPRINT_INDEX_DIR")
+        if not directory:
+            return None
+        return cls(
+            FingerprintIndex(
+                directory,
+                compact_threshold=int(os.getenv("FINGERPRINT_COMPACT_THRESHOLD", "20000")),
+            ),
+            radius=int(os.getenv("FINGERPRINT_MAX_DISTANCE", "4")),
+            reject=os.getenv("FINGERPRINT_REUSE_ACTION", "flag") == "reject",
+        )
+
+    async def check(self, image_bytes: bytes, bet_id: int, user_id: int) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Record the screenshot and return earlier submissions of it for a
+        different bet (an empty list means no reuse), and the fingerprint
+        of the earliest submission of the same screen, this one included,
+        as a stable key for the match. The key is None if the screenshot
+        can't be decoded.
+        """
+        loop = asyncio.get_running_loop()
+        reused = await loop.run_in_executor(None, self._check, bytes(image_bytes), bet_id, user_id)
+        self.index.maybe_compact()
+        return reused
+
+    def _check(self, image_bytes: bytes, bet_id: int, user_id: int) -> Tuple[List[Dict], Optional[str]]:
+        phash = screenshot_fingerprint(image_bytes)
+        if phash is None:
+            return [], None
+
+        # Another worker could add the same screen between the query and the add
+        with self.index.exclusive():
+            matches = self.index.query(phash, self.radius)
+            reused = [match for match in matches if match["bet_id"] != bet_id]
+            resubmitted = any(
+                (match["bet_id"], match["user_id"]) == (bet_id, user_id) for match in matches
+            )
+            if not resubmitted and not (reused and self.reject):
+                # Retries of the same submission aren't added again, rejected ones never
+                self.index.add(phash, bet_id, user_id)
+
+        self.checked += 1
+        if reused:
+            self.flagged += 1
+        first = min(matches, key=lambda match: match["created_at"], default=None)
+        return reused, first["fingerprint"] if first else fingerprint_key(phash)
+
+    def stats(self) -> Dict:
+        return {"checked": self.checked, "flagged": self.flagged, **self.index.stats()}
@@ -0,0 +1,222 @@
+import asyncio
+import binascii
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# The vision model downsamples to fit 2048px and then to 768px on the short
+# side, so anything above that only costs upload bytes
+MAX_LONG_SIDE = 2048
+MAX_SHORT_SIDE = 768
+
+# Multiple of 3 so chunked base64 output concatenates without padding
+_BASE64_CHUNK = 3 * 64 * 1024
+
+
+def sniff_mime_type(image_bytes: bytes) -> str:
+    """
+    Detect the image MIME type from its magic bytes.
+    Unknown formats keep the old image/jpeg label.
+    """
+    if image_bytes[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if image_bytes[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+        return "image/webp"
+    if image_bytes[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return "image/jpeg"
+
+
+def encode_data_url(image_data, mime_type: str) -> str:
+    """
+    Build a base64 data URL in one preallocated buffer instead of going
+    through a base64 bytes copy, a decoded str copy and an f-string copy.
+    """
+    prefix = f"data:{mime_type};base64,".encode()
+    encoded_size = 4 * ((len(image_data) + 2) // 3)
+    output = bytearray(len(prefix) + encoded_size)
+    output[:len(prefix)] = prefix
+
+    view = memoryview(image_data)
+    position = len(prefix)
+    for start in range(0, len(view), _BASE64_CHUNK):
+        encoded = binascii.b2a_base64(view[start:start + _BASE64_CHUNK], newline=False)
+        output[position:position + len(encoded)] = encoded
+        position += len(encoded)
+
+    return output.decode("ascii")
+
+
+def find_scoreboard_region(img) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Locate the scoreboard as the densest block of edges on screen.
+    Post-game screens are a text-heavy table over a mostly flat or blurred
+    background, so rows and columns with many edges bound the table.
+    Returns a (left, top, right, bottom) box, or None to keep the full frame.
+    """
+    from PIL import Image, ImageFilter
+
+    probe_width = 256
+    scale = img.width / probe_width
+    probe = img.convert("L").resize((probe_width, max(1, int(img.height / scale))))
+    edges = probe.filter(ImageFilter.FIND_EDGES).point(lambda p: 255 if p > 40 else 0)
+
+    # Box-downsampling to a single row/column averages edge pixels per line.
+    # FIND_EDGES always lights up the frame border, so drop the outer lines.
+    width, height = edges.size
+    row_density = list(edges.resize((1, height), Image.BOX).tobytes())[1:-1]
+    col_density = list(edges.resize((width, 1), Image.BOX).tobytes())[1:-1]
+    if not row_density or not col_density:
+        return None
+
+    def span(density, threshold_ratio=0.15):
+        threshold = max(density) * threshold_ratio
+        active = [i for i, value in enumerate(density) if value > threshold]
+        if not active:
+            return None
+        return active[0], active[-1] + 1
+
+    rows = span(row_density)
+    cols = span(col_density)
+    if not rows or not cols:
+        return None
+
+    # Only crop when it meaningfully shrinks the frame; never trust a tiny box
+    area_ratio = ((rows[1] - rows[0]) * (cols[1] - cols[0])) / (width * height)
+    if area_ratio < 0.25 or area_ratio > 0.9:
+        return None
+
+    # +1 restores the dropped border line, the rest is a safety margin
+    margin = 4
+    return (
+        max(0, int((cols[0] + 1 - margin) * scale)),
+        max(0, int((rows[0] + 1 - margin) * scale)),
+        min(img.width, int((cols[1] + 1 + margin) * scale)),
+        min(img.height, int((rows[1] + 1 + margin) * scale)),
+    )
+
+
+def _load_pillow() -> None:
+    # Runs in each pool worker during warm-up
+    from PIL import Image, ImageFilter  # noqa: F401
+
+
+def preprocess_screenshot(
+    image_bytes: bytes,
+    output_format: str = "JPEG",
+    quality: int = 80,
+    crop: bool = True,
+) -> Tuple[bytes, str]:
+    """
+    Decode, crop to the scoreboard, downscale to what the model actually
+    reads and re-encode compactly. Returns (image_bytes, mime_type).
+    CPU-bound; run it through ImagePreprocessor off the event loop.
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        img = img.convert("RGB")
+
+        if crop:
+            region = find_scoreboard_region(img)
+            if region:
+                img = img.crop(region)
+
+        long_side, short_side = max(img.size), min(img.size)
+        scale = min(1.0, MAX_LONG_SIDE / long_side, MAX_SHORT_SIDE / short_side)
+        if scale < 1.0:
+            img = img.resize(
+                (int(img.width * scale), int(img.height * scale)),
+                Image.LANCZOS
+            )
+
+        output = io.BytesIO()
+        img.save(output, format=output_format, quality=quality)
+
+    encoded = output.getvalue()
+    # Small already-compressed uploads can grow when re-encoded
+    if len(encoded) >= len(image_bytes):
+        return image_bytes, sniff_mime_type(image_bytes)
+    return encoded, f"image/{output_format.lower()}"
+
+
+class ImagePreprocessor:
+    """
+    Runs preprocess_screenshot in a process pool so decode/resize doesn't
+    block the event loop. Falls back to the original bytes if the upload
+    can't be decoded.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        output_format: str = "JPEG",
+        quality: int = 80,
+        crop: bool = True,
+        enabled: bool = True,
+    ):
+        self.max_workers = max_workers
+        self.output_format = output_format
+        self.quality = quality
+        self.crop = crop
+        self.enabled = enabled
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def from_env(cls) -> "ImagePreprocessor":
+        workers = os.getenv("IMAGE_PREPROCESS_WORKERS")
+        return cls(
+            max_workers=int(workers) if workers else None,
+            output_format=os.getenv("IMAGE_PREPROCESS_FORMAT", "JPEG").upper(),
+            quality=int(os.getenv("IMAGE_PREPROCESS_QUALITY", "80")),
+            crop=os.getenv("IMAGE_PREPROCESS_CROP", "true").lower() == "true",
+            enabled=os.getenv("IMAGE_PREPROCESS_ENABLED", "true").lower() == "true",
+        )
+
+    async def process(self, image_bytes: bytes) -> Tuple[bytes, str]:
+        """
+        Returns (image_bytes, mime_type) ready to send to the vision model.
+        """
+        if not self.enabled:
+            return image_bytes, sniff_mime_type(image_bytes)
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor,
+                preprocess_screenshot,
+                image_bytes,
+                self.output_format,
+                self.quality,
+                self.crop,
+            )
+        except Exception:
+            logger.exception("Error preprocessing screenshot, sending it unprocessed")
+            return image_bytes, sniff_mime_type(image_bytes)
+
+    async def warm(self) -> None:
+        """
+        Start the worker processes and load Pillow in them before the
+        first screenshot arrives.
+        """
+        if not self.enabled:
+            return
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        loop = asyncio.get_running_loop()
+        workers = self.max_workers or os.cpu_count() or 1
+        await asyncio.gather(*(loop.run_in_executor(self._executor, _load_pillow) for _ in range(workers)))
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
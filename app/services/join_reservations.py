@@ -0,0 +1,268 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Iterable, Optional, Set
+
+from app.services.bet_repository import BetJoinRejected
+
+RESERVED = "reserved"
+FULL = "full"
+ALREADY_JOINED = "already_joined"
+
+
+class InMemoryReservationBackend:
+    """
+    Single-process reservation store. Each operation runs without awaiting,
+    so it is atomic on the event loop without any lock.
+    """
+
+    def __init__(self):
+        self._joined: Dict[int, Set[int]] = {}
+        # bet_id -> user_id -> expiry (epoch seconds)
+        self._reserved: Dict[int, Dict[int, float]] = {}
+
+    async def reserve(
+        self,
+        bet_id: int,
+        user_id: int,
+        participants: Iterable[int],
+        capacity: int,
+        ttl_seconds: float
+    ) -> str:
+        now = time.time()
+        joined = self._joined.setdefault(bet_id, set())
+        joined.update(participants)
+        reserved = self._reserved.setdefault(bet_id, {})
+        for expired in [user for user, expiry in reserved.items() if expiry <= now]:
+            del reserved[expired]
+
+        if user_id in joined or user_id in reserved:
+            return ALREADY_JOINED
+        if len(joined) + len(reserved) >= capacity:
+            return FULL
+        reserved[user_id] = now + ttl_seconds
+        return RESERVED
+
+    async def extend(self, bet_id: int, user_id: int, expiry: float) -> bool:
+        reserved = self._reserved.get(bet_id, {})
+        if reserved.get(user_id, 0) <= time.time():
+            return False
+        reserved[user_id] = expiry
+        return True
+
+    async def confirm(self, bet_id: int, user_id: int) -> bool:
+        expiry = self._reserved.get(bet_id, {}).pop(user_id, None)
+        if expiry is None or expiry <= time.time():
+            return False
+        self._joined.setdefault(bet_id, set()).add(user_id)
+        return True
+
+    async def release(self, bet_id: int, user_id: int) -> None:
+        self._reserved.get(bet_id, {}).pop(user_id, None)
+
+    async def leave(self, bet_id: int, user_id: int) -> None:
+        self._joined.get(bet_id, set()).discard(user_id)
+
+    async def forget(self, bet_id: int) -> None:
+        self._joined.pop(bet_id, None)
+        self._reserved.pop(bet_id, None)
+
+
+# KEYS: joined set, reservations zset (scored by expiry)
+# ARGV: user_id, now, expiry, capacity, key_ttl, participants...
+_RESERVE_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', ARGV[2])
+if #ARGV > 5 then
+    redis.call('SADD', KEYS[1], unpack(ARGV, 6))
+end
+if redis.call('SISMEMBER', KEYS[1], ARGV[1]) == 1 or redis.call('ZSCORE', KEYS[2], ARGV[1]) then
+    return 'already_joined'
+end
+if redis.call('SCARD', KEYS[1]) + redis.call('ZCARD', KEYS[2]) >= tonumber(ARGV[4]) then
+    return 'full'
+end
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+redis.call('EXPIRE', KEYS[2], ARGV[5])
+return 'reserved'
+"""
+
+# KEYS: joined set, reservations zset; ARGV: user_id, now, new expiry (extend only)
+_EXTEND_SCRIPT = """
+local expiry = redis.call('ZSCORE', KEYS[2], ARGV[1])
+if not expiry or tonumber(expiry) <= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[1])
+return 1
+"""
+
+_CONFIRM_SCRIPT = """
+local expiry = redis.call('ZSCORE', KEYS[2], ARGV[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+if not expiry or tonumber(expiry) <= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('SADD', KEYS[1], ARGV[1])
+return 1
+"""
+
+
+class RedisReservationBackend:
+    """
+    Reservation store shared by every uvicorn worker. The claim runs as a
+    Lua script, so check-and-reserve is atomic per bet without a lock.
+    """
+
+    def __init__(self, redis_url: str, prefix: str = "join:", key_ttl: int = 86400):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(redis_url)
+        self.prefix = prefix
+        self.key_ttl = key_ttl
+        self._reserve = self.client.register_script(_RESERVE_SCRIPT)
+        self._extend = self.client.register_script(_EXTEND_SCRIPT)
+        self._confirm = self.client.register_script(_CONFIRM_SCRIPT)
+
+    def _keys(self, bet_id: int):
+        return self.prefix + f"{bet_id}:joined", self.prefix + f"{bet_id}:reserved"
+
+    async def reserve(
+        self,
+        bet_id: int,
+        user_id: int,
+        participants: Iterable[int],
+        capacity: int,
+        ttl_seconds: float
+    ) -> str:
+        now = time.time()
+        result = await self._reserve(
+            keys=list(self._keys(bet_id)),
+            args=[user_id, now, now + ttl_seconds, capacity, self.key_ttl, *participants]
+        )
+        return result.decode() if isinstance(result, bytes) else result
+
+    async def extend(self, bet_id: int, user_id: int, expiry: float) -> bool:
+        return bool(await self._extend(keys=list(self._keys(bet_id)), args=[user_id, time.time(), expiry]))
+
+    async def confirm(self, bet_id: int, user_id: int) -> bool:
+        return bool(await self._confirm(keys=list(self._keys(bet_id)), args=[user_id, time.time()]))
+
+    async def release(self, bet_id: int, user_id: int) -> None:
+        await self.client.zrem(self._keys(bet_id)[1], user_id)
+
+    async def leave(self, bet_id: int, user_id: int) -> None:
+        await self.client.srem(self._keys(bet_id)[0], user_id)
+
+    async def forget(self, bet_id: int) -> None:
+        await self.client.delete(*self._keys(bet_id))
+
+
+class JoinReservations:
+    """
+    Per-bet participant slot reservations for the join path.
+
+    A joiner claims a slot before the on-chain transfer and either confirms
+    it once the transfer lands or releases it if the transfer fails. A
+    reservation that is never confirmed or released (e.g. the worker died
+    mid-join) expires after ttl_seconds; hold() keeps it alive while a
+    slow transfer is in flight. An expired reservation can't be confirmed,
+    since its slot may have gone to someone else. Claims on different bets
+    never contend with each other.
+    """
+
+    def __init__(self, backend=None, ttl_seconds: float = 60.0):
+        self.backend = backend or InMemoryReservationBackend()
+        self.ttl_seconds = ttl_seconds
+
+        self.reserved = 0
+        self.rejected_full = 0
+        self.released = 0
+        self.expired = 0
+
+    @classmethod
+    def from_env(cls) -> "JoinReservations":
+        backend = None
+        if os.getenv("JOIN_RESERVATION_BACKEND", "memory") == "redis":
+            backend = RedisReservationBackend(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+        return cls(
+            backend=backend,
+            ttl_seconds=float(os.getenv("JOIN_RESERVATION_TTL_SECONDS", "60")),
+        )
+
+    async def reserve(
+        self,
+        bet_id: int,
+        user_id: int,
+        participants: Iterable[int],
+        capacity: int,
+        ttl_seconds: Optional[float] = None
+    ) -> None:
+        """
+        Claim a slot for user_id. participants is the bet's known participant
+        list; the store keeps the union, so a stale read can't free a slot.
+        Raises BetJoinRejected if the bet is full or the user already joined.
+        """
+        result = await self.backend.reserve(
+            bet_id, user_id, list(participants), capacity, ttl_seconds or self.ttl_seconds
+        )
+        if result == FULL:
+            self.rejected_full += 1
+            raise BetJoinRejected("Bet is full")
+        if result == ALREADY_JOINED:
+            raise BetJoinRejected("Already joined this bet")
+        self.reserved += 1
+
+    @asynccontextmanager
+    async def hold(self, bet_id: int, user_id: int) -> AsyncIterator[None]:
+        """
+        Keep user_id's reservation from expiring while the body runs, by
+        extending it every third of the TTL.
+        """
+        async def keep_alive():
+            while True:
+                await asyncio.sleep(self.ttl_seconds / 3)
+                if not await self.backend.extend(bet_id, user_id, time.time() + self.ttl_seconds):
+                    return
+
+        task = asyncio.create_task(keep_alive())
+        try:
+            yield
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def confirm(self, bet_id: int, user_id: int) -> bool:
+        """
+        Turn the reservation into a participant slot. Returns False, without
+        taking a slot, if the reservation expired or was never made.
+        """
+        if await self.backend.confirm(bet_id, user_id):
+            return True
+        self.expired += 1
+        return False
+
+    async def release(self, bet_id: int, user_id: int) -> None:
+        self.released += 1
+        await self.backend.release(bet_id, user_id)
+
+    async def leave(self, bet_id: int, user_id: int) -> None:
+        """
+        Free a confirmed slot again, e.g. when recording the join failed.
+        """
+        await self.backend.leave(bet_id, user_id)
+
+    async def forget(self, bet_id: int) -> None:
+        """
+        Drop all state for a bet that was settled or expired.
+        """
+        await self.backend.forget(bet_id)
+
+    def stats(self) -> Dict:
+        return {
+            "reserved": self.reserved,
+            "rejected_full": self.rejected_full,
+            "released": self.released,
+            "expired": self.expired,
+        }
@@ -1,31 +1,138 @@
-import base64
+import asyncio
+import importlib
+import logging
 import os
-from typing import Dict, Optional
-from openai import AsyncOpenAI
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional
 import json
+from app.services.ocr_cache import OCRResultCache
+from app.services.image_preprocessing import ImagePreprocessor, encode_data_url
+from app.services.local_ocr import LocalOCRExtractor
+from app.services.stats_parser import normalize_stats, parse_json, validate_match_stats
+from app.schemas.stats_schemas import MatchStats, MatchStatsBatch
+from app.services.vision_limiter import VisionRateLimiter, VisionRequestShed
+from app.services.metrics import IN_FLIGHT, OPENAI_REQUEST_SECONDS, OPENAI_TOKENS, STAGE_SECONDS
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, RateLimitError
+
+logger = logging.getLogger(__name__)
 
 class LLMOCRService:
-    def __init__(self, api_key: str = None):
+    def __init__(
+        self,
+        api_key: str = None,
+        cache: Optional[OCRResultCache] = None,
+        preprocessor: Optional[ImagePreprocessor] = None,
+        local_ocr: Optional[LocalOCRExtractor] = None,
+        limiter: Optional[VisionRateLimiter] = None
+    ):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
-        self.client = AsyncOpenAI(api_key=self.api_key)
+        # Built on first use or by warm(); the SDK import alone takes ~0.5s
+        self._client: Optional["AsyncOpenAI"] = None
+        # Paces calls to the account quota and adapts concurrency to 429s
+        self.limiter = limiter or VisionRateLimiter.from_env()
+        self.max_attempts = int(os.getenv("OPENAI_MAX_ATTEMPTS", "3"))
+        # Prompt tokens billed per attached image, for quota accounting
+        self.tokens_per_image = int(os.getenv("OPENAI_TOKENS_PER_IMAGE", "765"))
+        # Same screenshot is often uploaded by both participants or retried
+        self.cache = cache if cache is not None else OCRResultCache.from_env()
+        # Crop/downscale/re-encode phone screenshots before upload
+        self.preprocessor = preprocessor or ImagePreprocessor.from_env()
+        # Known scoreboard layouts are read locally; None sends everything to the model
+        self.local_ocr = local_ocr if local_ocr is not None else LocalOCRExtractor.from_env()
+        self.model = os.getenv("OPENAI_MODEL", "gpt-4-vision-preview")
+        self.max_tokens = int(os.getenv("OPENAI_MAX_TOKENS", "500"))
+        # json_schema for models with structured outputs, json_object for
+        # JSON mode, none for models that support neither
+        self.response_format = os.getenv("OPENAI_RESPONSE_FORMAT", "none")
+        self.repaired = 0
         
-        # System prompt for consistent formatting
-        self.system_prompt = """You are a specialized AI for analyzing Call of Duty match result screens.
-        Extract and return the following information in a consistent JSON format:
-        - Team scores
-        - Player stats (kills, deaths, assists)
-        - Game mode
-        - Map name
-        Be precise and only return valid JSON."""
-
-    async def process_image(self, image_bytes: bytes) -> Optional[Dict]:
+        # System prompt for consistent formatting; the schema is the exact
+        # shape MatchStats validates, so no reshaping is needed
+        self.system_prompt = f"""You are a specialized AI for analyzing Call of Duty match result screens.
+        Extract the team scores, the player's stats (kills, deaths, assists), the game mode and the map name.
+        Return only a JSON object matching this JSON schema, with no code fences or commentary:
+        {json.dumps(MatchStats.model_json_schema(), separators=(",", ":"))}"""
+
+    @property
+    def client(self) -> "AsyncOpenAI":
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            # Retries go through the limiter, so the client must not retry 429s itself
+            self._client = AsyncOpenAI(api_key=self.api_key, max_retries=0)
+        return self._client
+
+    @client.setter
+    def client(self, client: "AsyncOpenAI") -> None:
+        self._client = client
+
+    async def warm(self) -> None:
+        """
+        Start the preprocessing and local OCR workers, import the SDK off
+        the event loop and open a pooled TLS connection to the API, so the
+        first verification pays for none of it. close() shuts the pools
+        down again.
+        """
+        warm = [self.preprocessor.warm(), self._warm_client()]
+        if self.local_ocr is not None:
+            warm.append(self.local_ocr.warm())
+        await asyncio.gather(*warm)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+        self.preprocessor.shutdown()
+        if self.local_ocr is not None:
+            self.local_ocr.shutdown()
+
+    async def _warm_client(self) -> None:
+        await self._import_sdk()
+        from openai import APIStatusError
+
+        try:
+            await self.client.with_options(timeout=10.0).models.retrieve(self.model)
+        except APIStatusError:
+            # Any HTTP answer means the connection is up
+            pass
+
+    async def _import_sdk(self) -> None:
+        # In a thread, so the event loop keeps serving; a second caller
+        # waits on the import lock there, not on the loop
+        if self._client is None:
+            await asyncio.get_running_loop().run_in_executor(None, importlib.import_module, "openai")
+
+    async def process_image(
+        self,
+        image_bytes: bytes,
+        digest: Optional[str] = None,
+        check_cache: bool = True,
+        use_local: bool = True,
+        priority: float = 0.0,
+        deadline: Optional[float] = None
+    ) -> Optional[Dict]:
         """
         Process a COD stat screen image using ChatGPT Vision API.
+        Results are served from the OCR cache when the same screen was seen before,
+        and known scoreboard layouts are read locally without a model call.
+        priority and deadline (time.monotonic()) order and bound the wait for
+        a model slot; VisionRequestShed is raised if the deadline can't be met.
         """
         try:
-            # Convert image bytes to base64
-            encoded_image = base64.b64encode(image_bytes).decode()
-            
+            if check_cache:
+                cached = await self.cache.get(image_bytes, digest)
+                if cached is not None:
+                    return cached
+
+            if use_local and self.local_ocr is not None:
+                local = await self._process_locally(image_bytes, digest)
+                if local is not None:
+                    return local
+
+            image_part = await self._image_part(image_bytes)
+
             # Prepare the message for GPT-4 Vision
             messages = [
                 {
@@ -39,115 +146,275 @@ class LLMOCRService:
                             "type": "text",
                             "text": "Analyze this Call of Duty match result screen and extract the key statistics in JSON format."
                         },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{encoded_image}"
-                            }
-                        }
+                        image_part
                     ]
                 }
             ]
 
             # Call GPT-4 Vision API
-            response = await self.client.chat.completions.create(
-                model="gpt-4-vision-preview",
+            response = await self._complete(
+                priority,
+                deadline,
                 messages=messages,
-                max_tokens=500,
-                temperature=0.1  # Low temperature for consistent formatting
+                max_tokens=self.max_tokens,
+                temperature=0.1,  # Low temperature for consistent formatting
+                **self._response_format_kwargs(MatchStats)
             )
 
-            # Extract and parse the JSON response
+            # Extract and parse the JSON response, repairing it if cut off
             try:
-                content = response.choices[0].message.content
-                # Find JSON content between triple backticks if present
-                if "```json" in content:
-                    json_str = content.split("```json")[1].split("```")[0]
-                else:
-                    json_str = content
-                
-                stats = json.loads(json_str)
-                return self._normalize_stats(stats)
+                stats, repaired = self._extract_json(response.choices[0].message.content)
             except json.JSONDecodeError:
-                print("Failed to parse JSON from GPT response")
+                logger.warning("Failed to parse JSON from GPT response")
                 return None
 
+            normalized = normalize_stats(stats)
+            # A repaired reply that lost required fields would be served
+            # from the cache on every retry; only keep it if it validates
+            if not repaired or validate_match_stats(normalized) is not None:
+                await self.cache.set(image_bytes, normalized, digest)
+            return normalized
+
+        except VisionRequestShed:
+            raise
         except Exception as e:
-            print(f"Error processing image with ChatGPT: {str(e)}")
+            logger.error("Error processing image with ChatGPT: %s", e)
             return None
 
-    def _normalize_stats(self, stats: Dict) -> Dict:
+    async def process_images(
+        self,
+        images: List[bytes],
+        priority: float = 0.0,
+        deadline: Optional[float] = None,
+        digests: Optional[List[Optional[str]]] = None
+    ) -> List[Optional[Dict]]:
         """
-        Normalize the stats into a consistent format regardless of GPT's response structure.
+        Process several COD stat screens in one multi-image chat completion.
+        The model is asked for a JSON array with one entry per image, in order,
+        which is split back out and normalized per image. Screens the local
+        tier reads confidently are left out of the model call.
+        Callers are expected to have checked the cache already; digests, if
+        given, are the images' cache keys so they aren't hashed again.
         """
-        normalized = {
-            "team_scores": {},
-            "player_stats": {},
-            "game_info": {}
+        digests = digests or [None] * len(images)
+        if self.local_ocr is not None:
+            local = await asyncio.gather(*(
+                self._process_locally(image, digest) for image, digest in zip(images, digests)
+            ))
+            escalated = [
+                (image, digest) for image, digest, stats in zip(images, digests, local) if stats is None
+            ]
+            model_results = iter(
+                await self._process_with_model(
+                    [image for image, _ in escalated], priority, deadline, [digest for _, digest in escalated]
+                ) if escalated else []
+            )
+            return [stats if stats is not None else next(model_results) for stats in local]
+        return await self._process_with_model(images, priority, deadline, digests)
+
+    async def _process_locally(self, image_bytes: bytes, digest: Optional[str] = None) -> Optional[Dict]:
+        with STAGE_SECONDS.time("local_ocr"):
+            stats = await self.local_ocr.extract(image_bytes)
+        if stats is None:
+            return None
+        # Same normalization as model output, so both tiers look alike downstream
+        normalized = normalize_stats(stats)
+        if validate_match_stats(normalized) is None:
+            # A misread would be served from the cache on every retry; let
+            # the model read it instead
+            return None
+        await self.cache.set(image_bytes, normalized, digest)
+        return normalized
+
+    async def _process_with_model(
+        self,
+        images: List[bytes],
+        priority: float = 0.0,
+        deadline: Optional[float] = None,
+        digests: Optional[List[Optional[str]]] = None
+    ) -> List[Optional[Dict]]:
+        digests = digests or [None] * len(images)
+        if len(images) == 1:
+            return [await self.process_image(
+                images[0], digests[0], check_cache=False, use_local=False,
+                priority=priority, deadline=deadline
+            )]
+
+        try:
+            content = [
+                {
+                    "type": "text",
+                    "text": (
+                        f"Analyze these {len(images)} Call of Duty match result screens. "
+                        'Return a JSON object {"results": [...]} with one stats object per image, '
+                        "in the same order as the images."
+                    )
+                }
+            ]
+            content.extend(await asyncio.gather(
+                *(self._image_part(image_bytes) for image_bytes in images)
+            ))
+
+            response = await self._complete(
+                priority,
+                deadline,
+                messages=[
+                    {"role": "system", "content": self.system_prompt},
+                    {"role": "user", "content": content}
+                ],
+                max_tokens=self.max_tokens * len(images),
+                temperature=0.1,
+                **self._response_format_kwargs(MatchStatsBatch)
+            )
+
+            try:
+                results, repaired = self._extract_json(response.choices[0].message.content)
+            except json.JSONDecodeError:
+                logger.warning("Failed to parse JSON from GPT batch response")
+                return [None] * len(images)
+
+            if isinstance(results, dict):
+                results = results.get("results", [])
+            # A truncated reply still carries the images before the cut;
+            # the rest come back as None and are retried on their own
+            if not isinstance(results, list) or len(results) > len(images) or (
+                len(results) < len(images) and not repaired
+            ):
+                logger.warning("GPT batch response does not match number of images")
+                return [None] * len(images)
+
+            normalized = []
+            for index, (image_bytes, digest) in enumerate(zip(images, digests)):
+                stats = results[index] if index < len(results) else None
+                if not isinstance(stats, dict):
+                    normalized.append(None)
+                    continue
+                entry = normalize_stats(stats)
+                if repaired and validate_match_stats(entry) is None:
+                    # Most likely the entry the reply was cut off in
+                    normalized.append(None)
+                    continue
+                await self.cache.set(image_bytes, entry, digest)
+                normalized.append(entry)
+            return normalized
+
+        except VisionRequestShed:
+            raise
+        except Exception as e:
+            logger.error("Error processing image batch with ChatGPT: %s", e)
+            return [None] * len(images)
+
+    async def _image_part(self, image_bytes: bytes) -> Dict:
+        with STAGE_SECONDS.time("preprocess"):
+            image_data, mime_type = await self.preprocessor.process(image_bytes)
+        with STAGE_SECONDS.time("base64_encode"):
+            url = encode_data_url(image_data, mime_type)
+        return {
+            "type": "image_url",
+            "image_url": {
+                "url": url
+            }
         }
 
-        # Extract team scores
-        if "team_scores" in stats:
-            normalized["team_scores"] = stats["team_scores"]
-        elif "teams" in stats:
-            normalized["team_scores"] = stats["teams"]
-
-        # Extract player stats
-        if "player_stats" in stats:
-            normalized["player_stats"] = stats["player_stats"]
-        else:
-            # Try to find stats in root level
-            for key in ["kills", "deaths", "assists"]:
-                if key in stats:
-                    normalized["player_stats"][key] = stats[key]
-
-        # Extract game info
-        if "game_info" in stats:
-            normalized["game_info"] = stats["game_info"]
-        else:
-            for key in ["mode", "map"]:
-                if key in stats:
-                    normalized["game_info"][key] = stats[key]
+    async def _complete(self, priority: float = 0.0, deadline: Optional[float] = None, **kwargs):
+        """
+        Chat completion admitted by the rate limiter, with latency and token
+        usage recorded. 429s, timeouts and 5xx are retried through the
+        limiter up to max_attempts.
+        """
+        await self._import_sdk()
+        from openai import APIConnectionError, InternalServerError, RateLimitError
 
-        return normalized
+        # The quota counts max_tokens up front, not what the reply used
+        estimate = self._estimate_prompt_tokens(kwargs["messages"]) + kwargs.get("max_tokens", 0)
+        attempt = 0
+        while True:
+            attempt += 1
+            async with self.limiter.acquire(priority, deadline, estimate) as permit:
+                start = time.perf_counter()
+                outcome = "error"
+                try:
+                    with IN_FLIGHT.track("openai"):
+                        response = await self.client.chat.completions.create(model=self.model, **kwargs)
+                    outcome = "ok"
+                    break
+                except RateLimitError as e:
+                    outcome = "throttled"
+                    permit.throttled(_retry_after(e))
+                    if attempt >= self.max_attempts:
+                        raise
+                except (APIConnectionError, InternalServerError) as e:
+                    permit.failed()
+                    if attempt >= self.max_attempts:
+                        raise
+                    logger.warning("Retrying vision API call after error: %s", e)
+                finally:
+                    OPENAI_REQUEST_SECONDS.observe(time.perf_counter() - start, self.model, outcome)
+
+        usage = response.usage
+        if usage is not None:
+            OPENAI_TOKENS.inc(usage.prompt_tokens, self.model, "prompt")
+            OPENAI_TOKENS.inc(usage.completion_tokens, self.model, "completion")
+        return response
+
+    def _estimate_prompt_tokens(self, messages: List[Dict]) -> int:
+        tokens = 0
+        for message in messages:
+            content = message["content"]
+            if isinstance(content, str):
+                tokens += len(content) // 4
+                continue
+            for part in content:
+                if part["type"] == "image_url":
+                    tokens += self.tokens_per_image
+                else:
+                    tokens += len(part.get("text", "")) // 4
+        return tokens
+
+    def _response_format_kwargs(self, schema) -> Dict:
+        if self.response_format == "json_schema":
+            return {"response_format": {
+                "type": "json_schema",
+                "json_schema": {"name": schema.__name__, "schema": schema.model_json_schema()}
+            }}
+        if self.response_format == "json_object":
+            return {"response_format": {"type": "json_object"}}
+        return {}
 
-    def validate_stats(self, stats: Dict) -> bool:
+    def _extract_json(self, content: str):
         """
-        Validate that the extracted stats make sense for a COD game.
+        Returns (parsed JSON, repaired). Truncated replies are closed at the
+        last complete value rather than thrown away.
+        """
+        with STAGE_SECONDS.time("parse_stats"):
+            stats, repaired = parse_json(content)
+        if repaired:
+            self.repaired += 1
+            logger.info("Repaired truncated JSON in GPT response")
+        return stats, repaired
+
+    def validate_stats(self, stats: Dict) -> Optional[Dict]:
+        """
+        Validate that the extracted stats make sense for a COD game:
+        kills, deaths and assists present and in range, non-negative team
+        scores, string mode and map. The ranges live on MatchStats.
+        Returns the validated stats, with values coerced to their declared
+        types (e.g. "12" kills becomes 12), or None if they don't fit.
         """
         if not stats:
-            return False
+            return None
+        with STAGE_SECONDS.time("validate_stats"):
+            validated = validate_match_stats(stats)
+        return validated.model_dump() if validated is not None else None
 
-        try:
-            player_stats = stats.get("player_stats", {})
-            
-            # Basic validation rules
-            if not all(key in player_stats for key in ["kills", "deaths", "assists"]):
-                return False
-
-            # Validate reasonable ranges for COD stats
-            if not (0 <= player_stats["kills"] <= 100 and 
-                   0 <= player_stats["deaths"] <= 100 and
-                   0 <= player_stats["assists"] <= 50):
-                return False
-
-            # Validate team scores if present
-            team_scores = stats.get("team_scores", {})
-            if team_scores:
-                for score in team_scores.values():
-                    if not isinstance(score, (int, float)) or score < 0:
-                        return False
-
-            # Validate game info if present
-            game_info = stats.get("game_info", {})
-            if game_info:
-                if "mode" in game_info and not isinstance(game_info["mode"], str):
-                    return False
-                if "map" in game_info and not isinstance(game_info["map"], str):
-                    return False
-
-            return True
 
-        except Exception as e:
-            print(f"Error validating stats: {str(e)}")
-            return False 
\ No newline at end of file
+def _retry_after(error: "RateLimitError") -> Optional[float]:
+    headers = error.response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
@@ -0,0 +1,321 @@
+import asyncio
+import glob
+import io
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Every digit crop is scaled to this (width, height) before matching
+GLYPH_SIZE = (12, 18)
+
+
+def _gray(img) -> np.ndarray:
+    return np.asarray(img.convert("L"), dtype=np.float32) / 255.0
+
+
+def _unit(values: np.ndarray) -> np.ndarray:
+    """
+    Zero-mean, unit-length copy, so a dot product is the normalized
+    cross-correlation in [-1, 1].
+    """
+    values = values.astype(np.float32).ravel()
+    values = values - values.mean()
+    norm = np.linalg.norm(values)
+    return values / norm if norm > 0 else values
+
+
+def _resize(gray: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    from PIL import Image
+
+    img = Image.fromarray((gray * 255).astype(np.uint8))
+    return np.asarray(img.resize(size, Image.BILINEAR), dtype=np.float32) / 255.0
+
+
+def _foreground(cell: np.ndarray) -> np.ndarray:
+    """
+    Text mask for a cell. Scoreboards use light text on dark rows and the
+    reverse, so whichever side of an Otsu threshold is the minority is text.
+    """
+    histogram, _ = np.histogram(cell, bins=64, range=(0.0, 1.0))
+    total = cell.size
+    levels = (np.arange(64) + 0.5) / 64
+    weight = np.cumsum(histogram)
+    mean = np.cumsum(histogram * levels)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mean[-1] * weight / total - mean) ** 2 / (weight * (total - weight))
+    threshold = levels[int(np.nanargmax(between))]
+    mask = cell > threshold
+    return mask if mask.sum() <= total / 2 else ~mask
+
+
+def _glyph_vector(mask: np.ndarray) -> np.ndarray:
+    # Crop to the ink so position within the cell doesn't matter
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if len(rows):
+        mask = mask[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+    return _unit(_resize(mask.astype(np.float32), GLYPH_SIZE))
+
+
+def read_number(cell: np.ndarray, glyphs: np.ndarray) -> Tuple[Optional[int], float]:
+    """
+    Read a non-negative integer from a grayscale cell by splitting it into
+    glyph columns and matching each against the 0-9 templates.
+    Returns (value, confidence); confidence is the weakest digit's match.
+    """
+    mask = _foreground(cell)
+    columns = mask.any(axis=0)
+    if not columns.any():
+        return None, 0.0
+
+    digits = []
+    confidence = 1.0
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], columns.astype(np.int8), [0]))))
+    for start, end in zip(edges[::2], edges[1::2]):
+        glyph = mask[:, start:end]
+        rows = np.flatnonzero(glyph.any(axis=1))
+        if end - start < 2 or len(rows) < 3:
+            # Specks and separators, not digits
+            continue
+        scores = glyphs @ _glyph_vector(glyph)
+        best = int(np.argmax(scores))
+        digits.append(str(best))
+        confidence = min(confidence, float(scores[best]))
+
+    if not digits or len(digits) > 4:
+        return None, 0.0
+    return int("".join(digits)), confidence
+
+
+class ScoreboardLayout:
+    """
+    A known scoreboard screen, loaded from a JSON file:
+
+        {
+          "name": "tdm_postgame",
+          "reference_size": [1920, 1080],
+          "anchor": {"box": [x0, y0, x1, y1], "template": "tdm_anchor.png"},
+          "game_info": {"mode": "Team Deathmatch"},
+          "labels": {"map": {"box": [...], "templates": {"Shipment": "shipment.png"}}},
+          "player_stats": {"kills": [...], "deaths": [...], "assists": [...]},
+          "team_scores": {"Allies": [...], "Axis": [...]},
+          "glyphs": "glyphs"
+        }
+
+    Boxes are in reference_size pixels and scale with the screenshot. The
+    anchor (a banner or header that only this screen has) identifies the
+    layout; player_stats boxes cover the highlighted local player row.
+    Paths are relative to the JSON file; "glyphs" holds 0.png ... 9.png.
+    """
+
+    def __init__(self, path: str):
+        from PIL import Image
+
+        with open(path) as f:
+            spec = json.load(f)
+        base = os.path.dirname(path)
+
+        def template(name: str) -> np.ndarray:
+            with Image.open(os.path.join(base, name)) as img:
+                return _gray(img)
+
+        self.name = spec["name"]
+        self.reference_size = tuple(spec["reference_size"])
+        self.anchor_box = spec["anchor"]["box"]
+        anchor = template(spec["anchor"]["template"])
+        self.anchor_size = (anchor.shape[1], anchor.shape[0])
+        self.anchor = _unit(anchor)
+        self.game_info: Dict = dict(spec.get("game_info", {}))
+
+        # label -> (box, [(value, size, unit template)])
+        self.labels: Dict[str, Tuple[List[int], List[Tuple[str, Tuple[int, int], np.ndarray]]]] = {}
+        for label, label_spec in spec.get("labels", {}).items():
+            choices = []
+            for value, name in label_spec["templates"].items():
+                image = template(name)
+                choices.append((value, (image.shape[1], image.shape[0]), _unit(image)))
+            self.labels[label] = (label_spec["box"], choices)
+
+        self.player_stats: Dict[str, List[int]] = spec.get("player_stats", {})
+        self.team_scores: Dict[str, List[int]] = spec.get("team_scores", {})
+
+        glyph_dir = os.path.join(base, spec.get("glyphs", "glyphs"))
+        glyphs = []
+        for digit in range(10):
+            with Image.open(os.path.join(glyph_dir, f"{digit}.png")) as img:
+                glyphs.append(_glyph_vector(_foreground(_gray(img))))
+        self.glyphs = np.stack(glyphs)
+
+    def crop(self, screen: np.ndarray, box: List[int]) -> np.ndarray:
+        scale_x = screen.shape[1] / self.reference_size[0]
+        scale_y = screen.shape[0] / self.reference_size[1]
+        x0, y0, x1, y1 = box
+        return screen[
+            int(y0 * scale_y):max(int(y1 * scale_y), int(y0 * scale_y) + 1),
+            int(x0 * scale_x):max(int(x1 * scale_x), int(x0 * scale_x) + 1),
+        ]
+
+    def matches(self, screen: np.ndarray) -> float:
+        """
+        Similarity of the screen's anchor region to this layout's anchor.
+        """
+        aspect = screen.shape[1] / screen.shape[0]
+        if abs(aspect / (self.reference_size[0] / self.reference_size[1]) - 1) > 0.02:
+            return 0.0
+        region = self.crop(screen, self.anchor_box)
+        return float(self.anchor @ _unit(_resize(region, self.anchor_size)))
+
+    def extract(self, screen: np.ndarray) -> Tuple[Dict, float]:
+        """
+        Read every field; confidence is the weakest field's match.
+        """
+        confidence = 1.0
+        game_info = dict(self.game_info)
+        for label, (box, choices) in self.labels.items():
+            region = self.crop(screen, box)
+            scored = [
+                (float(vector @ _unit(_resize(region, size))), value)
+                for value, size, vector in choices
+            ]
+            score, value = max(scored)
+            game_info[label] = value
+            confidence = min(confidence, score)
+
+        def read_all(boxes: Dict[str, List[int]]) -> Dict[str, int]:
+            nonlocal confidence
+            values = {}
+            for name, box in boxes.items():
+                value, score = read_number(self.crop(screen, box), self.glyphs)
+                confidence = min(confidence, score)
+                if value is not None:
+                    values[name] = value
+            return values
+
+        stats = {
+            "team_scores": read_all(self.team_scores),
+            "player_stats": read_all(self.player_stats),
+            "game_info": game_info,
+        }
+        return stats, confidence
+
+
+# Layouts per directory, loaded once per worker process
+_layouts: Dict[str, List[ScoreboardLayout]] = {}
+
+
+def load_layouts(layouts_dir: str) -> List[ScoreboardLayout]:
+    if layouts_dir not in _layouts:
+        _layouts[layouts_dir] = [
+            ScoreboardLayout(path) for path in sorted(glob.glob(os.path.join(layouts_dir, "*.json")))
+        ]
+    return _layouts[layouts_dir]
+
+
+def extract_scoreboard(image_bytes: bytes, layouts_dir: str, min_anchor_score: float = 0.8) -> Optional[Dict]:
+    """
+    Identify the layout and read its fields. Returns {"stats", "confidence",
+    "layout"}, or None for screens that match no known layout.
+    CPU-bound; run it through LocalOCRExtractor off the event loop.
+    """
+    from PIL import Image
+
+    layouts = load_layouts(layouts_dir)
+    if not layouts:
+        return None
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        screen = _gray(img)
+
+    score, layout = max(((layout.matches(screen), layout) for layout in layouts), key=lambda item: item[0])
+    if score < min_anchor_score:
+        return None
+    stats, confidence = layout.extract(screen)
+    return {"stats": stats, "confidence": min(score, confidence), "layout": layout.name}
+
+
+class LocalOCRExtractor:
+    """
+    CPU-only first tier in front of the vision model. Known scoreboard
+    layouts are read by template matching in a process pool; anything
+    unrecognised or below min_confidence returns None and escalates to
+    the model call.
+    """
+
+    def __init__(
+        self,
+        layouts_dir: str,
+        min_confidence: float = 0.8,
+        max_workers: Optional[int] = None,
+    ):
+        self.layouts_dir = layouts_dir
+        self.min_confidence = min_confidence
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+        self.hits = 0
+        self.escalations = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["LocalOCRExtractor"]:
+        # No layouts means every screenshot goes to the model
+        layouts_dir = os.getenv("LOCAL_OCR_LAYOUTS_DIR")
+        if not layouts_dir:
+            return None
+        workers = os.getenv("LOCAL_OCR_WORKERS")
+        return cls(
+            layouts_dir,
+            min_confidence=float(os.getenv("LOCAL_OCR_MIN_CONFIDENCE", "0.8")),
+            max_workers=int(workers) if workers else None,
+        )
+
+    async def warm(self) -> None:
+        """
+        Start the worker processes and load the layouts in them before the
+        first screenshot arrives.
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        loop = asyncio.get_running_loop()
+        workers = self.max_workers or os.cpu_count() or 1
+        await asyncio.gather(*(
+            loop.run_in_executor(self._executor, load_layouts, self.layouts_dir) for _ in range(workers)
+        ))
+
+    async def extract(self, image_bytes: bytes) -> Optional[Dict]:
+        """
+        Returns raw stats in the MatchStats layout, or None to escalate.
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self._executor,
+                extract_scoreboard,
+                image_bytes,
+                self.layouts_dir,
+                self.min_confidence,
+            )
+        except Exception:
+            logger.exception("Error reading scoreboard locally")
+            result = None
+
+        if result is None or result["confidence"] < self.min_confidence:
+            self.escalations += 1
+            return None
+        self.hits += 1
+        return result["stats"]
+
+    def stats(self) -> Dict:
+        return {"hits": self.hits, "escalations": self.escalations}
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,250 @@
+import logging
+import math
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; covers a cached lookup through a slow vision model call
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> "Span":
+        return Span(self)
+
+
+class Span:
+    """
+    Times a block into a histogram: `with STAGE_SECONDS.labels("ocr").time():`.
+    """
+
+    __slots__ = ("child", "start")
+
+    def __init__(self, child: _HistogramChild):
+        self.child = child
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class Histogram:
+    """
+    Cumulative bucket histogram. Observations only bump a bucket counter,
+    so they cost about a microsecond; cumulative counts are computed when
+    scraped.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children: Dict[Tuple[str, ...], _HistogramChild] = {}
+
+    def labels(self, *values: str) -> _HistogramChild:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = _HistogramChild(self.buckets)
+        return child
+
+    def observe(self, value: float, *labels: str) -> None:
+        self.labels(*labels).observe(value)
+
+    def time(self, *labels: str) -> Span:
+        return Span(self.labels(*labels))
+
+    def render(self) -> List[str]:
+        lines = []
+        for values, child in sorted(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), child.counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class Counter:
+    """
+    Monotonic counter per label set.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, *labels: str) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}"
+            for values, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Counter):
+    """
+    Value that goes up and down, e.g. requests in flight.
+    """
+
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, *labels: str) -> None:
+        self.inc(-amount, *labels)
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def track(self, *labels: str) -> "InFlight":
+        return InFlight(self, labels)
+
+
+class InFlight:
+    """
+    `with IN_FLIGHT.track("openai"):` counts the block as in flight.
+    """
+
+    __slots__ = ("gauge", "labels")
+
+    def __init__(self, gauge: Gauge, labels: Tuple[str, ...]):
+        self.gauge = gauge
+        self.labels = labels
+
+    def __enter__(self) -> "InFlight":
+        self.gauge.inc(1, *self.labels)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.gauge.inc(-1, *self.labels)
+
+
+class MetricsRegistry:
+    """
+    Process-wide metrics in Prometheus text exposition format.
+
+    Besides its own metrics, the registry scrapes collectors: callables
+    returning a component's stats() dict. Their numeric values are exposed
+    as gauges named <namespace>_<component>_<key>, so existing counters
+    (cache hits, queue depths, batches) show up without double counting.
+    """
+
+    def __init__(self, namespace: str = "cod"):
+        self.namespace = namespace
+        self._metrics: Dict[str, object] = {}
+        self._collectors: Dict[str, Callable[[], Dict]] = {}
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(f"{self.namespace}_{name}", help, labelnames, buckets))
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(f"{self.namespace}_{name}", help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(f"{self.namespace}_{name}", help, labelnames))
+
+    def register_collector(self, component: str, stats: Callable[[], Dict]) -> None:
+        self._collectors[component] = stats
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+
+        for component, stats in self._collectors.items():
+            try:
+                values = stats()
+            except Exception as e:
+                logger.error("Error collecting %s metrics: %s", component, e)
+                continue
+            for key, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{self.namespace}_{component}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            # Modules reloaded in tests/benchmarks keep the first instance
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_seconds", "HTTP request latency by route", ["method", "route", "status"]
+)
+STAGE_SECONDS = registry.histogram(
+    "stage_seconds", "Latency of verification and request stages", ["stage"]
+)
+OPENAI_REQUEST_SECONDS = registry.histogram(
+    "openai_request_seconds", "Vision model call latency", ["model", "outcome"]
+)
+OPENAI_TOKENS = registry.counter(
+    "openai_tokens_total", "Model token usage", ["model", "kind"]
+)
+RPC_REQUEST_SECONDS = registry.histogram(
+    "solana_rpc_seconds", "Solana RPC latency by method", ["method", "outcome"]
+)
+RPC_CALLS = registry.counter(
+    "solana_rpc_calls_total", "Solana RPC calls by method", ["method", "outcome"]
+)
+IN_FLIGHT = registry.gauge(
+    "in_flight", "Operations currently in flight", ["operation"]
+)
+VERIFICATION_JOBS = registry.counter(
+    "verification_jobs_total", "Finished verification jobs by status", ["status"]
+)
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+from app.services.llm_ocr_service import LLMOCRService
+from app.services.ocr_cache import image_digest
+from app.services.vision_limiter import VisionRequestShed
+
+logger = logging.getLogger(__name__)
+
+
+class OCRRequestCoalescer:
+    """
+    Single-flight and micro-batching layer in front of LLMOCRService.
+
+    Concurrent requests for an identical screenshot share one in-flight
+    future. Distinct screenshots arriving within batch_window_ms of each
+    other are packed into a single multi-image chat completion. A batch
+    that fails as a whole is retried once as a batch, never split into
+    per-image calls, so a failing upstream sees no extra load.
+    """
+
+    def __init__(
+        self,
+        llm_service: LLMOCRService,
+        batch_window_ms: int = 50,
+        max_batch_size: int = 4,
+    ):
+        self.llm_service = llm_service
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        # (image, digest, future, priority, deadline)
+        self._pending: List[Tuple[bytes, str, asyncio.Future, float, Optional[float]]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # Running batches, referenced until done so none is collected early
+        self._tasks: set = set()
+
+        self.coalesced = 0
+        self.batches = 0
+        self.batched_images = 0
+        self.batch_retries = 0
+        self.failed_batches = 0
+
+    @classmethod
+    def from_env(cls, llm_service: LLMOCRService) -> "OCRRequestCoalescer":
+        return cls(
+            llm_service,
+            batch_window_ms=int(os.getenv("OCR_BATCH_WINDOW_MS", "50")),
+            max_batch_size=int(os.getenv("OCR_MAX_BATCH_SIZE", "4")),
+        )
+
+    async def process_image(
+        self,
+        image_bytes: bytes,
+        digest: Optional[str] = None,
+        priority: float = 0.0,
+        deadline: Optional[float] = None
+    ) -> Optional[Dict]:
+        """
+        Drop-in replacement for LLMOCRService.process_image. A batch is
+        queued for the model at its most urgent member's priority and is
+        only shed once every member's deadline is out of reach.
+        """
+        digest = digest or image_digest(image_bytes)
+        future = self._in_flight.get(digest)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        cached = await self.llm_service.cache.get(image_bytes, digest)
+        if cached is not None:
+            return cached
+
+        # Another request may have registered while we awaited the cache
+        future = self._in_flight.get(digest)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._in_flight[digest] = future
+        future.add_done_callback(lambda _: self._in_flight.pop(digest, None))
+
+        self._pending.append((image_bytes, digest, future, priority, deadline))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": len(self._in_flight),
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+            "batched_images": self.batched_images,
+            "batch_retries": self.batch_retries,
+            "failed_batches": self.failed_batches,
+        }
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[bytes, str, asyncio.Future, float, Optional[float]]]) -> None:
+        self.batches += 1
+        self.batched_images += len(batch)
+        images = [image for image, _, _, _, _ in batch]
+        digests = [digest for _, digest, _, _, _ in batch]
+        priority = max(priority for _, _, _, priority, _ in batch)
+        deadlines = [deadline for _, _, _, _, deadline in batch]
+        deadline = None if None in deadlines else max(deadlines)
+        results = [None] * len(batch)
+        for attempt in range(2):
+            if attempt:
+                self.batch_retries += 1
+            try:
+                results = await self.llm_service.process_images(images, priority, deadline, digests)
+            except VisionRequestShed as e:
+                # Overloaded; the callers retry later
+                for _, _, future, _, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            except Exception:
+                logger.exception("Error processing OCR batch", extra={"images": len(batch)})
+                continue
+            # A malformed multi-image response fails every image at once
+            if any(result is not None for result in results):
+                break
+
+        if all(result is None for result in results):
+            self.failed_batches += 1
+        for (_, _, future, _, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
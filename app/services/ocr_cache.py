@@ -0,0 +1,252 @@
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def image_digest(image_bytes: bytes) -> str:
+    """
+    Content hash of the raw upload, used as the exact-match cache key.
+    """
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def perceptual_hash(image_bytes: bytes, hash_size: int = 16) -> Optional[int]:
+    """
+    Difference hash (dHash) of the screenshot, hash_size**2 bits wide.
+    Uniform borders are trimmed first so letterboxed or lightly cropped
+    uploads of the same screen hash close together. Scoreboards share a
+    layout, so the hash is kept wide enough to separate different scores.
+    Returns None if the bytes can't be decoded as an image.
+    """
+    try:
+        from PIL import Image, ImageChops
+
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            gray = img.convert("L")
+            background = Image.new("L", gray.size, gray.getpixel((0, 0)))
+            bbox = ImageChops.difference(gray, background).getbbox()
+            if bbox:
+                gray = gray.crop(bbox)
+            small = gray.resize((hash_size + 1, hash_size), Image.BILINEAR)
+            pixels = list(small.getdata())
+
+        value = 0
+        for row in range(hash_size):
+            for col in range(hash_size):
+                left = pixels[row * (hash_size + 1) + col]
+                right = pixels[row * (hash_size + 1) + col + 1]
+                value = (value << 1) | (1 if left > right else 0)
+        return value
+    except Exception:
+        return None
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class InMemoryCacheBackend:
+    """
+    Process-local stand-in for the shared tier. Same interface as
+    RedisCacheBackend so tests and single-worker setups don't need Redis.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[str, float]] = {}
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._data.get(key)
+        if not entry:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        return value
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        self._data[key] = (value, time.monotonic() + ttl)
+
+
+class RedisCacheBackend:
+    """
+    Shared cache tier so every uvicorn worker sees the same OCR results.
+    """
+
+    def __init__(self, redis_url: str, prefix: str = "ocr:"):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(redis_url)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self.client.get(self.prefix + key)
+        return value.decode() if value is not None else None
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        await self.client.set(self.prefix + key, value, ex=ttl)
+
+
+class OCRResultCache:
+    """
+    Two-tier cache for normalized OCR stats.
+
+    Tier 1 is an in-memory LRU with TTL keyed by the SHA-256 of the image
+    bytes. Tier 2 is an optional shared backend (Redis in production)
+    consulted on local misses.
+
+    Setting phash_max_distance enables a perceptual-hash lookup that also
+    catches the same screen re-encoded or cropped by a different client.
+    It is off by default: scoreboards of the same mode share a layout and
+    two different results can hash within a few bits of each other.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: int = 3600,
+        phash_max_distance: Optional[int] = None,
+        shared_backend=None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.phash_max_distance = phash_max_distance
+        self.shared_backend = shared_backend
+
+        # digest -> (stats, expires_at, phash)
+        self._entries: "OrderedDict[str, Tuple[Dict, float, Optional[int]]]" = OrderedDict()
+        # digest -> phash computed by a missed get(), reused by the set()
+        # that follows it
+        self._pending_phash: "OrderedDict[str, Optional[int]]" = OrderedDict()
+
+        self.hits = 0
+        self.phash_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "OCRResultCache":
+        redis_url = os.getenv("REDIS_URL")
+        phash_distance = os.getenv("OCR_CACHE_PHASH_DISTANCE")
+        shared_backend = None
+        if redis_url:
+            try:
+                shared_backend = RedisCacheBackend(redis_url)
+            except ImportError:
+                logger.warning("redis package not installed, OCR cache running without shared tier")
+        return cls(
+            max_entries=int(os.getenv("OCR_CACHE_MAX_ENTRIES", "1024")),
+            ttl_seconds=int(os.getenv("OCR_CACHE_TTL_SECONDS", "3600")),
+            phash_max_distance=int(phash_distance) if phash_distance else None,
+            shared_backend=shared_backend,
+        )
+
+    async def get(self, image_bytes: bytes, digest: Optional[str] = None) -> Optional[Dict]:
+        """
+        Look up cached stats for an image. Returns None on miss.
+        Pass digest when the SHA-256 was already computed while streaming.
+        """
+        digest = digest or image_digest(image_bytes)
+        stats = self._get_local(digest)
+        if stats is not None:
+            self.hits += 1
+            return stats
+
+        phash = await self._phash(image_bytes)
+        if phash is not None:
+            stats = self._get_by_phash(phash)
+            if stats is not None:
+                self.phash_hits += 1
+                return stats
+
+        if self.shared_backend:
+            try:
+                raw = await self.shared_backend.get(digest)
+            except Exception as e:
+                logger.warning("Error reading shared OCR cache: %s", e)
+                raw = None
+            if raw is not None:
+                stats = json.loads(raw)
+                self._put_local(digest, stats, phash)
+                self.shared_hits += 1
+                return stats
+
+        self.misses += 1
+        if self.phash_max_distance is not None:
+            self._pending_phash[digest] = phash
+            while len(self._pending_phash) > self.max_entries:
+                self._pending_phash.popitem(last=False)
+        return None
+
+    async def set(self, image_bytes: bytes, stats: Dict, digest: Optional[str] = None) -> None:
+        """
+        Store normalized stats for an image in both tiers.
+        """
+        digest = digest or image_digest(image_bytes)
+        if digest in self._pending_phash:
+            phash = self._pending_phash.pop(digest)
+        else:
+            phash = await self._phash(image_bytes)
+        self._put_local(digest, stats, phash)
+
+        if self.shared_backend:
+            try:
+                await self.shared_backend.set(digest, json.dumps(stats), self.ttl_seconds)
+            except Exception as e:
+                logger.warning("Error writing shared OCR cache: %s", e)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.phash_hits + self.shared_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "phash_hits": self.phash_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (lookups - self.misses) / lookups if lookups else 0.0,
+        }
+
+    async def _phash(self, image_bytes: bytes) -> Optional[int]:
+        if self.phash_max_distance is None:
+            return None
+        # Decoding and resizing take milliseconds; keep them off the loop
+        return await asyncio.get_running_loop().run_in_executor(None, perceptual_hash, image_bytes)
+
+    def _get_local(self, digest: str) -> Optional[Dict]:
+        entry = self._entries.get(digest)
+        if not entry:
+            return None
+        stats, expires_at, _ = entry
+        if expires_at < time.monotonic():
+            del self._entries[digest]
+            return None
+        self._entries.move_to_end(digest)
+        return stats
+
+    def _get_by_phash(self, phash: int) -> Optional[Dict]:
+        now = time.monotonic()
+        for digest, (stats, expires_at, entry_phash) in reversed(self._entries.items()):
+            if entry_phash is None or expires_at < now:
+                continue
+            if hamming_distance(phash, entry_phash) <= self.phash_max_distance:
+                self._entries.move_to_end(digest)
+                return stats
+        return None
+
+    def _put_local(self, digest: str, stats: Dict, phash: Optional[int]) -> None:
+        self._entries[digest] = (stats, time.monotonic() + self.ttl_seconds, phash)
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
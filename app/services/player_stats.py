@@ -0,0 +1,421 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WINDOWS = ("lifetime", "recent")
+
+# A slot key is (user_id << SCOPE_BITS) | scope id, so it fits an int64
+SCOPE_BITS = 16
+MAX_SCOPES = 1 << SCOPE_BITS
+
+# One slot per (user, scope). recent_* decay with the store's half-life
+# from updated (epoch seconds) on
+CELL = np.dtype([
+    ("matches", "<u4"),
+    ("kills", "<u8"),
+    ("deaths", "<u8"),
+    ("recent_matches", "<f8"),
+    ("recent_kills", "<f8"),
+    ("recent_deaths", "<f8"),
+    ("updated", "<f8"),
+])
+
+# Every match counts towards the user's totals over all modes and maps
+ANY_SCOPE = (None, None)
+
+_EPOCH = datetime(1970, 1, 1)
+
+# since -> batches of verification rows, e.g. BetRepository.iter_match_stats
+MatchStatsSource = Callable[[Optional[datetime]], AsyncIterator[List[Tuple]]]
+
+
+def _scope_name(value) -> Optional[str]:
+    # OCR output and bet requirements differ in case and padding
+    if not isinstance(value, str):
+        return None
+    return value.strip().casefold() or None
+
+
+def _seconds(at: datetime) -> float:
+    # Naive UTC, as stored by the repository
+    return (at - _EPOCH).total_seconds()
+
+
+def _scopes(game_mode: Optional[str], map_name: Optional[str]) -> List[Tuple]:
+    """
+    Scopes a match in game_mode on map_name counts towards, narrowest first.
+    """
+    scopes = []
+    if game_mode and map_name:
+        scopes.append((game_mode, map_name))
+    if game_mode:
+        scopes.append((game_mode, None))
+    if map_name:
+        scopes.append((None, map_name))
+    scopes.append(ANY_SCOPE)
+    return scopes
+
+
+class PlayerStatsStore:
+    """
+    Server-side K/D aggregates per player, fed by verified match stats.
+
+    A scope is a (game mode, map) pair where either side may be "any". Each
+    match adds to up to four slots of its player: overall, its mode, its
+    map and the pair. Slots live in one CELL array grown by doubling and
+    are found through a dict keyed by (user_id << SCOPE_BITS) | scope id,
+    so a K/D check is a few dict lookups and one row read.
+
+    Lifetime totals are exact. The recent window is exponential: each
+    match's weight halves every half_life_days, which keeps it O(1) to
+    update without storing match history. kd_ratio falls back from the
+    narrowest scope to broader ones until one has min_matches matches.
+
+    record() applies one match; rebuild() recomputes everything from the
+    repository's verifications in one vectorized pass; merge() applies
+    rows other workers stored since the last sync. Screenshot keys seen
+    recently are remembered so a match is never counted twice. With a source,
+    start() rebuilds and then merges every sync_seconds.
+    """
+
+    def __init__(
+        self,
+        source: Optional[MatchStatsSource] = None,
+        half_life_days: float = 30.0,
+        min_matches: int = 3,
+        window: str = "lifetime",
+        sync_seconds: float = 30.0,
+        sync_overlap_seconds: float = 300.0,
+        capacity: int = 1024,
+        max_tracked_ids: int = 100_000
+    ):
+        if window not in WINDOWS:
+            raise ValueError(f"window must be one of {', '.join(WINDOWS)}")
+        self.source = source
+        self.sync_seconds = sync_seconds
+        self.half_life = half_life_days * 86400
+        self.min_matches = min_matches
+        self.window = window
+        self.sync_overlap = sync_overlap_seconds
+        self.max_tracked_ids = max_tracked_ids
+
+        self._reset(capacity)
+        self._sync_task: Optional[asyncio.Task] = None
+        # Newest verification created_at seen by rebuild() or merge()
+        self.synced_until: Optional[datetime] = None
+
+        self.duplicates = 0
+        self.checks = 0
+        self.insufficient = 0
+        self.rebuild_seconds = 0.0
+        self.sync_failures = 0
+
+    @classmethod
+    def from_env(cls, source: Optional[MatchStatsSource] = None) -> "PlayerStatsStore":
+        return cls(
+            source,
+            half_life_days=float(os.getenv("PLAYER_STATS_HALF_LIFE_DAYS", "30")),
+            min_matches=int(os.getenv("PLAYER_STATS_MIN_MATCHES", "3")),
+            window=os.getenv("PLAYER_STATS_KD_WINDOW", "lifetime"),
+            sync_seconds=float(os.getenv("PLAYER_STATS_SYNC_SECONDS", "30")),
+            sync_overlap_seconds=float(os.getenv("PLAYER_STATS_SYNC_OVERLAP_SECONDS", "300")),
+        )
+
+    def __len__(self) -> int:
+        return self._size
+
+    async def start(self) -> None:
+        if self.source is None:
+            return
+        rows = []
+        async for batch in self.source(None):
+            rows.extend(batch)
+        self.rebuild(rows)
+        if self.sync_seconds > 0:
+            self._sync_task = asyncio.create_task(self._sync_loop())
+
+    async def stop(self) -> None:
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            await asyncio.gather(self._sync_task, return_exceptions=True)
+            self._sync_task = None
+
+    async def _sync_loop(self) -> None:
+        # Matches verified by other workers; this worker's own are skipped
+        while True:
+            await asyncio.sleep(self.sync_seconds)
+            try:
+                async for batch in self.source(self.sync_since()):
+                    self.merge(batch)
+            except Exception as e:
+                self.sync_failures += 1
+                logger.error("Player stats sync failed: %s", e)
+
+    def _reset(self, capacity: int) -> None:
+        self._cells = np.zeros(max(capacity, 1), dtype=CELL)
+        self._size = 0
+        self._slots: Dict[int, int] = {}
+        self._scope_ids: Dict[Tuple, int] = {ANY_SCOPE: 0}
+        # Screenshot key -> created_at seconds, oldest first
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+        self.players = 0
+        self.matches = 0
+
+    def _scope_id(self, scope: Tuple) -> Optional[int]:
+        scope_id = self._scope_ids.get(scope)
+        if scope_id is None and len(self._scope_ids) < MAX_SCOPES:
+            scope_id = self._scope_ids[scope] = len(self._scope_ids)
+        # Past MAX_SCOPES (misread names), only the broader scopes count
+        return scope_id
+
+    def _match_scope_ids(self, game_mode: Optional[str], map_name: Optional[str]) -> Tuple[int, int, int]:
+        """
+        Mode, map and pair scope ids of a match, -1 where unset or untracked.
+        """
+        game_mode, map_name = _scope_name(game_mode), _scope_name(map_name)
+        scope_ids = []
+        for scope, wanted in (
+            ((game_mode, None), game_mode),
+            ((None, map_name), map_name),
+            ((game_mode, map_name), game_mode and map_name),
+        ):
+            scope_id = self._scope_id(scope) if wanted else None
+            scope_ids.append(-1 if scope_id is None else scope_id)
+        return tuple(scope_ids)
+
+    def _slot(self, user_id: int, scope_id: int) -> int:
+        key = (user_id << SCOPE_BITS) | scope_id
+        slot = self._slots.get(key)
+        if slot is None:
+            if self._size == len(self._cells):
+                cells = np.zeros(2 * len(self._cells), dtype=CELL)
+                cells[:self._size] = self._cells
+                self._cells = cells
+            slot = self._slots[key] = self._size
+            self._size += 1
+            if scope_id == 0:
+                self.players += 1
+        return slot
+
+    def record(
+        self,
+        user_id: int,
+        match_stats: Dict,
+        at: Optional[datetime] = None,
+        match_id: Optional[str] = None
+    ) -> bool:
+        """
+        Add one validated match of user_id. Pass the screenshot key as
+        match_id so a later merge() of the same row is skipped. False if
+        the match was already counted or has no kills/deaths.
+        """
+        try:
+            player = match_stats["player_stats"]
+            kills, deaths = int(player["kills"]), int(player["deaths"])
+        except (KeyError, TypeError, ValueError):
+            return False
+        game_info = match_stats.get("game_info") or {}
+        return self._apply(
+            match_id, user_id, kills, deaths, game_info.get("mode"), game_info.get("map"),
+            _seconds(at) if at else time.time()
+        )
+
+    def _apply(
+        self,
+        match_id: Optional[str],
+        user_id: int,
+        kills: int,
+        deaths: int,
+        game_mode: Optional[str],
+        map_name: Optional[str],
+        at: float
+    ) -> bool:
+        if match_id is not None:
+            if match_id in self._seen:
+                self.duplicates += 1
+                return False
+            self._seen[match_id] = at
+            if len(self._seen) > self.max_tracked_ids:
+                self._seen.popitem(last=False)
+
+        for scope in _scopes(_scope_name(game_mode), _scope_name(map_name)):
+            scope_id = self._scope_id(scope)
+            if scope_id is None:
+                continue
+            slot = self._slot(user_id, scope_id)
+            # Read and written back as whole rows; per-field access on a
+            # structured array costs more than the arithmetic
+            (
+                slot_matches, slot_kills, slot_deaths,
+                recent_matches, recent_kills, recent_deaths, updated
+            ) = self._cells.item(slot)
+            # Matches merged from other workers may be older than the slot
+            if at >= updated:
+                decay = 0.5 ** ((at - updated) / self.half_life)
+                weight = 1.0
+                updated = at
+            else:
+                decay = 1.0
+                weight = 0.5 ** ((updated - at) / self.half_life)
+            self._cells[slot] = (
+                slot_matches + 1,
+                slot_kills + kills,
+                slot_deaths + deaths,
+                recent_matches * decay + weight,
+                recent_kills * decay + kills * weight,
+                recent_deaths * decay + deaths * weight,
+                updated,
+            )
+        self.matches += 1
+        return True
+
+    def kd_ratio(
+        self,
+        user_id: int,
+        game_mode: Optional[str] = None,
+        map_name: Optional[str] = None,
+        window: Optional[str] = None,
+        now: Optional[float] = None
+    ) -> Optional[float]:
+        """
+        K/D of user_id in the narrowest scope around game_mode and map_name
+        with at least min_matches matches (in the recent window, a match a
+        half-life old counts half). Deaths are floored at one. None if no
+        scope has enough matches.
+        """
+        self.checks += 1
+        window = window or self.window
+        for scope in _scopes(_scope_name(game_mode), _scope_name(map_name)):
+            scope_id = self._scope_ids.get(scope)
+            if scope_id is None:
+                continue
+            slot = self._slots.get((user_id << SCOPE_BITS) | scope_id)
+            if slot is None:
+                continue
+            matches, kills, deaths, recent_matches, recent_kills, recent_deaths, updated = (
+                self._cells.item(slot)
+            )
+            if window == "lifetime":
+                if matches >= self.min_matches:
+                    return kills / max(deaths, 1)
+                continue
+            decay = 0.5 ** (((now or time.time()) - updated) / self.half_life)
+            if recent_matches * decay >= self.min_matches:
+                return recent_kills * decay / max(recent_deaths * decay, 1.0)
+        self.insufficient += 1
+        return None
+
+    def merge(self, rows: Iterable[Sequence]) -> int:
+        """
+        Apply repository rows (see rebuild) one at a time, skipping matches
+        already counted. Returns how many were new.
+        """
+        applied = 0
+        for match_id, user_id, kills, deaths, game_mode, map_name, created_at in rows:
+            applied += self._apply(
+                match_id, user_id, kills, deaths, game_mode, map_name, _seconds(created_at)
+            )
+            if self.synced_until is None or created_at > self.synced_until:
+                self.synced_until = created_at
+        return applied
+
+    def sync_since(self) -> Optional[datetime]:
+        """
+        Where the next merge() query should start: rows commit in a
+        different order than their created_at, so it re-reads an overlap.
+        """
+        if self.synced_until is None:
+            return None
+        return self.synced_until - timedelta(seconds=self.sync_overlap)
+
+    def rebuild(self, rows: Iterable[Sequence]) -> int:
+        """
+        Replace every aggregate with ones computed from repository rows of
+        (match_id, user_id, kills, deaths, game_mode, map_name, created_at), as
+        BetRepository.iter_match_stats yields them. Rows are parsed into
+        columns once; slots come from np.unique over all (user, scope)
+        keys and are summed with bincount, with no per-match updates.
+        """
+        start = time.perf_counter()
+        rows = rows if isinstance(rows, list) else list(rows)
+        count = len(rows)
+        self._reset(1024)
+        if not count:
+            self.rebuild_seconds = time.perf_counter() - start
+            return 0
+
+        user_ids = np.fromiter((row[1] for row in rows), np.int64, count)
+        kills = np.fromiter((row[2] for row in rows), np.float64, count)
+        deaths = np.fromiter((row[3] for row in rows), np.float64, count)
+        times = np.fromiter((_seconds(row[6]) for row in rows), np.float64, count)
+
+        # Scope ids per distinct (mode, map) as read, then gathered per row:
+        # overall, mode, map and pair, -1 where unset
+        names: Dict[Tuple, int] = {}
+        codes = np.fromiter(
+            (names.setdefault((row[4], row[5]), len(names)) for row in rows), np.int64, count
+        )
+        table = np.array([self._match_scope_ids(*pair) for pair in names], dtype=np.int64)
+        scope_columns = np.vstack([np.zeros(count, dtype=np.int64), table[codes].T])
+
+        present = scope_columns >= 0
+        match_index = np.nonzero(present)[1]
+        keys = (user_ids[match_index] << SCOPE_BITS) | scope_columns[present]
+        slot_keys, slot_of = np.unique(keys, return_inverse=True)
+        size = len(slot_keys)
+
+        # Decay every match to the newest one; that becomes each slot's updated
+        newest = times.max()
+        weights = 0.5 ** ((newest - times) / self.half_life)
+        # Headroom for live matches before the first doubling
+        self._cells = np.zeros(max(1024, size + size // 4), dtype=CELL)
+        cells = self._cells[:size]
+        cells["matches"] = np.bincount(slot_of, minlength=size)
+        cells["kills"] = np.bincount(slot_of, weights=kills[match_index], minlength=size)
+        cells["deaths"] = np.bincount(slot_of, weights=deaths[match_index], minlength=size)
+        cells["recent_matches"] = np.bincount(slot_of, weights=weights[match_index], minlength=size)
+        cells["recent_kills"] = np.bincount(
+            slot_of, weights=(kills * weights)[match_index], minlength=size
+        )
+        cells["recent_deaths"] = np.bincount(
+            slot_of, weights=(deaths * weights)[match_index], minlength=size
+        )
+        cells["updated"] = newest
+        self._size = size
+        self._slots = dict(zip(slot_keys.tolist(), range(size)))
+        self.players = int(np.count_nonzero((slot_keys & (MAX_SCOPES - 1)) == 0))
+        self.matches = count
+
+        # Rows a later merge() re-reads must not count twice
+        self.synced_until = max(row[6] for row in rows)
+        for index in np.flatnonzero(times >= newest - self.sync_overlap)[-self.max_tracked_ids:]:
+            self._seen[rows[index][0]] = times[index]
+
+        self.rebuild_seconds = time.perf_counter() - start
+        logger.info(
+            "Rebuilt player stats from %d verifications in %.2fs", count, self.rebuild_seconds,
+            extra={"players": self.players, "slots": size}
+        )
+        return count
+
+    def stats(self) -> Dict:
+        return {
+            "players": self.players,
+            "slots": self._size,
+            "scopes": len(self._scope_ids),
+            "matches": self.matches,
+            "duplicates": self.duplicates,
+            "checks": self.checks,
+            "insufficient": self.insufficient,
+            "bytes": self._cells.nbytes,
+            "rebuild_seconds": self.rebuild_seconds,
+            "sync_failures": self.sync_failures,
+        }
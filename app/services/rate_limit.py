@@ -0,0 +1,202 @@
+import json
+import logging
+import math
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitExceeded(Exception):
+    """
+    The caller is over their rate; retry_after is in seconds.
+    """
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limit exceeded, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class InMemoryRateLimitBackend:
+    """
+    Per-process token buckets. Each take runs without awaiting, so it is
+    atomic on the event loop.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        # key -> (tokens, updated_at epoch seconds)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    async def take(self, key: str, rate: float, capacity: float, cost: float) -> float:
+        now = time.time()
+        tokens, updated = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        retry_after = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            retry_after = (cost - tokens) / rate
+
+        if key not in self._buckets and len(self._buckets) >= self.max_keys:
+            self._prune(now, rate, capacity)
+        self._buckets[key] = (tokens, now)
+        return retry_after
+
+    def _prune(self, now: float, rate: float, capacity: float) -> None:
+        # Buckets idle long enough to have refilled are the same as absent ones
+        idle = capacity / rate
+        for key in [key for key, (_, updated) in self._buckets.items() if now - updated >= idle]:
+            del self._buckets[key]
+
+
+# KEYS: bucket hash
+# ARGV: rate per second, capacity, now, cost
+# Returns seconds to wait as a string (Lua numbers come back as integers)
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - updated, 0) * rate)
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', ARGV[3])
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(retry_after)
+"""
+
+
+class RedisRateLimitBackend:
+    """
+    Token buckets shared by every uvicorn worker, updated atomically by a
+    Lua script. Keys expire once a bucket would have refilled anyway.
+    """
+
+    def __init__(self, redis_url: str, prefix: str = "ratelimit:"):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(redis_url)
+        self.prefix = prefix
+        self._take = self.client.register_script(_TAKE_SCRIPT)
+
+    async def take(self, key: str, rate: float, capacity: float, cost: float) -> float:
+        result = await self._take(keys=[self.prefix + key], args=[rate, capacity, time.time(), cost])
+        return float(result.decode() if isinstance(result, bytes) else result)
+
+
+class UserRateLimiter:
+    """
+    Per-user token bucket: burst requests at once, then per_minute
+    sustained. With the redis backend the limit holds across workers.
+    If the store is unreachable requests are let through rather than
+    failing every upload.
+    """
+
+    def __init__(self, backend=None, per_minute: float = 10, burst: float = 5, name: str = "verify"):
+        self.backend = backend or InMemoryRateLimitBackend()
+        self.rate = per_minute / 60
+        self.capacity = burst
+        self.name = name
+
+        self.allowed = 0
+        self.limited = 0
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls, name: str = "verify") -> "UserRateLimiter":
+        prefix = name.upper()
+        backend = None
+        if os.getenv(f"{prefix}_RATE_LIMIT_BACKEND", "memory") == "redis":
+            backend = RedisRateLimitBackend(
+                os.getenv("REDIS_URL", "redis://localhost:6379/0"), prefix=f"ratelimit:{name}:"
+            )
+        return cls(
+            backend=backend,
+            per_minute=float(os.getenv(f"{prefix}_RATE_PER_MINUTE", "10")),
+            burst=float(os.getenv(f"{prefix}_RATE_BURST", "5")),
+            name=name,
+        )
+
+    async def check(self, user_id, cost: float = 1) -> None:
+        """
+        Take cost from user_id's bucket. Raises RateLimitExceeded if empty.
+        """
+        try:
+            retry_after = await self.backend.take(str(user_id), self.rate, self.capacity, cost)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Rate limit store unavailable, allowing request: %s", e)
+            return
+        if retry_after > 0:
+            self.limited += 1
+            raise RateLimitExceeded(math.ceil(retry_after * 10) / 10)
+        self.allowed += 1
+
+    def stats(self) -> Dict:
+        return {"allowed": self.allowed, "limited": self.limited, "errors": self.errors}
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware that applies a UserRateLimiter to POSTs under
+    path_prefix before the body is read, so an upload storm is refused
+    before the multipart parser spools anything. The body can't be read
+    to find the user, so the key is the X-User-Id header, or the client
+    address when the header is missing.
+    """
+
+    def __init__(self, app, limiter: UserRateLimiter, path_prefix: str = "/bets/verify"):
+        self.app = app
+        self.limiter = limiter
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or not scope["path"].startswith(self.path_prefix)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        user_id = _header(scope, b"x-user-id")
+        if user_id is not None:
+            key = f"user:{user_id}"
+        else:
+            key = f"client:{(scope.get('client') or ('unknown',))[0]}"
+        try:
+            await self.limiter.check(key)
+        except RateLimitExceeded as e:
+            await _reject(send, e)
+            return
+        await self.app(scope, receive, send)
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode()
+    return None
+
+
+async def _reject(send, error: RateLimitExceeded) -> None:
+    body = json.dumps({"detail": str(error)}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(math.ceil(error.retry_after)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
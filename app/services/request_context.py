@@ -0,0 +1,98 @@
+import contextvars
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.services.metrics import HTTP_REQUEST_SECONDS, IN_FLIGHT
+
+# Set per HTTP request, and per verification job from the request that queued it
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+def current_request_id() -> Optional[str]:
+    return request_id_var.get()
+
+
+class JSONLogFormatter(logging.Formatter):
+    """
+    One JSON object per line with the current request id and any `extra`
+    fields, e.g. logger.warning("Refund failed", extra={"bet_id": 3}).
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": request_id_var.get(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level: Optional[str] = None) -> None:
+    handler = logging.StreamHandler()
+    handler.setFormatter(JSONLogFormatter())
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+
+
+class RequestContextMiddleware:
+    """
+    ASGI middleware that assigns each request an id (the caller's
+    X-Request-ID if sent), echoes it in the response and records request
+    latency by route template and status.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for key, value in scope.get("headers", []):
+            if key == b"x-request-id":
+                request_id = value.decode()[:64]
+                break
+        token = request_id_var.set(request_id or uuid.uuid4().hex)
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", request_id_var.get().encode())
+                ]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            with IN_FLIGHT.track("http"):
+                await self.app(scope, receive, send_with_id)
+        finally:
+            # Route templates, not raw paths, keep label cardinality bounded
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status),
+            )
+            request_id_var.reset(token)
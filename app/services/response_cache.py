@@ -0,0 +1,142 @@
+import hashlib
+import os
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from pydantic import TypeAdapter
+
+from app.schemas.bet_schemas import BetOut
+from app.services.bet_index import ActiveBetIndex, expires_at
+
+# Same JSON FastAPI would produce for response_model=List[BetOut], encoded
+# in one pass by pydantic-core
+_BET_LIST = TypeAdapter(List[BetOut])
+
+
+class CachedPage(NamedTuple):
+    body: bytes
+    etag: str
+    next_cursor: Optional[str]
+    # The page changes when its first bet expires, even with no write
+    valid_until: datetime
+
+
+class ActiveBetsResponseCache:
+    """
+    Pre-encoded GET /bets/active pages keyed by the normalized query.
+
+    Entries belong to one ActiveBetIndex.version; any create, join, settle
+    or expiry bumps it and the next lookup drops every entry. Between
+    writes, polls are served from the stored bytes without building or
+    serializing a single model. ETags are weak and derived from the body,
+    so every worker with the same listing hands out the same tag.
+    """
+
+    def __init__(self, index: ActiveBetIndex, max_entries: int = 1024):
+        self.index = index
+        self.max_entries = max_entries
+
+        self._entries: "OrderedDict[Tuple, CachedPage]" = OrderedDict()
+        self._version = index.version
+
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls, index: ActiveBetIndex) -> "ActiveBetsResponseCache":
+        return cls(index, max_entries=int(os.getenv("ACTIVE_BETS_CACHE_MAX_ENTRIES", "1024")))
+
+    @staticmethod
+    def key(
+        game_mode: Optional[str],
+        map_name: Optional[str],
+        min_stake: Optional[float],
+        max_stake: Optional[float],
+        cursor: Optional[str],
+        limit: int
+    ) -> Tuple:
+        # min_stake=10 and min_stake=10.0 are the same query
+        return (
+            game_mode,
+            map_name,
+            float(min_stake) if min_stake is not None else None,
+            float(max_stake) if max_stake is not None else None,
+            cursor or None,
+            limit,
+        )
+
+    def page(self, key: Tuple, now: Optional[datetime] = None) -> CachedPage:
+        """
+        The cached page for key, built from the index on a miss. Raises
+        ValueError for a malformed cursor.
+        """
+        if self._version != self.index.version:
+            self._entries.clear()
+            self._version = self.index.version
+            self.invalidations += 1
+
+        now = now or datetime.utcnow()
+        entry = self._entries.get(key)
+        if entry is not None and now < entry.valid_until:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        game_mode, map_name, min_stake, max_stake, cursor, limit = key
+        bets, next_cursor = self.index.query(
+            game_mode=game_mode,
+            map_name=map_name,
+            min_stake=min_stake,
+            max_stake=max_stake,
+            cursor=cursor,
+            limit=limit,
+            now=now
+        )
+        body = _BET_LIST.dump_json(bets)
+        entry = CachedPage(
+            body=body,
+            etag=f'W/"{hashlib.blake2b(body, digest_size=12).hexdigest()}"',
+            next_cursor=next_cursor,
+            valid_until=min((expires_at(bet) for bet in bets), default=datetime.max),
+        )
+        self._entries[key] = entry
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def record_not_modified(self) -> None:
+        """
+        Count a request answered with 304 because its ETag still matched.
+        """
+        self.not_modified += 1
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "not_modified": self.not_modified,
+            "invalidations": self.invalidations,
+        }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Weak comparison of an If-None-Match header against etag.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == opaque:
+            return True
+    return False
@@ -0,0 +1,148 @@
+import hashlib
+import os
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+
+from app.services.image_preprocessing import sniff_mime_type
+
+MAX_SCREENSHOT_BYTES = int(os.getenv("MAX_SCREENSHOT_BYTES", str(15 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(256 * 1024)))
+
+
+class ScreenshotUpload:
+    """
+    A screenshot copied out of the request in bounded chunks.
+    The SHA-256 digest and MIME type are computed while copying, so the
+    bytes don't need to be walked again before the OCR call.
+    """
+
+    def __init__(self, data: bytearray, digest: str, mime_type: str):
+        self.data = data
+        self.digest = digest
+        self.mime_type = mime_type
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+
+async def read_screenshot(
+    upload: UploadFile,
+    max_bytes: int = MAX_SCREENSHOT_BYTES,
+    chunk_size: int = UPLOAD_CHUNK_BYTES
+) -> ScreenshotUpload:
+    """
+    Copy an UploadFile into a single buffer in chunks. Starlette has
+    already spooled the whole file by the time the endpoint runs, so this
+    doesn't stream from the client; UploadSizeLimitMiddleware enforces the
+    limit on the wire, and max_bytes here is a backstop. The buffer is
+    preallocated when the size is known so it is never grown and copied.
+    """
+    if upload.size is not None and upload.size > max_bytes:
+        raise HTTPException(status_code=413, detail="Screenshot too large")
+
+    data = bytearray(upload.size or 0)
+    digest = hashlib.sha256()
+    received = 0
+
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        if received + len(chunk) > max_bytes:
+            raise HTTPException(status_code=413, detail="Screenshot too large")
+        data[received:received + len(chunk)] = chunk
+        digest.update(chunk)
+        received += len(chunk)
+
+    if received < len(data):
+        del data[received:]
+    if not received:
+        raise HTTPException(status_code=400, detail="Empty screenshot")
+
+    return ScreenshotUpload(data, digest.hexdigest(), sniff_mime_type(bytes(data[:12])))
+
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI middleware that rejects oversized upload bodies before they are
+    spooled by the multipart parser. Only POSTs under path_prefix are
+    checked: Content-Length up front, and streamed bytes for chunked
+    uploads.
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_SCREENSHOT_BYTES, path_prefix: str = "/bets/verify"):
+        self.app = app
+        # Leave room for the multipart envelope and form fields
+        self.max_bytes = max_bytes + 64 * 1024
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or not scope["path"].startswith(self.path_prefix)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = _header(scope, b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await _reject(send)
+            return
+
+        received = 0
+        rejected = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    rejected = True
+                    if not response_started:
+                        await _reject(send)
+                    # The app sees the client go away and stops reading
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if rejected:
+                # Already answered with a 413
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            # Cutting the body off makes the parser raise; that's expected
+            if not rejected:
+                raise
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode()
+    return None
+
+
+async def _reject(send) -> None:
+    body = b'{"detail":"Screenshot too large"}'
+    await send({
+        "type": "http.response.start",
+        "status": 413,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
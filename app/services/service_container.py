@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+from app.services.llm_ocr_service import LLMOCRService
+from app.services.solana_service import SolanaService
+
+logger = logging.getLogger(__name__)
+
+WARMUP_MODES = ("background", "startup", "off")
+
+
+class ServiceContainer:
+    """
+    The services holding outbound clients (OpenAI, Solana RPC) for one
+    worker, tied to the app's lifespan.
+
+    Building it is cheap: the OpenAI SDK is imported and its client built
+    on first use, and the RPC session opens on the first call. start()
+    warms both: the SDK import runs off the event loop, the preprocessing
+    workers start and keep-alive TLS connections are opened. "startup"
+    (the default) holds startup for up to warmup_timeout_seconds, then lets
+    the rest finish in the background; "background" accepts requests right
+    away, which only pays off with a spare core; "off" leaves everything
+    to first use. The Solana account feed starts regardless of the mode.
+    close() shuts every pool down on exit.
+    """
+
+    def __init__(
+        self,
+        llm_service: Optional[LLMOCRService] = None,
+        solana_service: Optional[SolanaService] = None,
+        warmup: str = "startup",
+        warmup_timeout_seconds: float = 5.0
+    ):
+        if warmup not in WARMUP_MODES:
+            raise ValueError(f"warmup must be one of {', '.join(WARMUP_MODES)}")
+        self.llm_service = llm_service or LLMOCRService()
+        self.solana_service = solana_service or SolanaService()
+        self.warmup = warmup
+        self.warmup_timeout = warmup_timeout_seconds
+
+        self._warm_task: Optional[asyncio.Task] = None
+        # component -> seconds its warm-up took
+        self.warm_seconds: Dict[str, float] = {}
+        self.warm_errors = 0
+
+    @classmethod
+    def from_env(cls) -> "ServiceContainer":
+        return cls(
+            warmup=os.getenv("SERVICE_WARMUP", "startup"),
+            warmup_timeout_seconds=float(os.getenv("SERVICE_WARMUP_TIMEOUT_SECONDS", "5")),
+        )
+
+    @property
+    def ready(self) -> bool:
+        return self._warm_task is not None and self._warm_task.done()
+
+    async def start(self) -> None:
+        self.solana_service.start()
+        if self.warmup == "off":
+            return
+        self._warm_task = asyncio.create_task(self._warm_all())
+        if self.warmup == "startup":
+            # An unreachable upstream mustn't keep the worker from serving
+            await asyncio.wait({self._warm_task}, timeout=self.warmup_timeout)
+
+    async def close(self) -> None:
+        if self._warm_task is not None and not self._warm_task.done():
+            self._warm_task.cancel()
+            await asyncio.gather(self._warm_task, return_exceptions=True)
+        results = await asyncio.gather(
+            self.llm_service.close(), self.solana_service.close(), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error("Error closing service: %s", result)
+
+    def stats(self) -> Dict:
+        return {
+            "ready": int(self.ready),
+            "warm_errors": self.warm_errors,
+            **{f"warm_seconds_{name}": seconds for name, seconds in self.warm_seconds.items()},
+        }
+
+    async def _warm_all(self) -> None:
+        await asyncio.gather(
+            self._warm("openai", self.llm_service.warm()),
+            self._warm("solana_rpc", self.solana_service.warm()),
+        )
+
+    async def _warm(self, name: str, warm) -> None:
+        start = time.perf_counter()
+        try:
+            await warm
+        except Exception as e:
+            # Not fatal: the first real call connects (and fails) as before
+            self.warm_errors += 1
+            logger.warning("Warm-up of %s failed: %s", name, e)
+        finally:
+            self.warm_seconds[name] = time.perf_counter() - start
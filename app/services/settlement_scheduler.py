@@ -0,0 +1,348 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import struct
+import time
+from typing import Dict, List, Optional, Tuple
+
+from solders.compute_budget import set_compute_unit_limit
+from solders.hash import Hash
+from solders.instruction import AccountMeta, Instruction
+from solders.keypair import Keypair
+from solders.message import Message
+from solders.pubkey import Pubkey
+from solders.token import ID as TOKEN_PROGRAM_ID
+from solders.token.associated import get_associated_token_address
+from solders.transaction import Transaction
+
+from app.services.solana_rpc import SolanaRPCClient
+
+logger = logging.getLogger(__name__)
+
+# Maximum serialized transaction size accepted by the cluster
+PACKET_DATA_SIZE = 1232
+MAX_COMPUTE_UNITS = 1_400_000
+
+# Anchor instruction discriminators for cod_betting::settle_bets / cancel_bets
+SETTLE_BETS_DISCRIMINATOR = hashlib.sha256(b"global:settle_bets").digest()[:8]
+CANCEL_BETS_DISCRIMINATOR = hashlib.sha256(b"global:cancel_bets").digest()[:8]
+
+SETTLE = "settle"
+REFUND = "refund"
+
+
+def load_keypair(path: str) -> Keypair:
+    """
+    Load a keypair file in the Solana CLI format (JSON array of 64 bytes).
+    """
+    with open(os.path.expanduser(path)) as f:
+        return Keypair.from_bytes(bytes(json.load(f)))
+
+
+class PendingSettlement:
+    """
+    One bet waiting to be settled (paid to the winner) or refunded (paid
+    back to its creator), with the accounts the instruction needs.
+    """
+
+    def __init__(
+        self,
+        program_id: Pubkey,
+        token_mint: Pubkey,
+        bet_seed: str,
+        winner: str,
+        kind: str = SETTLE
+    ):
+        self.kind = kind
+        self.bet_seed = bet_seed
+        self.winner = Pubkey.from_string(winner)
+        self.bet, _ = Pubkey.find_program_address([b"bet", bet_seed.encode()], program_id)
+        self.escrow, self.escrow_bump = Pubkey.find_program_address(
+            [b"escrow", bet_seed.encode()], program_id
+        )
+        self.winner_token = get_associated_token_address(self.winner, token_mint)
+        self.attempts = 0
+        self.future: Optional[asyncio.Future] = None
+
+
+class SettlementScheduler:
+    """
+    Packs pending settlements into as few `settle_bets` transactions as fit
+    the packet size and compute limits, submits them concurrently and
+    tracks confirmations. Refunds of expired bets go through the same
+    pipeline as `cancel_bets` transactions.
+
+    settle() and refund() resolve with the transaction signature once
+    confirmed. A failed multi-bet transaction is split and every bet retried
+    on its own, so one bad bet doesn't fail the rest. Resubmitting is safe:
+    the program rejects bets that are no longer Active (or Created, for
+    refunds).
+    """
+
+    def __init__(
+        self,
+        client: SolanaRPCClient,
+        program_id: Pubkey,
+        token_mint: Pubkey,
+        payer: Keypair,
+        batch_window_ms: int = 200,
+        compute_units_per_bet: int = 30_000,
+        max_in_flight: int = 8,
+        max_attempts: int = 3,
+        confirm_timeout_seconds: float = 60.0,
+        poll_interval_seconds: float = 0.5,
+        commitment: str = "confirmed",
+    ):
+        self.client = client
+        self.program_id = program_id
+        self.token_mint = token_mint
+        self.payer = payer
+        self.batch_window = batch_window_ms / 1000
+        self.compute_units_per_bet = compute_units_per_bet
+        self.max_attempts = max_attempts
+        self.confirm_timeout = confirm_timeout_seconds
+        self.poll_interval = poll_interval_seconds
+        self.commitment = commitment
+
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._pending: List[PendingSettlement] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # signature -> (settlements, submitted_at)
+        self._unconfirmed: Dict[str, Tuple[List[PendingSettlement], float]] = {}
+        self._poller: Optional[asyncio.Task] = None
+        self._tasks: set = set()
+
+        self.transactions = 0
+        self.settled = 0
+        self.failed = 0
+        self.splits = 0
+
+    @classmethod
+    def from_env(
+        cls,
+        client: SolanaRPCClient,
+        program_id: Optional[Pubkey],
+        token_mint: Optional[str]
+    ) -> Optional["SettlementScheduler"]:
+        # On-chain settlement needs a program, a mint and a fee payer
+        keypair_path = os.getenv("SOLANA_SETTLER_KEYPAIR")
+        if not keypair_path:
+            return None
+        if not (program_id and token_mint):
+            logger.error(
+                "SOLANA_SETTLER_KEYPAIR is set but SOLANA_PROGRAM_ID or SOLANA_TOKEN_MINT is missing; "
+                "on-chain settlement and refunds are disabled"
+            )
+            return None
+        return cls(
+            client,
+            program_id,
+            Pubkey.from_string(token_mint),
+            load_keypair(keypair_path),
+            batch_window_ms=int(os.getenv("SOLANA_SETTLE_BATCH_WINDOW_MS", "200")),
+            compute_units_per_bet=int(os.getenv("SOLANA_SETTLE_COMPUTE_UNITS_PER_BET", "30000")),
+            max_in_flight=int(os.getenv("SOLANA_SETTLE_MAX_IN_FLIGHT", "8")),
+            confirm_timeout_seconds=float(os.getenv("SOLANA_SETTLE_CONFIRM_TIMEOUT_SECONDS", "60")),
+        )
+
+    async def settle(self, bet_seed: str, winner: str) -> str:
+        """
+        Queue a settlement and wait for its transaction to confirm.
+        """
+        return await self._queue(PendingSettlement(self.program_id, self.token_mint, bet_seed, winner))
+
+    async def refund(self, bet_seed: str, creator: str) -> str:
+        """
+        Queue a refund of an unjoined bet's stake to its creator.
+        """
+        return await self._queue(
+            PendingSettlement(self.program_id, self.token_mint, bet_seed, creator, kind=REFUND)
+        )
+
+    async def _queue(self, settlement: PendingSettlement) -> str:
+        settlement.future = asyncio.get_running_loop().create_future()
+        self._enqueue([settlement])
+        return await asyncio.shield(settlement.future)
+
+    async def close(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for task in list(self._tasks) + ([self._poller] if self._poller else []):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict:
+        return {
+            "pending": len(self._pending),
+            "unconfirmed_transactions": len(self._unconfirmed),
+            "transactions": self.transactions,
+            "settled": self.settled,
+            "failed": self.failed,
+            "splits": self.splits,
+        }
+
+    def pack(self, settlements: List[PendingSettlement]) -> List[List[PendingSettlement]]:
+        """
+        Greedily split settlements into groups that each fit one transaction.
+        Settlements and refunds are different instructions, so never share one.
+        """
+        groups: List[List[PendingSettlement]] = []
+        for kind in (SETTLE, REFUND):
+            current: List[PendingSettlement] = []
+            for settlement in settlements:
+                if settlement.kind != kind:
+                    continue
+                candidate = current + [settlement]
+                if current and not self._fits(candidate):
+                    groups.append(current)
+                    candidate = [settlement]
+                current = candidate
+            if current:
+                groups.append(current)
+        return groups
+
+    def build_transaction(self, settlements: List[PendingSettlement], blockhash: Hash) -> Transaction:
+        message = Message.new_with_blockhash(
+            self._instructions(settlements), self.payer.pubkey(), blockhash
+        )
+        return Transaction([self.payer], message, blockhash)
+
+    def _instructions(self, settlements: List[PendingSettlement]) -> List[Instruction]:
+        refund = settlements[0].kind == REFUND
+        data = bytearray(CANCEL_BETS_DISCRIMINATOR if refund else SETTLE_BETS_DISCRIMINATOR)
+        data += struct.pack("<I", len(settlements))
+        # The program only pays out when the fee payer is its configured SETTLER
+        accounts = [
+            AccountMeta(self.payer.pubkey(), is_signer=True, is_writable=True),
+            AccountMeta(TOKEN_PROGRAM_ID, is_signer=False, is_writable=False),
+        ]
+        for settlement in settlements:
+            if not refund:
+                data += bytes(settlement.winner)
+            data += bytes([settlement.escrow_bump])
+            accounts += [
+                AccountMeta(settlement.bet, is_signer=False, is_writable=True),
+                AccountMeta(settlement.escrow, is_signer=False, is_writable=True),
+                AccountMeta(settlement.winner_token, is_signer=False, is_writable=True),
+            ]
+        compute_units = min(MAX_COMPUTE_UNITS, self.compute_units_per_bet * len(settlements) + 10_000)
+        return [
+            set_compute_unit_limit(compute_units),
+            Instruction(self.program_id, bytes(data), accounts),
+        ]
+
+    def _fits(self, settlements: List[PendingSettlement]) -> bool:
+        if self.compute_units_per_bet * len(settlements) + 10_000 > MAX_COMPUTE_UNITS:
+            return False
+        # Signatures are fixed size, so an unsigned transaction measures the same
+        message = Message.new_with_blockhash(
+            self._instructions(settlements), self.payer.pubkey(), Hash.default()
+        )
+        return len(bytes(Transaction.new_unsigned(message))) <= PACKET_DATA_SIZE
+
+    def _enqueue(self, settlements: List[PendingSettlement]) -> None:
+        self._pending.extend(settlements)
+        if self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+
+    def _flush(self) -> None:
+        self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self._spawn(self._submit_all(self.pack(batch)))
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _submit_all(self, groups: List[List[PendingSettlement]]) -> None:
+        for group in groups:
+            for settlement in group:
+                settlement.attempts += 1
+        try:
+            latest = await self.client.call("getLatestBlockhash", [{"commitment": self.commitment}])
+            blockhash = Hash.from_string(latest["value"]["blockhash"])
+        except Exception as e:
+            logger.warning("Error fetching blockhash for settlement: %s", e)
+            for group in groups:
+                self._retry_or_fail(group, e, split=False)
+            return
+        await asyncio.gather(*(self._submit(group, blockhash) for group in groups))
+
+    async def _submit(self, group: List[PendingSettlement], blockhash: Hash) -> None:
+        transaction = self.build_transaction(group, blockhash)
+        encoded = base64.b64encode(bytes(transaction)).decode()
+        async with self._semaphore:
+            try:
+                signature = await self.client.call("sendTransaction", [
+                    encoded,
+                    {"encoding": "base64", "preflightCommitment": self.commitment},
+                ])
+            except Exception as e:
+                logger.warning("Error submitting settlement transaction: %s", e)
+                self._retry_or_fail(group, e)
+                return
+
+        self.transactions += 1
+        self._unconfirmed[signature] = (group, time.monotonic())
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.ensure_future(self._poll_confirmations())
+
+    async def _poll_confirmations(self) -> None:
+        while self._unconfirmed:
+            await asyncio.sleep(self.poll_interval)
+            signatures = list(self._unconfirmed)
+            try:
+                # getSignatureStatuses accepts up to 256 signatures per call
+                statuses = []
+                for start in range(0, len(signatures), 256):
+                    result = await self.client.call(
+                        "getSignatureStatuses", [signatures[start:start + 256]]
+                    )
+                    statuses.extend(result["value"])
+            except Exception as e:
+                logger.warning("Error checking settlement confirmations: %s", e)
+                continue
+
+            now = time.monotonic()
+            for signature, status in zip(signatures, statuses):
+                group, submitted_at = self._unconfirmed[signature]
+                if status is not None and status.get("err") is not None:
+                    del self._unconfirmed[signature]
+                    self._retry_or_fail(group, RuntimeError(f"Settlement {signature} failed: {status['err']}"))
+                elif status is not None and self._is_confirmed(status):
+                    del self._unconfirmed[signature]
+                    for settlement in group:
+                        self.settled += 1
+                        if not settlement.future.done():
+                            settlement.future.set_result(signature)
+                elif now - submitted_at > self.confirm_timeout:
+                    # Most likely the blockhash expired before it landed
+                    del self._unconfirmed[signature]
+                    self._retry_or_fail(group, TimeoutError(f"Settlement {signature} not confirmed"))
+
+    def _is_confirmed(self, status: Dict) -> bool:
+        levels = ["processed", "confirmed", "finalized"]
+        reached = status.get("confirmationStatus") or "processed"
+        return levels.index(reached) >= levels.index(self.commitment)
+
+    def _retry_or_fail(self, group: List[PendingSettlement], error: Exception, split: bool = True) -> None:
+        if split and len(group) > 1:
+            # Isolate the failing bet: every settlement goes out on its own
+            self.splits += 1
+            self._spawn(self._submit_all([[settlement] for settlement in group]))
+            return
+
+        for settlement in group:
+            if settlement.attempts < self.max_attempts:
+                self._enqueue([settlement])
+                continue
+            self.failed += 1
+            if not settlement.future.done():
+                settlement.future.set_exception(error)
@@ -0,0 +1,297 @@
+import asyncio
+import base64
+import json
+import logging
+import os
+import struct
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from solders.pubkey import Pubkey
+from solders.token import ID as TOKEN_PROGRAM_ID
+
+logger = logging.getLogger(__name__)
+
+COMMITMENTS = ("processed", "confirmed", "finalized")
+
+# Mirrors the BetState enum in solana/programs/cod-betting/src/lib.rs
+BET_STATES = ["Created", "Active", "Completed", "Cancelled"]
+
+# Sentinel for peek(); cached values may legitimately be None
+MISSING = object()
+
+
+def decode_bet_account(data: bytes) -> Dict:
+    """
+    Decode the Anchor `Bet` account (Borsh layout after the 8-byte
+    discriminator): creator, joiner/winner options, amount, state,
+    deadline, seed.
+    """
+    offset = 8
+
+    def pubkey() -> str:
+        nonlocal offset
+        value = str(Pubkey.from_bytes(data[offset:offset + 32]))
+        offset += 32
+        return value
+
+    def optional_pubkey() -> Optional[str]:
+        nonlocal offset
+        present = data[offset]
+        offset += 1
+        return pubkey() if present else None
+
+    creator = pubkey()
+    joiner = optional_pubkey()
+    winner = optional_pubkey()
+    (amount,) = struct.unpack_from("<Q", data, offset)
+    offset += 8
+    state = BET_STATES[data[offset]]
+    offset += 1
+    (deadline,) = struct.unpack_from("<q", data, offset)
+    offset += 8
+    (seed_length,) = struct.unpack_from("<I", data, offset)
+    offset += 4
+    seed = data[offset:offset + seed_length].decode()
+
+    return {
+        "creator": creator,
+        "joiner": joiner,
+        "winner": winner,
+        "amount": amount,
+        "state": state,
+        "deadline": deadline,
+        "seed": seed,
+    }
+
+
+class AccountStateCache:
+    """
+    Cache for token balances and escrow account state, keyed by
+    (kind, address, commitment).
+
+    Each commitment level has its own TTL: processed data goes stale almost
+    immediately, finalized data can be kept much longer. Entries past their
+    TTL but within the stale window are returned immediately while a single
+    background refresh runs (stale-while-revalidate). Our own transactions
+    and the optional account-subscription feed invalidate an address
+    across every kind and commitment.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: Optional[Dict[str, float]] = None,
+        stale_seconds: float = 30.0,
+        max_entries: int = 100_000,
+    ):
+        self.ttl_seconds = ttl_seconds or {"processed": 1.0, "confirmed": 5.0, "finalized": 30.0}
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+
+        # (kind, address, commitment) -> (value, fetched_at, slot)
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[Any, float, Optional[int]]]" = OrderedDict()
+        self._by_address: Dict[str, set] = {}
+        # Bumped on invalidation so fetches started earlier can't repopulate
+        self._generations: Dict[str, int] = {}
+        self._refreshing: Dict[Tuple[str, str, str], asyncio.Task] = {}
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls) -> "AccountStateCache":
+        return cls(
+            ttl_seconds={
+                "processed": float(os.getenv("SOLANA_CACHE_TTL_PROCESSED", "1")),
+                "confirmed": float(os.getenv("SOLANA_CACHE_TTL_CONFIRMED", "5")),
+                "finalized": float(os.getenv("SOLANA_CACHE_TTL_FINALIZED", "30")),
+            },
+            stale_seconds=float(os.getenv("SOLANA_CACHE_STALE_SECONDS", "30")),
+        )
+
+    async def get(
+        self,
+        kind: str,
+        address: str,
+        commitment: str,
+        fetch: Callable[[], Awaitable[Tuple[Any, Optional[int]]]]
+    ) -> Any:
+        """
+        Return the cached value, refreshing through fetch() as needed.
+        fetch returns (value, context_slot).
+        """
+        key = (kind, address, commitment)
+        value, fresh = self.peek(key)
+        if value is not MISSING:
+            if not fresh:
+                self._refresh_in_background(key, fetch)
+            return value
+
+        generation = self._generations.get(address, 0)
+        value, slot = await fetch()
+        self.put(key, value, slot, generation)
+        return value
+
+    def peek(self, key: Tuple[str, str, str]) -> Tuple[Any, bool]:
+        """
+        Returns (value, is_fresh); value is MISSING when absent or too stale.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, fetched_at, _ = entry
+            age = time.monotonic() - fetched_at
+            ttl = self.ttl_seconds.get(key[2], 0.0)
+            if age <= ttl:
+                self.hits += 1
+                return value, True
+            if age <= ttl + self.stale_seconds:
+                self.stale_hits += 1
+                return value, False
+        self.misses += 1
+        return MISSING, False
+
+    def put(
+        self,
+        key: Tuple[str, str, str],
+        value: Any,
+        slot: Optional[int] = None,
+        generation: Optional[int] = None
+    ) -> None:
+        if generation is not None and generation != self._generations.get(key[1], 0):
+            return
+        current = self._entries.get(key)
+        # Never let a lagging RPC node overwrite newer state
+        if current is not None and slot is not None and current[2] is not None and slot < current[2]:
+            return
+        if len(self._entries) >= self.max_entries and key not in self._entries:
+            self._evict_oldest()
+        self._entries[key] = (value, time.monotonic(), slot)
+        self._entries.move_to_end(key)
+        self._by_address.setdefault(key[1], set()).add(key)
+
+    def invalidate(self, *addresses: str) -> None:
+        """
+        Drop every cached kind/commitment for the given addresses.
+        """
+        for address in addresses:
+            self._generations[address] = self._generations.get(address, 0) + 1
+            for key in self._by_address.pop(address, ()):
+                self._entries.pop(key, None)
+                self.invalidations += 1
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "refreshing": len(self._refreshing),
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _refresh_in_background(self, key, fetch) -> None:
+        if key in self._refreshing:
+            return
+
+        generation = self._generations.get(key[1], 0)
+
+        async def refresh():
+            try:
+                value, slot = await fetch()
+                self.put(key, value, slot, generation)
+            except Exception as e:
+                logger.warning("Error refreshing cached account state: %s", e)
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.ensure_future(refresh())
+
+    def _evict_oldest(self) -> None:
+        oldest, _ = self._entries.popitem(last=False)
+        keys = self._by_address.get(oldest[1])
+        if keys:
+            keys.discard(oldest)
+            if not keys:
+                del self._by_address[oldest[1]]
+
+
+async def run_account_subscription(
+    ws_url: str,
+    cache: AccountStateCache,
+    program_id: Optional[str] = None,
+    token_mint: Optional[str] = None,
+    commitment: str = "confirmed"
+) -> None:
+    """
+    Invalidate cached state whenever it changes on chain, from the RPC
+    node's programSubscribe websocket feed: bet accounts owned by
+    program_id are dropped by address, and token accounts of token_mint by
+    their owner's wallet, which is what balances are cached under. Bets
+    created after startup are covered without resubscribing. Reconnects
+    with backoff until cancelled.
+    """
+    import aiohttp
+
+    def bet_account(value: Dict) -> str:
+        return value["pubkey"]
+
+    def token_owner(value: Dict) -> str:
+        # SPL token account layout: mint (32 bytes), then owner
+        data = base64.b64decode(value["account"]["data"][0])
+        return str(Pubkey.from_bytes(data[32:64]))
+
+    subscriptions = []
+    if program_id:
+        subscriptions.append((
+            [program_id, {"encoding": "base64", "commitment": commitment}], bet_account
+        ))
+    if token_mint:
+        subscriptions.append(([
+            str(TOKEN_PROGRAM_ID),
+            {
+                "encoding": "base64",
+                "commitment": commitment,
+                "filters": [{"dataSize": 165}, {"memcmp": {"offset": 0, "bytes": token_mint}}],
+            },
+        ], token_owner))
+    if not subscriptions:
+        return
+
+    backoff = 1.0
+    while True:
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.ws_connect(ws_url, heartbeat=30) as ws:
+                    pending: Dict[int, Callable[[Dict], str]] = {}
+                    for request_id, (params, address_of) in enumerate(subscriptions, start=1):
+                        pending[request_id] = address_of
+                        await ws.send_json({
+                            "jsonrpc": "2.0",
+                            "id": request_id,
+                            "method": "programSubscribe",
+                            "params": params,
+                        })
+
+                    handlers: Dict[int, Callable[[Dict], str]] = {}
+                    backoff = 1.0
+                    async for message in ws:
+                        if message.type != aiohttp.WSMsgType.TEXT:
+                            continue
+                        payload = json.loads(message.data)
+                        if payload.get("id") in pending:
+                            handlers[payload["result"]] = pending.pop(payload["id"])
+                        elif payload.get("method") == "programNotification":
+                            address_of = handlers.get(payload["params"]["subscription"])
+                            if address_of:
+                                cache.invalidate(address_of(payload["params"]["result"]["value"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Account subscription error, reconnecting: %s", e)
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, 30.0)
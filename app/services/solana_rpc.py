@@ -0,0 +1,222 @@
+import asyncio
+import itertools
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import aiohttp
+
+from app.services.metrics import IN_FLIGHT, RPC_CALLS, RPC_REQUEST_SECONDS
+
+# HTTP statuses worth retrying on another endpoint
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class SolanaRPCError(Exception):
+    """
+    JSON-RPC error returned by the node, or all endpoints failing.
+    """
+
+    def __init__(self, message: str, code: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+
+
+class SolanaRPCClient:
+    """
+    Async JSON-RPC client for Solana with a shared keep-alive connection pool.
+
+    Requests are bounded by a concurrency semaphore, retried with jittered
+    exponential backoff and failed over across endpoints; an endpoint that
+    errors is skipped for cooldown_seconds. batch() sends many calls in
+    a single JSON-RPC batch request.
+    """
+
+    def __init__(
+        self,
+        endpoints: Sequence[str],
+        max_connections: int = 100,
+        max_concurrency: int = 64,
+        timeout_seconds: float = 10.0,
+        max_retries: int = 3,
+        backoff_seconds: float = 0.2,
+        cooldown_seconds: float = 30.0,
+    ):
+        if not endpoints:
+            raise ValueError("At least one Solana RPC endpoint is required")
+        self.endpoints = list(endpoints)
+        self.max_connections = max_connections
+        self.timeout = aiohttp.ClientTimeout(total=timeout_seconds)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.cooldown_seconds = cooldown_seconds
+
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._unhealthy_until: Dict[str, float] = {}
+        self._ids = itertools.count(1)
+
+        self.calls = 0
+        self.batches = 0
+        self.retries = 0
+        self.failovers = 0
+
+    @classmethod
+    def from_env(cls, rpc_url: Optional[str] = None) -> "SolanaRPCClient":
+        # SOLANA_RPC_URL may list several endpoints separated by commas
+        urls = rpc_url or os.getenv("SOLANA_RPC_URL", "https://api.devnet.solana.com")
+        return cls(
+            [url.strip() for url in urls.split(",") if url.strip()],
+            max_connections=int(os.getenv("SOLANA_RPC_MAX_CONNECTIONS", "100")),
+            max_concurrency=int(os.getenv("SOLANA_RPC_MAX_CONCURRENCY", "64")),
+            timeout_seconds=float(os.getenv("SOLANA_RPC_TIMEOUT_SECONDS", "10")),
+            max_retries=int(os.getenv("SOLANA_RPC_MAX_RETRIES", "3")),
+        )
+
+    async def call(self, method: str, params: Optional[List] = None) -> Any:
+        """
+        Make a single RPC call and return its result.
+        """
+        self.calls += 1
+        response = await self._timed_post(method, {
+            "jsonrpc": "2.0",
+            "id": next(self._ids),
+            "method": method,
+            "params": params or [],
+        })
+        if "error" in response:
+            error = response["error"]
+            raise SolanaRPCError(error.get("message", "RPC error"), error.get("code"))
+        return response.get("result")
+
+    async def batch(self, requests: Sequence[Tuple[str, List]]) -> List[Any]:
+        """
+        Send several calls as one JSON-RPC batch. Results come back in request
+        order; entries the node answered with an error are SolanaRPCError.
+        """
+        if not requests:
+            return []
+        self.batches += 1
+        ids = [next(self._ids) for _ in requests]
+        body = [
+            {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+            for request_id, (method, params) in zip(ids, requests)
+        ]
+        responses = await self._timed_post("batch", body)
+
+        by_id = {response.get("id"): response for response in responses}
+        results = []
+        for request_id in ids:
+            response = by_id.get(request_id)
+            if response is None:
+                results.append(SolanaRPCError("Missing response in batch"))
+            elif "error" in response:
+                error = response["error"]
+                results.append(SolanaRPCError(error.get("message", "RPC error"), error.get("code")))
+            else:
+                results.append(response.get("result"))
+        return results
+
+    async def warm(self, connections: int = 2) -> None:
+        """
+        Open keep-alive connections to every endpoint with getHealth, so the
+        first real calls skip the TCP and TLS handshakes. Endpoints that
+        don't answer cool down like after any failed call.
+        """
+        session = self._session_for_loop()
+        body = {"jsonrpc": "2.0", "id": 0, "method": "getHealth"}
+
+        async def ping(url: str) -> bool:
+            try:
+                async with session.post(url, json=body) as response:
+                    await response.read()
+                return True
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                self._unhealthy_until[url] = time.monotonic() + self.cooldown_seconds
+                return False
+
+        answered = await asyncio.gather(*(ping(url) for url in self.endpoints for _ in range(connections)))
+        if not any(answered):
+            raise SolanaRPCError("No Solana RPC endpoint answered")
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def stats(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "batches": self.batches,
+            "retries": self.retries,
+            "failovers": self.failovers,
+            "unhealthy_endpoints": [
+                url for url, until in self._unhealthy_until.items() if until > time.monotonic()
+            ],
+        }
+
+    def _session_for_loop(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                keepalive_timeout=60,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    def _endpoint_order(self) -> List[str]:
+        # Healthy endpoints in configured order, then cooling ones by recovery time
+        now = time.monotonic()
+        healthy = [url for url in self.endpoints if self._unhealthy_until.get(url, 0) <= now]
+        cooling = sorted(
+            (url for url in self.endpoints if url not in healthy),
+            key=lambda url: self._unhealthy_until[url]
+        )
+        return healthy + cooling
+
+    async def _timed_post(self, method: str, body):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            with IN_FLIGHT.track("solana_rpc"):
+                payload = await self._post(body)
+            # A JSON-RPC error still makes a round trip; count it separately
+            outcome = "rpc_error" if isinstance(payload, dict) and "error" in payload else "ok"
+            return payload
+        finally:
+            RPC_REQUEST_SECONDS.observe(time.perf_counter() - start, method, outcome)
+            RPC_CALLS.inc(1, method, outcome)
+
+    async def _post(self, body):
+        last_error: Optional[Exception] = None
+        previous_url = None
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                url = self._endpoint_order()[0]
+                if attempt:
+                    self.retries += 1
+                    if url != previous_url:
+                        self.failovers += 1
+                    delay = self.backoff_seconds * (2 ** (attempt - 1))
+                    await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+                previous_url = url
+
+                try:
+                    async with self._session_for_loop().post(url, json=body) as response:
+                        status = response.status
+                        if status in RETRYABLE_STATUSES:
+                            raise SolanaRPCError(f"HTTP {status} from {url}", status)
+                        payload = await response.json(content_type=None) if status < 400 else None
+                except (aiohttp.ClientError, asyncio.TimeoutError, SolanaRPCError) as e:
+                    last_error = e
+                    self._unhealthy_until[url] = time.monotonic() + self.cooldown_seconds
+                    continue
+
+                if status >= 400:
+                    # Client errors won't succeed on another endpoint either
+                    raise SolanaRPCError(f"HTTP {status} from {url}", status)
+                return payload
+
+        raise SolanaRPCError(f"All Solana RPC attempts failed: {last_error}")
@@ -1,34 +1,90 @@
-from solana.rpc.api import Client
-from solana.publickey import PublicKey
-from solana.transaction import Transaction
-from typing import Optional, Tuple
+from solders.pubkey import Pubkey
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import base64
+import logging
 import os
+from app.services.solana_rpc import SolanaRPCClient, SolanaRPCError
+from app.services.solana_cache import (
+    AccountStateCache, MISSING, decode_bet_account, run_account_subscription
+)
+from app.services.settlement_scheduler import SettlementScheduler
+from app.services.metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+def parse_pubkey(name: str, value: Optional[str]) -> Optional[Pubkey]:
+    # An unset or placeholder address leaves the on-chain paths disabled
+    if not value:
+        return None
+    try:
+        return Pubkey.from_string(value)
+    except ValueError:
+        logger.error("%s is not a valid address: %r", name, value)
+        return None
 
 class SolanaService:
-    def __init__(self, rpc_url: str = None, program_id: str = None):
-        self.rpc_url = rpc_url or "https://api.devnet.solana.com"
-        self.client = Client(self.rpc_url)
-        self.program_id = PublicKey(program_id) if program_id else None
-        self.token_mint = None  # Your COD betting token mint address
+    def __init__(self, rpc_url: str = None, program_id: str = None, token_mint: str = None):
+        self.rpc_url = rpc_url or os.getenv("SOLANA_RPC_URL", "https://api.devnet.solana.com")
+        # Shared keep-alive pool with retries and failover across endpoints
+        self.client = SolanaRPCClient.from_env(self.rpc_url)
+        self.program_id = parse_pubkey("SOLANA_PROGRAM_ID", program_id or os.getenv("SOLANA_PROGRAM_ID"))
+        # COD betting token mint
+        token_mint = parse_pubkey("SOLANA_TOKEN_MINT", token_mint or os.getenv("SOLANA_TOKEN_MINT"))
+        self.token_mint = str(token_mint) if token_mint else None
+        # Balances and bet account state, invalidated by our own transactions
+        # and, with SOLANA_WS_URL set, by the cluster's change feed
+        self.cache = AccountStateCache.from_env()
+        self.ws_url = os.getenv("SOLANA_WS_URL")
+        self._subscription: Optional[asyncio.Task] = None
+        # Packs concurrent settlements into batched settle_bets transactions;
+        # None until a settler keypair is configured
+        self.settlements = SettlementScheduler.from_env(self.client, self.program_id, self.token_mint)
 
-    async def create_escrow(self, bet_amount: float, creator_pubkey: str) -> Optional[str]:
+    def bet_addresses(self, bet_seed: Optional[str]) -> List[str]:
         """
-        Create an escrow account for a new bet.
+        The bet account and escrow token PDAs for bet_seed, in that order;
+        empty without a program id or seed.
+        """
+        if self.program_id is None or not bet_seed:
+            return []
+        return [
+            str(Pubkey.find_program_address([prefix, bet_seed.encode()], self.program_id)[0])
+            for prefix in (b"bet", b"escrow")
+        ]
+
+    async def create_escrow(
+        self,
+        bet_amount: float,
+        creator_pubkey: str,
+        bet_seed: Optional[str] = None,
+        deadline: Optional[int] = None
+    ) -> Optional[str]:
+        """
+        Create an escrow account for a new bet. With a program id, the
+        address is the escrow PDA for bet_seed, which settlement and refunds
+        derive again from the same seed. The program stores the join
+        deadline (epoch seconds) and refuses to cancel before it.
         This is a placeholder - you'll need to implement the actual Solana program logic.
         """
         try:
             # In reality, you would:
-            # 1. Create a PDA for the escrow
+            # 1. Send initialize_bet with bet_seed and deadline
             # 2. Transfer tokens from creator to escrow
             # 3. Create escrow account with bet details
-            
+            addresses = self.bet_addresses(bet_seed)
+            if addresses:
+                return addresses[1]
+
             # Mock successful escrow creation
             return f"escrow_{creator_pubkey[:8]}_{bet_amount}"
         except Exception as e:
-            print(f"Error creating escrow: {str(e)}")
+            logger.error("Error creating escrow: %s", e)
             return None
 
-    async def join_bet(self, escrow_address: str, joiner_pubkey: str, bet_amount: float) -> bool:
+    async def join_bet(
+        self, escrow_address: str, joiner_pubkey: str, bet_amount: float, bet_seed: Optional[str] = None
+    ) -> bool:
         """
         Allow a user to join an existing bet by matching the stake.
         """
@@ -37,48 +93,205 @@ class SolanaService:
             # 1. Verify escrow exists and is open
             # 2. Transfer tokens from joiner to escrow
             # 3. Update escrow account state
-            
+
+            self.cache.invalidate(escrow_address, joiner_pubkey, *self.bet_addresses(bet_seed))
+            return True
+        except Exception as e:
+            logger.error("Error joining bet: %s", e)
+            return False
+
+    async def leave_bet(
+        self, escrow_address: str, joiner_pubkey: str, bet_amount: float, bet_seed: Optional[str] = None
+    ) -> bool:
+        """
+        Return a joiner's stake from escrow and reopen the bet, undoing a
+        join_bet the backend couldn't record.
+        """
+        try:
+            # In reality, you would:
+            # 1. Send unjoin_bet signed by the settler keypair
+            # 2. Wait for confirmation
+
+            self.cache.invalidate(escrow_address, joiner_pubkey, *self.bet_addresses(bet_seed))
             return True
         except Exception as e:
-            print(f"Error joining bet: {str(e)}")
+            logger.error("Error leaving bet: %s", e)
             return False
 
-    async def settle_bet(self, escrow_address: str, winner_pubkey: str) -> bool:
+    async def settle_bet(self, escrow_address: str, winner_pubkey: str, bet_seed: Optional[str] = None) -> bool:
         """
         Settle a bet by transferring tokens from escrow to winner.
+        With a settler keypair configured and the bet's seed known, the
+        settlement is batched with others finishing at the same time.
         """
         try:
+            if self.settlements is not None and bet_seed is not None:
+                with STAGE_SECONDS.time("settle_bet"):
+                    await self.settlements.settle(bet_seed, winner_pubkey)
+                self.cache.invalidate(escrow_address, winner_pubkey, *self.bet_addresses(bet_seed))
+                return True
+
             # In reality, you would:
             # 1. Verify bet is ready to settle
             # 2. Transfer all tokens to winner
             # 3. Close escrow account
-            
+
+            self.cache.invalidate(escrow_address, winner_pubkey, *self.bet_addresses(bet_seed))
+            return True
+        except Exception as e:
+            logger.error("Error settling bet: %s", e)
+            return False
+
+    async def is_settled(self, bet_seed: Optional[str], winner_pubkey: str) -> bool:
+        """
+        Whether the bet account for bet_seed is already Completed in favour
+        of winner_pubkey. Reads past the cache; used before resending a
+        settlement that may have landed.
+        """
+        addresses = self.bet_addresses(bet_seed)
+        if not addresses:
+            return False
+        self.cache.invalidate(addresses[0])
+        account = await self.get_bet_account(addresses[0])
+        return account is not None and account["state"] == "Completed" and account["winner"] == winner_pubkey
+
+    async def refund_bet(self, escrow_address: str, creator_pubkey: str, bet_seed: Optional[str] = None) -> bool:
+        """
+        Return an expired, unjoined bet's stake from escrow to its creator.
+        Refunds are batched into cancel_bets transactions like settlements.
+        """
+        try:
+            if self.settlements is not None and bet_seed is not None:
+                with STAGE_SECONDS.time("refund_bet"):
+                    await self.settlements.refund(bet_seed, creator_pubkey)
+                self.cache.invalidate(escrow_address, creator_pubkey, *self.bet_addresses(bet_seed))
+                return True
+            if self.bet_addresses(bet_seed):
+                # A real escrow PDA with nobody configured to sign cancel_bets
+                logger.error("Cannot refund bet %s on chain without SOLANA_SETTLER_KEYPAIR", bet_seed)
+                return False
+
+            # In reality, you would:
+            # 1. Verify nobody joined the bet
+            # 2. Transfer the stake back to the creator
+            # 3. Close escrow account
+
+            self.cache.invalidate(escrow_address, creator_pubkey, *self.bet_addresses(bet_seed))
             return True
         except Exception as e:
-            print(f"Error settling bet: {str(e)}")
+            logger.error("Error refunding bet: %s", e)
             return False
 
-    async def get_token_balance(self, wallet_address: str) -> Optional[float]:
+    async def get_token_balance(self, wallet_address: str, commitment: str = "confirmed") -> Optional[float]:
         """
         Get the COD token balance for a wallet.
         """
         try:
-            # Convert address string to PublicKey
-            pubkey = PublicKey(wallet_address)
-            
-            # Get token account info
-            # This is simplified - you'll need proper token account derivation
-            response = await self.client.get_token_accounts_by_owner(
-                pubkey,
-                {"mint": self.token_mint}
-            )
-            
-            if response["result"]["value"]:
-                # Parse balance from the first token account
-                balance = float(response["result"]["value"][0]["account"]["data"]["parsed"]["info"]["tokenAmount"]["uiAmount"])
-                return balance
-            
-            return 0.0
+            async def fetch():
+                result = await self.client.call(
+                    "getTokenAccountsByOwner",
+                    self._token_accounts_params(wallet_address, commitment)
+                )
+                return self._parse_token_balance(result), result["context"]["slot"]
+
+            return await self.cache.get("balance", wallet_address, commitment, fetch)
+        except Exception as e:
+            logger.error("Error getting token balance: %s", e)
+            return None
+
+    async def get_token_balances(
+        self,
+        wallet_addresses: List[str],
+        commitment: str = "confirmed"
+    ) -> Dict[str, Optional[float]]:
+        """
+        Get COD token balances for several wallets (e.g. every participant
+        of a pool bet). Cached balances are used as-is; the rest are fetched
+        in a single JSON-RPC batch round trip.
+        """
+        balances: Dict[str, Optional[float]] = {}
+        missing = []
+        for address in wallet_addresses:
+            value, fresh = self.cache.peek(("balance", address, commitment))
+            if value is MISSING or not fresh:
+                missing.append(address)
+            else:
+                balances[address] = value
+        if not missing:
+            return balances
+
+        try:
+            results = await self.client.batch([
+                ("getTokenAccountsByOwner", self._token_accounts_params(address, commitment))
+                for address in missing
+            ])
+        except Exception as e:
+            logger.error("Error getting token balances: %s", e)
+            balances.update({address: None for address in missing})
+            return balances
+
+        for address, result in zip(missing, results):
+            if isinstance(result, SolanaRPCError):
+                logger.error("Error getting token balance for %s: %s", address, result)
+                balances[address] = None
+            else:
+                balances[address] = self._parse_token_balance(result)
+                self.cache.put(("balance", address, commitment), balances[address], result["context"]["slot"])
+        return balances
+
+    async def get_bet_account(self, bet_address: str, commitment: str = "confirmed") -> Optional[Dict]:
+        """
+        Get the decoded escrow `Bet` account state, or None if it doesn't exist.
+        """
+        try:
+            async def fetch():
+                result = await self.client.call(
+                    "getAccountInfo",
+                    [bet_address, {"encoding": "base64", "commitment": commitment}]
+                )
+                account = result["value"]
+                state = decode_bet_account(base64.b64decode(account["data"][0])) if account else None
+                return state, result["context"]["slot"]
+
+            return await self.cache.get("bet", bet_address, commitment, fetch)
         except Exception as e:
-            print(f"Error getting token balance: {str(e)}")
-            return None 
\ No newline at end of file
+            logger.error("Error getting bet account: %s", e)
+            return None
+
+    def start(self) -> None:
+        """
+        Follow on-chain changes to cached accounts when SOLANA_WS_URL is set.
+        """
+        if self.ws_url and self._subscription is None:
+            self._subscription = asyncio.create_task(run_account_subscription(
+                self.ws_url,
+                self.cache,
+                program_id=str(self.program_id) if self.program_id else None,
+                token_mint=self.token_mint,
+            ))
+
+    async def warm(self) -> None:
+        # Keep-alive connections to the RPC endpoints before the first call
+        await self.client.warm()
+
+    async def close(self) -> None:
+        if self._subscription is not None:
+            self._subscription.cancel()
+            await asyncio.gather(self._subscription, return_exceptions=True)
+            self._subscription = None
+        if self.settlements is not None:
+            await self.settlements.close()
+        await self.client.close()
+
+    def _token_accounts_params(self, wallet_address: str, commitment: str = "confirmed") -> List:
+        # Validate the address locally before spending an RPC call on it
+        owner = str(Pubkey.from_string(wallet_address))
+        return [owner, {"mint": self.token_mint}, {"encoding": "jsonParsed", "commitment": commitment}]
+
+    def _parse_token_balance(self, result: Dict) -> float:
+        # Sum across token accounts; usually just the associated token account
+        accounts = result["value"] if result else []
+        return float(sum(
+            account["account"]["data"]["parsed"]["info"]["tokenAmount"]["uiAmount"] or 0
+            for account in accounts
+        ))
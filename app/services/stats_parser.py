@@ -0,0 +1,175 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from app.schemas.stats_schemas import MatchStats
+
+_decoder = json.JSONDecoder()
+
+
+class JSONRepairParser:
+    """
+    Incremental JSON scanner that can close a truncated document.
+
+    feed() chunks as they arrive (a streamed completion, or the whole reply
+    at once). The scanner skips anything before the first '{' or '[' (code
+    fences, prose), tracks open containers and remembers the last point
+    where a value was complete. result() parses the document if it is
+    complete, otherwise the prefix up to that point with the open
+    containers closed. A value cut off mid-way (a number that may have
+    more digits, a half-written string or key) is dropped, never guessed.
+    """
+
+    def __init__(self):
+        self._chunks: List[str] = []
+        self._length = 0
+        self._started = False
+        self._start = 0
+        self._done = False
+        self._closers: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_is_key = False
+        self._expecting_key = False
+        self._in_literal = False
+        # (end offset, closers) of the last complete value
+        self._safe: Optional[Tuple[int, Tuple[str, ...]]] = None
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def feed(self, chunk: str) -> None:
+        if self._done:
+            return
+        offset = self._length
+        self._chunks.append(chunk)
+        self._length += len(chunk)
+
+        for index, char in enumerate(chunk):
+            position = offset + index
+            if not self._started:
+                if char not in "{[":
+                    continue
+                self._started = True
+                self._start = position
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if not self._string_is_key:
+                        self._mark_safe(position + 1)
+                continue
+
+            if self._in_literal:
+                if char not in ",}] \t\r\n":
+                    continue
+                self._in_literal = False
+                self._mark_safe(position)
+
+            if char == '"':
+                self._in_string = True
+                self._string_is_key = self._expecting_key
+            elif char == "{":
+                self._closers.append("}")
+                self._expecting_key = True
+            elif char == "[":
+                self._closers.append("]")
+                self._expecting_key = False
+            elif char in "}]":
+                if not self._closers or self._closers[-1] != char:
+                    # Malformed; keep what was complete so far
+                    self._done = True
+                    return
+                self._closers.pop()
+                self._expecting_key = False
+                self._mark_safe(position + 1)
+                if not self._closers:
+                    self._done = True
+                    return
+            elif char == ":":
+                self._expecting_key = False
+            elif char == ",":
+                self._expecting_key = self._closers[-1] == "}"
+            elif not char.isspace():
+                self._in_literal = True
+
+    def result(self) -> Any:
+        """
+        The parsed (possibly repaired) document. Raises json.JSONDecodeError
+        if nothing usable was seen.
+        """
+        text = "".join(self._chunks)
+        if self._safe is None:
+            raise json.JSONDecodeError("No complete JSON value", text, 0)
+        end, closers = self._safe
+        return json.loads(text[self._start:end] + "".join(reversed(closers)))
+
+    def _mark_safe(self, end: int) -> None:
+        self._safe = (end, tuple(self._closers))
+
+
+def parse_json(content: str) -> Tuple[Any, bool]:
+    """
+    Parse a model reply into JSON, returning (value, repaired).
+
+    A bare JSON reply (what schema-constrained output produces) takes one
+    json.loads. Fenced or prose-wrapped replies are decoded from the first
+    brace. Only if that fails is the reply scanned and repaired.
+    """
+    try:
+        return json.loads(content), False
+    except json.JSONDecodeError:
+        pass
+
+    starts = [index for index in (content.find("{"), content.find("[")) if index >= 0]
+    if starts:
+        try:
+            return _decoder.raw_decode(content, min(starts))[0], False
+        except json.JSONDecodeError:
+            pass
+
+    parser = JSONRepairParser()
+    parser.feed(content)
+    return parser.result(), True
+
+
+def normalize_stats(stats: Dict) -> Dict:
+    """
+    Map the shapes models return without a schema onto the MatchStats layout.
+    """
+    if not isinstance(stats, dict):
+        return {"team_scores": {}, "player_stats": {}, "game_info": {}}
+    if "player_stats" in stats and "game_info" in stats:
+        # Already MatchStats shaped, the usual case with schema output
+        return {
+            "team_scores": stats.get("team_scores") or {},
+            "player_stats": stats["player_stats"],
+            "game_info": stats["game_info"],
+        }
+
+    return {
+        "team_scores": stats.get("team_scores", stats.get("teams", {})) or {},
+        "player_stats": stats.get("player_stats") or {
+            key: stats[key] for key in ("kills", "deaths", "assists") if key in stats
+        },
+        "game_info": stats.get("game_info") or {
+            key: stats[key] for key in ("mode", "map") if key in stats
+        },
+    }
+
+
+def validate_match_stats(stats: Dict) -> Optional[MatchStats]:
+    """
+    Validate normalized stats against MatchStats; None if they don't fit.
+    The model's validator is built once at import and runs in pydantic-core.
+    """
+    try:
+        return MatchStats.model_validate(stats)
+    except ValidationError:
+        return None
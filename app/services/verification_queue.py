@@ -0,0 +1,438 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from app.schemas.bet_schemas import VerificationJobStatus
+from app.services.metrics import IN_FLIGHT, STAGE_SECONDS, VERIFICATION_JOBS
+from app.services.request_context import current_request_id, request_id_var
+
+logger = logging.getLogger(__name__)
+
+# A stage receives the job context dict and adds its outputs to it
+Stage = Tuple[str, Callable[[Dict], Awaitable[None]]]
+# Called with the job context, final status and error when a job ends
+FinishHook = Callable[[Dict, VerificationJobStatus, Optional[str]], Awaitable[None]]
+
+TERMINAL_STATUSES = {
+    VerificationJobStatus.SUCCEEDED,
+    VerificationJobStatus.FAILED,
+    VerificationJobStatus.DEAD_LETTERED,
+}
+
+
+class VerificationRejected(Exception):
+    """
+    Raised by a stage when the submission itself is invalid (bad stats,
+    conditions not met). These are final and never retried.
+    """
+
+
+class InMemoryJobBackend:
+    """
+    Single-process job store. Jobs are lost on restart; finished jobs
+    beyond max_finished_jobs are dropped, oldest first.
+    """
+
+    def __init__(self, max_finished_jobs: int = 10_000):
+        self.max_finished_jobs = max_finished_jobs
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._jobs: Dict[str, Dict] = {}
+        # Finished job ids in completion order, for eviction
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+        self._dead_letter: List[str] = []
+        self._delayed: Set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        # Pending retries die with the process, like the rest of the queue
+        for task in self._delayed:
+            task.cancel()
+        await asyncio.gather(*self._delayed, return_exceptions=True)
+
+    async def push(self, job_id: str) -> None:
+        await self._queue.put(job_id)
+
+    async def push_later(self, job_id: str, delay: float) -> None:
+        task = asyncio.create_task(self._push_after(job_id, delay))
+        self._delayed.add(task)
+        task.add_done_callback(self._delayed.discard)
+
+    async def _push_after(self, job_id: str, delay: float) -> None:
+        await asyncio.sleep(delay)
+        await self.push(job_id)
+
+    async def pop(self, timeout: float) -> Optional[str]:
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def ack(self, job_id: str) -> None:
+        pass
+
+    async def save(self, job: Dict) -> None:
+        self._jobs[job["id"]] = job
+        if job["status"] in TERMINAL_STATUSES and job["status"] != VerificationJobStatus.DEAD_LETTERED:
+            self._finished[job["id"]] = None
+            while len(self._finished) > self.max_finished_jobs:
+                self._jobs.pop(self._finished.popitem(last=False)[0], None)
+
+    async def create(self, job: Dict) -> None:
+        await self.save(job)
+
+    async def drop_image(self, job_id: str) -> None:
+        pass
+
+    async def load(self, job_id: str) -> Optional[Dict]:
+        return self._jobs.get(job_id)
+
+    async def dead_letter(self, job_id: str) -> None:
+        self._dead_letter.append(job_id)
+
+    async def dead_letters(self) -> List[str]:
+        return list(self._dead_letter)
+
+
+# Moves due retries from the delayed set onto the queue
+_PROMOTE_DUE = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 100)
+for _, job_id in ipairs(due) do
+    redis.call('ZREM', KEYS[1], job_id)
+    redis.call('RPUSH', KEYS[2], job_id)
+end
+return #due
+"""
+
+
+class RedisJobBackend:
+    """
+    Durable job store shared by every uvicorn worker.
+
+    Job records are JSON; the screenshot is written once, under its own key,
+    when the job is created. A popped job moves to this process's
+    processing list until it is acked, and processes whose heartbeat
+    lapsed (crashed mid-job) have their processing lists pushed back onto
+    the queue. Retries wait in a sorted set scored by due time, so they
+    survive restarts too.
+    """
+
+    def __init__(
+        self,
+        redis_url: str,
+        prefix: str = "verify:",
+        job_ttl: int = 86400,
+        heartbeat_seconds: float = 10.0
+    ):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(redis_url)
+        self.prefix = prefix
+        self.job_ttl = job_ttl
+        self.heartbeat_seconds = heartbeat_seconds
+        self.consumer = uuid.uuid4().hex
+        self._processing = prefix + "processing:" + self.consumer
+        self._promote = self.client.register_script(_PROMOTE_DUE)
+        self._promoted_at = 0.0
+        self._heartbeat_at = 0.0
+
+    async def start(self) -> None:
+        await self._heartbeat()
+        await self.recover()
+
+    async def close(self) -> None:
+        # Jobs interrupted by shutdown go back to the front of the queue
+        while await self.client.lmove(self._processing, self.prefix + "queue", "RIGHT", "LEFT") is not None:
+            pass
+        await self.client.delete(self.prefix + "alive:" + self.consumer)
+        await self.client.aclose()
+
+    async def recover(self) -> int:
+        """
+        Push jobs held by processes that stopped heartbeating back to the
+        front of the queue. Returns how many were recovered.
+        """
+        recovered = 0
+        async for key in self.client.scan_iter(match=self.prefix + "processing:*"):
+            consumer = key.decode().rsplit(":", 1)[1]
+            if consumer == self.consumer or await self.client.exists(self.prefix + "alive:" + consumer):
+                continue
+            while await self.client.lmove(key, self.prefix + "queue", "RIGHT", "LEFT") is not None:
+                recovered += 1
+        if recovered:
+            logger.warning("Recovered %d verification jobs from stopped workers", recovered)
+        return recovered
+
+    async def push(self, job_id: str) -> None:
+        await self.client.rpush(self.prefix + "queue", job_id)
+
+    async def push_later(self, job_id: str, delay: float) -> None:
+        await self.client.zadd(self.prefix + "delayed", {job_id: time.time() + delay})
+
+    async def pop(self, timeout: float) -> Optional[str]:
+        now = time.monotonic()
+        if now - self._promoted_at >= min(timeout, 1.0):
+            self._promoted_at = now
+            await self._promote(keys=[self.prefix + "delayed", self.prefix + "queue"], args=[time.time()])
+        if now - self._heartbeat_at >= self.heartbeat_seconds:
+            await self._heartbeat()
+            await self.recover()
+        item = await self.client.blmove(
+            self.prefix + "queue", self._processing, timeout=max(1, int(timeout)), src="LEFT", dest="RIGHT"
+        )
+        return item.decode() if item else None
+
+    async def ack(self, job_id: str) -> None:
+        await self.client.lrem(self._processing, 1, job_id)
+
+    async def _heartbeat(self) -> None:
+        self._heartbeat_at = time.monotonic()
+        await self.client.set(
+            self.prefix + "alive:" + self.consumer, 1, ex=max(1, int(self.heartbeat_seconds * 3))
+        )
+
+    async def save(self, job: Dict) -> None:
+        # The screenshot was written by create(); only the record changes
+        record = dict(job)
+        record["payload"] = {key: value for key, value in record["payload"].items() if key != "image"}
+        await self.client.set(self.prefix + "job:" + job["id"], json.dumps(record, default=str), ex=self.job_ttl)
+
+    async def create(self, job: Dict) -> None:
+        image = job["payload"].get("image")
+        if image is not None:
+            await self.client.set(self.prefix + "image:" + job["id"], bytes(image), ex=self.job_ttl)
+        await self.save(job)
+
+    async def drop_image(self, job_id: str) -> None:
+        await self.client.delete(self.prefix + "image:" + job_id)
+
+    async def load(self, job_id: str) -> Optional[Dict]:
+        raw = await self.client.get(self.prefix + "job:" + job_id)
+        if raw is None:
+            return None
+        job = json.loads(raw)
+        image = await self.client.get(self.prefix + "image:" + job_id)
+        if image is not None:
+            job["payload"]["image"] = image
+        return job
+
+    async def dead_letter(self, job_id: str) -> None:
+        await self.client.rpush(self.prefix + "dlq", job_id)
+
+    async def dead_letters(self) -> List[str]:
+        return [item.decode() for item in await self.client.lrange(self.prefix + "dlq", 0, -1)]
+
+
+class VerificationQueue:
+    """
+    Runs bet verifications off the request path.
+
+    The endpoint enqueues a job and returns its id; a pool of async workers
+    runs the configured stages (OCR, stats validation, condition checks,
+    settlement) with per-stage timing. Unexpected errors are retried with
+    exponential backoff, skipping stages that already completed; jobs that
+    exhaust their attempts go to the dead-letter queue. on_finish lets the
+    stages' owner finalize whatever they wrote while the job was running.
+    """
+
+    def __init__(
+        self,
+        stages: List[Stage],
+        backend=None,
+        num_workers: int = 4,
+        max_attempts: int = 3,
+        retry_backoff_seconds: float = 1.0,
+        on_finish: Optional[FinishHook] = None,
+    ):
+        self.stages = stages
+        self.backend = backend or InMemoryJobBackend()
+        self.num_workers = num_workers
+        self.max_attempts = max_attempts
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.on_finish = on_finish
+
+        self._workers: List[asyncio.Task] = []
+        self._events: Dict[str, asyncio.Event] = {}
+        self._running = False
+
+    @classmethod
+    def from_env(cls, stages: List[Stage], on_finish: Optional[FinishHook] = None) -> "VerificationQueue":
+        if os.getenv("VERIFICATION_JOB_BACKEND", "memory") == "redis":
+            backend = RedisJobBackend(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+        else:
+            backend = InMemoryJobBackend(int(os.getenv("VERIFICATION_MAX_FINISHED_JOBS", "10000")))
+        return cls(
+            stages,
+            backend=backend,
+            num_workers=int(os.getenv("VERIFICATION_WORKERS", "4")),
+            max_attempts=int(os.getenv("VERIFICATION_MAX_ATTEMPTS", "3")),
+            retry_backoff_seconds=float(os.getenv("VERIFICATION_RETRY_BACKOFF_SECONDS", "1.0")),
+            on_finish=on_finish,
+        )
+
+    async def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        await self.backend.start()
+        self._workers = [
+            asyncio.create_task(self._worker(index)) for index in range(self.num_workers)
+        ]
+
+    async def stop(self) -> None:
+        self._running = False
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        await self.backend.close()
+
+    async def enqueue(self, payload: Dict) -> str:
+        """
+        Store a new job and hand it to the workers. Returns the job id.
+        """
+        now = datetime.utcnow().isoformat()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": VerificationJobStatus.QUEUED,
+            "attempts": 0,
+            "created_at": now,
+            "updated_at": now,
+            "completed_stages": [],
+            "stage_timings_ms": {},
+            "context": {},
+            "result": None,
+            "error": None,
+            "payload": payload,
+            # Logs from the workers carry the id of the request that queued the job
+            "request_id": current_request_id(),
+        }
+        await self.backend.create(job)
+        await self.backend.push(job["id"])
+        return job["id"]
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        return await self.backend.load(job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict]:
+        """
+        Long-poll until the job reaches a terminal status or timeout expires.
+        Local completions wake the waiter immediately; jobs finished by
+        another worker process are picked up by periodic reloads.
+        """
+        deadline = time.monotonic() + timeout
+        event = self._events.setdefault(job_id, asyncio.Event())
+        try:
+            while True:
+                job = await self.backend.load(job_id)
+                remaining = deadline - time.monotonic()
+                if job is None or job["status"] in TERMINAL_STATUSES or remaining <= 0:
+                    return job
+                try:
+                    await asyncio.wait_for(event.wait(), min(remaining, 0.5))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._events.pop(job_id, None)
+
+    async def dead_letters(self) -> List[str]:
+        return await self.backend.dead_letters()
+
+    async def _worker(self, index: int) -> None:
+        while self._running:
+            try:
+                job_id = await self.backend.pop(timeout=1.0)
+                if job_id is None:
+                    continue
+                try:
+                    job = await self.backend.load(job_id)
+                    if job is not None:
+                        await self._run(job)
+                except Exception:
+                    logger.exception("Verification worker %d error", index)
+                # Skipped when cancelled mid-job, which leaves the job in the
+                # processing list to be resumed
+                await self.backend.ack(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Verification worker %d error", index)
+
+    async def _run(self, job: Dict) -> None:
+        token = request_id_var.set(job.get("request_id") or job["id"])
+        try:
+            with IN_FLIGHT.track("verification"):
+                await self._run_stages(job)
+        finally:
+            request_id_var.reset(token)
+
+    async def _run_stages(self, job: Dict) -> None:
+        job["attempts"] += 1
+        await self._update(job, VerificationJobStatus.RUNNING)
+
+        context = job["context"]
+        context.update(job["payload"], job_id=job["id"])
+        try:
+            for name, stage in self.stages:
+                if name in job["completed_stages"]:
+                    continue
+                start = time.perf_counter()
+                try:
+                    await stage(context)
+                finally:
+                    elapsed = time.perf_counter() - start
+                    job["stage_timings_ms"][name] = round(elapsed * 1000, 3)
+                    STAGE_SECONDS.observe(elapsed, name)
+                job["completed_stages"].append(name)
+        except VerificationRejected as e:
+            job["error"] = str(e)
+            await self._finish(job, VerificationJobStatus.FAILED)
+            return
+        except Exception as e:
+            job["error"] = str(e)
+            if job["attempts"] >= self.max_attempts:
+                await self.backend.dead_letter(job["id"])
+                await self._finish(job, VerificationJobStatus.DEAD_LETTERED)
+                return
+            await self._update(job, VerificationJobStatus.RETRYING)
+            await self.backend.push_later(
+                job["id"], self.retry_backoff_seconds * (2 ** (job["attempts"] - 1))
+            )
+            return
+
+        job["error"] = None
+        job["result"] = context.get("result")
+        await self._finish(job, VerificationJobStatus.SUCCEEDED)
+
+    async def _update(self, job: Dict, status: VerificationJobStatus) -> None:
+        job["status"] = status
+        job["updated_at"] = datetime.utcnow().isoformat()
+        # Only the payload keys are needed to resume; drop bulky stage inputs
+        job["context"] = {
+            key: value for key, value in job["context"].items()
+            if key not in job["payload"]
+        }
+        await self.backend.save(job)
+
+    async def _finish(self, job: Dict, status: VerificationJobStatus) -> None:
+        VERIFICATION_JOBS.inc(1, status.value)
+        if self.on_finish:
+            try:
+                await self.on_finish(job["context"], status, job["error"])
+            except Exception:
+                logger.exception("Error finishing verification job %s", job["id"])
+        # Keep the screenshot only for dead-lettered jobs so they can be replayed
+        if status != VerificationJobStatus.DEAD_LETTERED:
+            job["payload"].pop("image", None)
+            await self.backend.drop_image(job["id"])
+        await self._update(job, status)
+        event = self._events.get(job["id"])
+        if event:
+            event.set()
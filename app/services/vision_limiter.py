@@ -0,0 +1,250 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class VisionRequestShed(Exception):
+    """
+    A model call was dropped before it was sent: its deadline passed while
+    queued, or the current model latency means it can't finish in time.
+    """
+
+
+class TokenBucket:
+    """
+    Refills continuously at per_minute / 60 per second up to burst. take()
+    may drive the balance negative, so one call larger than the burst still
+    goes through once the bucket is full and is paid back before the next.
+    """
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.rate = per_minute / 60
+        self.capacity = burst or max(per_minute / 10, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """
+        Seconds until amount (capped at the burst) is available.
+        """
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        return 0.0 if self.tokens >= needed else (needed - self.tokens) / self.rate
+
+    def take(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.tokens -= amount
+
+
+class _Waiter:
+    __slots__ = ("future", "deadline", "tokens")
+
+    def __init__(self, future: asyncio.Future, deadline: Optional[float], tokens: float):
+        self.future = future
+        self.deadline = deadline
+        self.tokens = tokens
+
+
+class Permit:
+    """
+    One model call: `async with limiter.acquire(...) as permit:` waits for
+    a slot. Report a 429 with throttled() and other failures the block
+    handles itself with failed(); the call's latency and outcome feed the
+    concurrency limit when the block exits.
+    """
+
+    __slots__ = ("limiter", "priority", "deadline", "tokens", "start", "retry_after", "ok")
+
+    def __init__(self, limiter: "VisionRateLimiter", priority: float, deadline: Optional[float], tokens: float):
+        self.limiter = limiter
+        self.priority = priority
+        self.deadline = deadline
+        self.tokens = tokens
+        self.start = 0.0
+        self.retry_after: Optional[float] = None
+        self.ok = True
+
+    def failed(self) -> None:
+        self.ok = False
+
+    def throttled(self, retry_after: Optional[float] = None) -> None:
+        self.retry_after = retry_after if retry_after is not None else self.limiter.default_pause_seconds
+
+    async def __aenter__(self) -> "Permit":
+        await self.limiter._wait(self.priority, self.deadline, self.tokens)
+        self.start = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.limiter._release(self, succeeded=exc_type is None and self.ok)
+
+
+class VisionRateLimiter:
+    """
+    Admission control for vision model calls.
+
+    Requests and tokens per minute are paced by token buckets sized to the
+    account's quota, so bursts queue locally instead of drawing 429s.
+    Concurrency is AIMD: it grows by one per round trip while calls come
+    back under latency_target_seconds, and halves (at most once per round
+    trip) on a 429 or a slow call; a 429 also pauses dispatch for its
+    Retry-After. Waiters are served highest priority first (the bet's
+    stake), and a waiter whose deadline passes, or that can't finish by it
+    at the current model latency, is shed with VisionRequestShed rather
+    than sent.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = 500,
+        tokens_per_minute: float = 300_000,
+        initial_concurrency: int = 8,
+        min_concurrency: int = 1,
+        max_concurrency: int = 32,
+        latency_target_seconds: float = 15.0,
+        max_wait_seconds: float = 30.0,
+        decrease_factor: float = 0.5,
+        default_pause_seconds: float = 1.0,
+    ):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.limit = float(initial_concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_target = latency_target_seconds
+        self.max_wait = max_wait_seconds
+        self.decrease_factor = decrease_factor
+        self.default_pause_seconds = default_pause_seconds
+
+        # (-priority, sequence, waiter); sequence keeps FIFO within a priority
+        self._waiters: List[Tuple[float, int, _Waiter]] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._latency: Optional[float] = None
+        self.in_flight = 0
+
+        self.granted = 0
+        self.shed = 0
+        self.throttled = 0
+        self.decreases = 0
+
+    @classmethod
+    def from_env(cls) -> "VisionRateLimiter":
+        return cls(
+            requests_per_minute=float(os.getenv("OPENAI_RPM", "500")),
+            tokens_per_minute=float(os.getenv("OPENAI_TPM", "300000")),
+            initial_concurrency=int(os.getenv("OPENAI_INITIAL_CONCURRENCY", "8")),
+            max_concurrency=int(os.getenv("OPENAI_MAX_CONCURRENCY", "32")),
+            latency_target_seconds=float(os.getenv("OPENAI_LATENCY_TARGET_SECONDS", "15")),
+            max_wait_seconds=float(os.getenv("OPENAI_MAX_WAIT_SECONDS", "30")),
+        )
+
+    def acquire(self, priority: float = 0.0, deadline: Optional[float] = None, tokens: float = 0.0) -> Permit:
+        """
+        deadline is time.monotonic() based and defaults to max_wait_seconds
+        after the wait starts; tokens is the call's estimated token cost.
+        """
+        return Permit(self, priority, deadline, tokens)
+
+    def expected_latency(self) -> float:
+        return self._latency or 0.0
+
+    def stats(self) -> Dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queued": sum(1 for _, _, waiter in self._waiters if not waiter.future.done()),
+            "granted": self.granted,
+            "shed": self.shed,
+            "throttled": self.throttled,
+            "decreases": self.decreases,
+            "expected_latency_seconds": self.expected_latency(),
+        }
+
+    async def _wait(self, priority: float, deadline: Optional[float], tokens: float) -> None:
+        if deadline is None:
+            deadline = time.monotonic() + self.max_wait
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), deadline, tokens)
+        heapq.heappush(self._waiters, (-priority, next(self._sequence), waiter))
+        self._dispatch()
+        try:
+            await asyncio.wait_for(waiter.future, timeout=max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            self.shed += 1
+            raise VisionRequestShed("Deadline passed waiting for a vision API slot")
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                # Granted just as the caller went away; hand the slot on
+                self.in_flight -= 1
+                self._dispatch()
+            raise
+
+    def _release(self, permit: Permit, succeeded: bool) -> None:
+        self.in_flight -= 1
+        now = time.monotonic()
+        if permit.retry_after is not None:
+            self.throttled += 1
+            self._paused_until = max(self._paused_until, now + permit.retry_after)
+            self._decrease(now)
+        elif succeeded:
+            latency = now - permit.start
+            self._latency = latency if self._latency is None else 0.8 * self._latency + 0.2 * latency
+            if latency > self.latency_target:
+                self._decrease(now)
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+        self._dispatch()
+
+    def _decrease(self, now: float) -> None:
+        # Calls already in flight saw the same congestion; react once per round trip
+        if now - self._last_decrease < max(self.expected_latency(), self.default_pause_seconds):
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_concurrency, self.limit * self.decrease_factor)
+        self.decreases += 1
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        now = time.monotonic()
+        while self._waiters and self.in_flight < int(self.limit):
+            _, _, waiter = self._waiters[0]
+            if waiter.future.done():
+                # Timed out or cancelled while queued
+                heapq.heappop(self._waiters)
+                continue
+            if waiter.deadline - now < self.expected_latency():
+                heapq.heappop(self._waiters)
+                self.shed += 1
+                waiter.future.set_exception(VisionRequestShed("Vision API can't answer before the deadline"))
+                continue
+
+            delay = max(
+                self._paused_until - now,
+                self.requests.delay(1, now) if self.requests else 0.0,
+                self.tokens.delay(waiter.tokens, now) if self.tokens else 0.0,
+            )
+            if delay > 0:
+                # The head waits for quota; lower priorities wait behind it
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+
+            heapq.heappop(self._waiters)
+            if self.requests:
+                self.requests.take(1, now)
+            if self.tokens:
+                self.tokens.take(waiter.tokens, now)
+            self.in_flight += 1
+            self.granted += 1
+            waiter.future.set_result(None)
@@ -0,0 +1,178 @@
+"""
+Benchmark GET /bets/active under a polling-heavy mobile workload.
+
+Fills the active bet index with --bets bets, then replays --polls polls
+from --clients clients. Each client sticks to one filter (no filter, a
+game mode, a map, a stake range, ...), as a lobby screen would, and sends
+back the last ETag it saw. Every --polls-per-write polls a bet is created
+or leaves the listing, which invalidates the cache.
+
+The "legacy" app runs the handler as it was before the response cache
+(index query, BetOut response_model validation, FastAPI's JSON path). The
+"cached" app is the bet router itself. Both run in-process over ASGI;
+server CPU is measured inside the app call, so client overhead is left
+out. Wire bytes are the response body plus headers.
+
+    python -m benchmarks.bench_active_cache [--bets 2000] [--clients 500] [--polls 20000] [--polls-per-write 20]
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from datetime import datetime
+from typing import List, Optional
+
+import httpx
+from fastapi import FastAPI, HTTPException, Query, Response
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("SERVICE_WARMUP", "off")
+
+from app.routers import bet  # noqa: E402
+from app.schemas.bet_schemas import BetCondition, BetOut, BetType  # noqa: E402
+
+GAME_MODES = ["Team Deathmatch", "Domination", "Hardpoint", "Search and Destroy"]
+MAPS = ["Shipment", "Nuketown", "Rust", "Terminal"]
+
+
+def make_bet(bet_id: int, rng: random.Random) -> BetOut:
+    return BetOut(
+        id=bet_id,
+        match_id=f"match-{bet_id}",
+        stake_amount=float(rng.choice([5, 10, 25, 50, 100, 250, 500])),
+        conditions=[BetCondition(type=BetType.KILLS, target_value=20, comparison=">", description="20+ kills")],
+        condition_logic="AND",
+        status="PENDING",
+        created_by=rng.randint(1, 10_000),
+        created_at=datetime.utcnow(),
+        time_limit_minutes=600,
+        min_kd_ratio=None,
+        required_game_mode=rng.choice(GAME_MODES + [None]),
+        required_map=rng.choice(MAPS + [None, None]),
+        max_participants=2,
+        current_participants=[1],
+        escrow_address=f"escrow_{bet_id}",
+    )
+
+
+def legacy_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/bets/active", response_model=List[BetOut])
+    async def get_active_bets(
+        response: Response,
+        game_mode: Optional[str] = None,
+        map_name: Optional[str] = None,
+        min_stake: Optional[float] = None,
+        max_stake: Optional[float] = None,
+        cursor: Optional[str] = None,
+        limit: int = Query(default=50, ge=1, le=200)
+    ):
+        try:
+            bets, next_cursor = bet.active_bets.query(
+                game_mode=game_mode, map_name=map_name, min_stake=min_stake,
+                max_stake=max_stake, cursor=cursor, limit=limit
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return bets
+
+    return app
+
+
+def cached_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(bet.router, prefix="/bets")
+    return app
+
+
+class CPUTimer:
+    """
+    ASGI wrapper adding up process CPU time spent inside the app.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.seconds = 0.0
+
+    async def __call__(self, scope, receive, send):
+        start = time.process_time()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.seconds += time.process_time() - start
+
+
+def filters(rng: random.Random) -> dict:
+    choice = rng.random()
+    if choice < 0.4:
+        return {}
+    if choice < 0.7:
+        return {"game_mode": rng.choice(GAME_MODES)}
+    if choice < 0.85:
+        return {"map_name": rng.choice(MAPS)}
+    return {"min_stake": rng.choice(["10", "50"]), "max_stake": "250"}
+
+
+async def run_app(name: str, app: FastAPI, args) -> None:
+    rng = random.Random(args.seed)
+    bet.active_bets.__init__()
+    for bet_id in range(1, args.bets + 1):
+        bet.active_bets.add(make_bet(bet_id, rng))
+    next_id = args.bets + 1
+    clients = [{"params": filters(rng), "etag": None} for _ in range(args.clients)]
+
+    timer = CPUTimer(app)
+    wire_bytes = 0
+    statuses = {}
+    async with httpx.AsyncClient(app=timer, base_url="http://bench") as client:
+        # One untimed poll per client, as a warm lobby would have
+        for state in clients:
+            response = await client.get("/bets/active", params=state["params"])
+            state["etag"] = response.headers.get("etag")
+        timer.seconds = 0.0
+
+        for poll in range(args.polls):
+            if poll and poll % args.polls_per_write == 0:
+                if rng.random() < 0.5:
+                    bet.active_bets.add(make_bet(next_id, rng))
+                    next_id += 1
+                else:
+                    bet.active_bets.remove(rng.choice(list(bet.active_bets._bets)))
+            state = rng.choice(clients)
+            headers = {"If-None-Match": state["etag"]} if state["etag"] else {}
+            response = await client.get("/bets/active", params=state["params"], headers=headers)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            wire_bytes += len(response.content) + sum(len(k) + len(v) + 4 for k, v in response.headers.items())
+            if response.status_code == 200:
+                state["etag"] = response.headers.get("etag")
+
+    print(
+        f"{name:<8}{timer.seconds / args.polls * 1e6:>12.0f}{wire_bytes / args.polls:>12.0f}"
+        f"{statuses.get(304, 0) / args.polls:>9.0%}"
+    )
+    if name == "cached":
+        print(f"cache: {bet.active_bets_cache.stats()}")
+
+
+async def run(args) -> None:
+    print(
+        f"{args.bets} active bets, {args.clients} clients, {args.polls} polls, "
+        f"one write every {args.polls_per_write} polls"
+    )
+    print(f"{'app':<8}{'cpu_us/req':>12}{'bytes/req':>12}{'304s':>9}")
+    await run_app("legacy", legacy_app(), args)
+    await run_app("cached", cached_app(), args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bets", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--polls", type=int, default=20000)
+    parser.add_argument("--polls-per-write", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,88 @@
+"""
+Benchmark GET /bets/active filtering as the number of open bets grows.
+
+Compares the old list-comprehension filtering with ActiveBetIndex
+queries for one page of results.
+
+    python -m benchmarks.bench_active_index [--sizes 10000 100000 1000000]
+"""
+import argparse
+import random
+import time
+from datetime import datetime
+
+from app.schemas.bet_schemas import BetOut, BetStatus
+from app.services.bet_index import ActiveBetIndex
+
+GAME_MODES = ["Team Deathmatch", "Search and Destroy", "Domination", "Hardpoint", "Warzone"]
+MAPS = ["Shipment", "Nuketown", "Rust", "Terminal", "Highrise", "Favela"]
+
+
+def make_bets(count: int, rng: random.Random):
+    now = datetime.utcnow()
+    for bet_id in range(1, count + 1):
+        # model_construct skips validation; these are trusted benchmark rows
+        yield BetOut.model_construct(
+            id=bet_id,
+            match_id=f"COD_{bet_id % 5000}",
+            stake_amount=float(rng.randint(1, 1000)),
+            conditions=[],
+            condition_logic="AND",
+            status=BetStatus.PENDING,
+            created_by=bet_id,
+            created_at=now,
+            time_limit_minutes=rng.randint(30, 240),
+            min_kd_ratio=None,
+            required_game_mode=rng.choice(GAME_MODES),
+            required_map=rng.choice(MAPS),
+            max_participants=2,
+            current_participants=[bet_id],
+            escrow_address="mock_escrow",
+            winner_id=None,
+        )
+
+
+def list_filter(bets, game_mode, min_stake, max_stake, limit):
+    filtered = [b for b in bets if b.required_game_mode == game_mode]
+    filtered = [b for b in filtered if b.stake_amount >= min_stake]
+    filtered = [b for b in filtered if b.stake_amount <= max_stake]
+    return filtered[:limit]
+
+
+def timed_us(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'open_bets':>10}{'list_us':>12}{'index_us':>12}{'index_page2_us':>16}{'create_us':>12}")
+    for size in args.sizes:
+        rng = random.Random(size)
+        bets = list(make_bets(size, rng))
+        index = ActiveBetIndex()
+        start = time.perf_counter()
+        for bet in bets:
+            index.add(bet)
+        create_us = (time.perf_counter() - start) / size * 1_000_000
+
+        query = dict(game_mode="Domination", min_stake=250.0, max_stake=750.0)
+        list_us = timed_us(lambda: list_filter(bets, limit=args.limit, **query), max(1, args.repeat // 10))
+        index_us = timed_us(lambda: index.query(limit=args.limit, **query), args.repeat)
+        _, cursor = index.query(limit=args.limit, **query)
+        page2_us = timed_us(lambda: index.query(limit=args.limit, cursor=cursor, **query), args.repeat)
+
+        print(f"{size:>10}{list_us:>12.0f}{index_us:>12.1f}{page2_us:>16.1f}{create_us:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Load test for the bet feed fan-out.
+
+Runs the same consume loop as the WebSocket endpoint for --idle subscribers
+filtered to a game mode that never sees events and --active subscribers
+that match every event, plus a few that never read so they get evicted.
+Publishes --events bet events at --rate per second and reports per-event
+dispatch cost, end-to-end delivery latency and memory per subscriber.
+
+    python -m benchmarks.bench_bet_feed [--idle 10000] [--active 1000] [--events 500] [--rate 50]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+
+from app.services.bet_events import BetEventType, BetFeedHub, FeedFilter, InMemoryBroker, SlowConsumer
+
+
+class TimingBroker(InMemoryBroker):
+    """
+    Records when each encoded event was handed to the hub.
+    """
+
+    def __init__(self, published_at):
+        super().__init__()
+        self.published_at = published_at
+
+    async def publish(self, text: str) -> None:
+        self.published_at[text] = time.perf_counter()
+        await super().publish(text)
+
+
+async def consume(hub, subscription, latencies, published_at, heartbeat):
+    try:
+        while True:
+            event = await subscription.next(heartbeat)
+            if event is not None and latencies is not None:
+                # Look the event up rather than parse it, like a socket send would
+                latencies.append(time.perf_counter() - published_at[event[1]])
+    except SlowConsumer:
+        pass
+    finally:
+        hub.unsubscribe(subscription)
+
+
+def make_bet(bet_id: int):
+    return {
+        "id": bet_id,
+        "match_id": f"COD_{bet_id % 100}",
+        "stake_amount": float(bet_id % 1000),
+        "status": "PENDING",
+        "required_game_mode": "Domination",
+        "required_map": "Shipment",
+        "current_participants": [1],
+        "max_participants": 2,
+    }
+
+
+async def run(args) -> None:
+    published_at = {}
+    hub = BetFeedHub(broker=TimingBroker(published_at), queue_size=args.queue_size)
+    await hub.start()
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    latencies = []
+    tasks = []
+    for _ in range(args.idle):
+        subscription = hub.subscribe(FeedFilter(game_mode="Warzone"))
+        tasks.append(asyncio.create_task(consume(hub, subscription, None, None, args.heartbeat)))
+    for index in range(args.active):
+        # Half unfiltered, half filtered by mode and stake range
+        feed_filter = FeedFilter() if index % 2 else FeedFilter(game_mode="Domination", min_stake=0)
+        subscription = hub.subscribe(feed_filter)
+        tasks.append(asyncio.create_task(consume(hub, subscription, latencies, published_at, args.heartbeat)))
+    # Subscribers that never read: their queues fill and they get evicted
+    stalled = [hub.subscribe(FeedFilter()) for _ in range(args.slow)]
+    await asyncio.sleep(0)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    dispatch_times = []
+    interval = 1 / args.rate
+    start = time.perf_counter()
+    for bet_id in range(args.events):
+        t = time.perf_counter()
+        await hub.publish(BetEventType.CREATED, make_bet(bet_id))
+        dispatch_times.append(time.perf_counter() - t)
+        # Pace the publisher and let consumers run
+        await asyncio.sleep(max(0.0, start + (bet_id + 1) * interval - time.perf_counter()))
+    await asyncio.sleep(0.5)
+
+    expected = args.events * args.active
+    latencies.sort()
+    print(f"subscribers: {args.idle} idle, {args.active} active, {args.slow} stalled")
+    print(f"memory per subscriber: {(after - before) / (args.idle + args.active + args.slow) / 1024:.1f} KiB")
+    print(f"events: {args.events} at {args.rate}/s, delivered {len(latencies)}/{expected}")
+    print(f"dispatch per event: median {statistics.median(dispatch_times) * 1000:.2f} ms, "
+          f"max {max(dispatch_times) * 1000:.2f} ms")
+    print(f"delivery latency: p50 {latencies[len(latencies) // 2] * 1000:.2f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
+    print(f"stalled subscribers evicted: {sum(s.evicted for s in stalled)}/{args.slow}")
+    print(f"hub stats: {hub.stats()}")
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await hub.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--idle", type=int, default=10_000)
+    parser.add_argument("--active", type=int, default=1_000)
+    parser.add_argument("--slow", type=int, default=10)
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=50.0)
+    parser.add_argument("--queue-size", type=int, default=256)
+    parser.add_argument("--heartbeat", type=float, default=15.0)
+    asyncio.run(run(parser.parse_args()))
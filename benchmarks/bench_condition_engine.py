@@ -0,0 +1,76 @@
+"""
+Benchmark settling every open bet on one match.
+
+Compares a per-bet Python loop over compiled predicates with the batched
+MatchConditionBook pass at 10k and 100k bets.
+
+    python -m benchmarks.bench_condition_engine [--sizes 10000 100000]
+"""
+import argparse
+import random
+import time
+
+from app.schemas.bet_schemas import BetCondition, BetType
+from app.services.condition_engine import ConditionEngine
+
+COMPARISONS = [">", "<", ">=", "<=", "==", "!="]
+CUSTOM_EXPRESSIONS = ["kd_ratio >= 1.5", "kda_ratio > 2", "assists >= 5", "deaths < 8"]
+
+
+def random_conditions(rng: random.Random):
+    conditions = []
+    for _ in range(rng.randint(1, 3)):
+        kind = rng.choice([BetType.KILLS, BetType.SCORE, BetType.PLACEMENT, BetType.CUSTOM])
+        if kind == BetType.CUSTOM:
+            conditions.append(BetCondition(type=kind, target_value=rng.choice(CUSTOM_EXPRESSIONS)))
+        else:
+            conditions.append(BetCondition(
+                type=kind,
+                target_value=rng.randint(0, 40),
+                comparison=rng.choice(COMPARISONS)
+            ))
+    return conditions, rng.choice(["AND", "OR"])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    match_stats = {
+        "player_stats": {"kills": 24, "deaths": 11, "assists": 6, "score": 30, "placement": 2},
+        "game_info": {"mode": "Team Deathmatch", "map": "Shipment"},
+    }
+
+    print(f"{'bets':>8}{'compile_ms':>12}{'loop_ms':>10}{'batched_ms':>12}{'speedup':>9}")
+    for size in args.sizes:
+        rng = random.Random(size)
+        engine = ConditionEngine()
+
+        start = time.perf_counter()
+        predicates = []
+        for bet_id in range(size):
+            conditions, logic = random_conditions(rng)
+            predicates.append((bet_id, engine.register(bet_id, "COD_123", conditions, logic)))
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        # First batched call pays the one-off array build
+        expected = engine.evaluate_match("COD_123", match_stats)
+
+        loop_ms = batched_ms = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            looped = {bet_id: predicate(match_stats) for bet_id, predicate in predicates}
+            loop_ms = min(loop_ms, (time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            batched = engine.evaluate_match("COD_123", match_stats)
+            batched_ms = min(batched_ms, (time.perf_counter() - start) * 1000)
+
+        assert looped == batched == expected
+        print(f"{size:>8}{compile_ms:>12.1f}{loop_ms:>10.1f}{batched_ms:>12.2f}{loop_ms / batched_ms:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark expiring a large number of bet deadlines.
+
+Schedules --bets deadlines spread over --spread seconds, cancels a share of
+them (settled early), then lets them all fire. Compares ExpiryScheduler
+with one loop.call_later timer per bet: schedule cost, memory, handler
+calls/wakeups and how late bets expire.
+
+    python -m benchmarks.bench_expiry_scheduler [--bets 1000000] [--spread 10]
+"""
+import argparse
+import asyncio
+import random
+import resource
+import statistics
+import time
+
+from app.services.expiry_scheduler import ExpiryScheduler
+
+
+def max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def summarize(name, bets, schedule_s, rss_mb, calls, lateness):
+    lateness = sorted(lateness)
+    p50 = statistics.median(lateness) * 1000 if lateness else 0.0
+    p99 = lateness[int(len(lateness) * 0.99) - 1] * 1000 if lateness else 0.0
+    print(
+        f"{name:<12}{bets:>10}{bets / schedule_s:>14.0f}{rss_mb:>10.0f}"
+        f"{calls:>10}{p50:>10.0f}{p99:>10.0f}"
+    )
+
+
+async def run_scheduler(deadlines, cancelled, resolution_ms):
+    lateness = []
+    calls = 0
+    remaining = asyncio.Event()
+    expected = len(deadlines) - len(cancelled)
+    expired = 0
+
+    async def on_expire(bet_ids):
+        nonlocal calls, expired
+        calls += 1
+        now = time.time()
+        # Sample rather than look at every id, like a cheap handler would
+        lateness.extend(now - deadlines[bet_id] for bet_id in bet_ids[::50])
+        expired += len(bet_ids)
+        if expired >= expected:
+            remaining.set()
+
+    scheduler = ExpiryScheduler(on_expire, resolution_ms=resolution_ms, max_batch=10_000)
+    await scheduler.start()
+    rss_before = max_rss_mb()
+    start = time.perf_counter()
+    for bet_id, deadline in enumerate(deadlines):
+        scheduler.schedule(bet_id, deadline)
+    schedule_s = time.perf_counter() - start
+    for bet_id in cancelled:
+        scheduler.cancel(bet_id)
+    rss_mb = max_rss_mb() - rss_before
+
+    await remaining.wait()
+    stats = scheduler.stats()
+    await scheduler.stop()
+    summarize("heap", len(deadlines), schedule_s, rss_mb, stats["wakeups"], lateness)
+    return calls
+
+
+async def run_timers(deadlines, cancelled):
+    loop = asyncio.get_running_loop()
+    lateness = []
+    done = asyncio.Event()
+    expected = len(deadlines) - len(cancelled)
+    fired = 0
+
+    def expire(bet_id):
+        nonlocal fired
+        fired += 1
+        if bet_id % 50 == 0:
+            lateness.append(time.time() - deadlines[bet_id])
+        if fired >= expected:
+            done.set()
+
+    rss_before = max_rss_mb()
+    start = time.perf_counter()
+    handles = [
+        loop.call_later(deadline - time.time(), expire, bet_id)
+        for bet_id, deadline in enumerate(deadlines)
+    ]
+    schedule_s = time.perf_counter() - start
+    for bet_id in cancelled:
+        handles[bet_id].cancel()
+    rss_mb = max_rss_mb() - rss_before
+
+    await done.wait()
+    summarize("per-bet", len(deadlines), schedule_s, rss_mb, fired, lateness)
+
+
+def make_deadlines(args):
+    rng = random.Random(42)
+    # Deadlines start after scheduling finishes so none fire mid-setup
+    base = time.time() + args.delay
+    deadlines = [base + rng.random() * args.spread for _ in range(args.bets)]
+    cancelled = rng.sample(range(args.bets), int(args.bets * args.cancel_share))
+    return deadlines, cancelled
+
+
+async def run(args) -> None:
+    print(f"{'mode':<12}{'bets':>10}{'sched/s':>14}{'rss_mb':>10}{'wakeups':>10}{'late_p50':>10}{'late_p99':>10}")
+    # Max RSS only grows, so run the baseline second or not at all
+    await run_scheduler(*make_deadlines(args), args.resolution_ms)
+    if not args.skip_baseline:
+        await run_timers(*make_deadlines(args))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bets", type=int, default=1_000_000)
+    parser.add_argument("--spread", type=float, default=10.0)
+    parser.add_argument("--delay", type=float, default=10.0)
+    parser.add_argument("--cancel-share", type=float, default=0.3)
+    parser.add_argument("--resolution-ms", type=int, default=1000)
+    parser.add_argument("--skip-baseline", action="store_true")
+    asyncio.run(run(parser.parse_args()))
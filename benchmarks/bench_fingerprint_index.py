@@ -0,0 +1,157 @@
+"""
+Benchmark screenshot reuse lookups in FingerprintIndex.
+
+Bulk-loads --entries synthetic 256-bit fingerprints, seals them with
+compact(), then appends --tail unsealed entries the way live uploads
+would. Real screenshot hashes are skewed (flat panels hash to zero bits),
+so each bit is set with its own probability rather than uniformly; that
+makes some chunk buckets far fuller than average, as in production.
+
+Half the queries are near-duplicates of stored entries (up to --radius
+bits flipped) and must be found; the rest are fresh screenshots. Reports
+query latency for the index against a numpy linear scan over the same
+memory-mapped records, recall on the near-duplicates, candidates scored
+per query, build time and size on disk.
+
+    python -m benchmarks.bench_fingerprint_index [--entries 1000000] [--queries 2000] [--radius 4]
+    python -m benchmarks.bench_fingerprint_index --entries 10000000 --scan-queries 10
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from app.services.fingerprint_index import (
+    CHUNKS,
+    HASH_WORDS,
+    RECORD,
+    FingerprintIndex,
+    chunk_column,
+    hamming,
+    hash_words,
+)
+
+
+def random_words(rng: np.random.Generator, count: int, bit_probability: np.ndarray) -> np.ndarray:
+    bits = rng.random((count, HASH_WORDS * 64), dtype=np.float32) < bit_probability
+    return np.packbits(bits, axis=1).view(">u8").astype(np.uint64)
+
+
+def words_to_int(words: np.ndarray) -> int:
+    return int.from_bytes(words.astype(">u8").tobytes(), "big")
+
+
+def flip_bits(rng: np.random.Generator, words: np.ndarray, count: int) -> np.ndarray:
+    flipped = words.copy()
+    for bit in rng.choice(HASH_WORDS * 64, size=count, replace=False):
+        flipped[bit // 64] ^= np.uint64(1 << (63 - bit % 64))
+    return flipped
+
+
+def load(index: FingerprintIndex, rng: np.random.Generator, count: int, bit_probability, batch: int) -> None:
+    for start in range(0, count, batch):
+        size = min(batch, count - start)
+        records = np.zeros(size, dtype=RECORD)
+        records["hash"] = random_words(rng, size, bit_probability)
+        records["bet_id"] = np.arange(start, start + size)
+        records["user_id"] = rng.integers(0, 100_000, size)
+        records["created_at"] = time.time()
+        index.add_many(records)
+
+
+def bucket_total(index: FingerprintIndex, phash: int) -> int:
+    """
+    Sealed entries scored for phash, before de-duplication.
+    """
+    query = hash_words(phash)[np.newaxis]
+    total = 0
+    for chunk in range(CHUNKS):
+        value = chunk_column(query, chunk)[0]
+        keys = index._keys[chunk]
+        total += int(keys.searchsorted(value, "right") - keys.searchsorted(value, "left"))
+    return total
+
+
+def percentile(values, q: float) -> float:
+    return float(np.percentile(values, q)) * 1000 if len(values) else 0.0
+
+
+def run(args) -> None:
+    rng = np.random.default_rng(args.seed)
+    bit_probability = rng.uniform(0.05, 0.5, HASH_WORDS * 64).astype(np.float32)
+    directory = args.directory or tempfile.mkdtemp(prefix="fingerprints-")
+    index = FingerprintIndex(directory, compact_threshold=max(args.tail + 1, 50_000))
+
+    try:
+        start = time.perf_counter()
+        load(index, rng, args.entries, bit_probability, args.batch)
+        loaded = time.perf_counter() - start
+        start = time.perf_counter()
+        index.compact()
+        compacted = time.perf_counter() - start
+        load(index, rng, args.tail, bit_probability, args.batch)
+
+        disk = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        total = len(index)
+        print(f"{total:,} entries ({args.tail:,} unsealed), {disk / 2**20:,.0f} MiB on disk")
+        print(f"load {loaded:.1f}s, compact {compacted:.1f}s")
+
+        index.query(0, args.radius)  # map the files
+        records = index._records
+        sources = rng.integers(0, total, args.queries // 2)
+        near = [
+            (words_to_int(flip_bits(rng, records["hash"][source], int(rng.integers(0, args.radius + 1)))), source)
+            for source in sources
+        ]
+        fresh = [(words_to_int(words), None) for words in random_words(rng, args.queries - len(near), bit_probability)]
+        queries = near + fresh
+        rng.shuffle(queries)
+
+        latencies, found, candidates = [], 0, []
+        for phash, source in queries:
+            start = time.perf_counter()
+            matches = index.query(phash, args.radius)
+            latencies.append(time.perf_counter() - start)
+            if source is not None and any(match["bet_id"] == records["bet_id"][source] for match in matches):
+                found += 1
+            candidates.append(bucket_total(index, phash))
+        scan = []
+        for phash, _ in queries[: args.scan_queries]:
+            start = time.perf_counter()
+            distances = hamming(records["hash"], hash_words(phash))
+            np.flatnonzero(distances <= args.radius)
+            scan.append(time.perf_counter() - start)
+
+        print(f"{'method':<14}{'queries':>9}{'p50_ms':>10}{'p99_ms':>10}{'max_ms':>10}")
+        print(
+            f"{'index':<14}{len(latencies):>9}{percentile(latencies, 50):>10.3f}"
+            f"{percentile(latencies, 99):>10.3f}{max(latencies) * 1000:>10.3f}"
+        )
+        print(
+            f"{'linear scan':<14}{len(scan):>9}{percentile(scan, 50):>10.3f}"
+            f"{percentile(scan, 99):>10.3f}{max(scan, default=0) * 1000:>10.3f}"
+        )
+        print(
+            f"sealed candidates per query: mean {np.mean(candidates):,.0f}, "
+            f"p99 {np.percentile(candidates, 99):,.0f} (+{args.tail:,} tail)"
+        )
+        print(f"near-duplicate recall within radius {args.radius}: {found}/{len(near)}")
+    finally:
+        if not args.directory:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--tail", type=int, default=20_000, help="entries appended after compaction")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--scan-queries", type=int, default=50)
+    parser.add_argument("--radius", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=500_000)
+    parser.add_argument("--directory", help="keep the index here instead of a temporary directory")
+    parser.add_argument("--seed", type=int, default=42)
+    run(parser.parse_args())
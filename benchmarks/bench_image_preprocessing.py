@@ -0,0 +1,79 @@
+"""
+Benchmark the screenshot preprocessing stage.
+
+Reports bytes-in/bytes-out and per-image CPU time for every image in a
+corpus directory. Without a corpus, a few synthetic phone-sized
+scoreboard screenshots are generated.
+
+    python -m benchmarks.bench_image_preprocessing [corpus_dir] [--format WEBP]
+"""
+import argparse
+import io
+import os
+import random
+import time
+
+from app.services.image_preprocessing import preprocess_screenshot
+
+
+def synthetic_corpus(count: int = 5):
+    from PIL import Image, ImageDraw, ImageFilter
+
+    rng = random.Random(0)
+    for index in range(count):
+        width, height = rng.choice([(2532, 1170), (2778, 1284), (1920, 1080)])
+        background = Image.effect_noise((width, height), 60).convert("RGB")
+        img = background.filter(ImageFilter.GaussianBlur(8))
+        draw = ImageDraw.Draw(img)
+        left, top = width // 6, height // 6
+        for row in range(12):
+            y = top + row * (height // 18)
+            draw.rectangle([left, y, width - left, y + height // 22], fill=(20, 25, 40))
+            for col in range(6):
+                draw.text((left + 40 + col * (width // 9), y + 8), str(rng.randint(0, 40)), fill="white")
+        output = io.BytesIO()
+        img.save(output, format="PNG")
+        yield f"synthetic_{index}.png", output.getvalue()
+
+
+def load_corpus(directory: str):
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                yield name, f.read()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus", nargs="?")
+    parser.add_argument("--format", default="JPEG")
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--no-crop", action="store_true")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus()
+    total_in = total_out = 0
+    total_cpu = 0.0
+    count = 0
+
+    print(f"{'image':<32}{'bytes_in':>12}{'bytes_out':>12}{'ratio':>8}{'cpu_ms':>10}  mime")
+    for name, data in corpus:
+        start = time.process_time()
+        output, mime_type = preprocess_screenshot(
+            data, args.format.upper(), args.quality, not args.no_crop
+        )
+        cpu_ms = (time.process_time() - start) * 1000
+
+        total_in += len(data)
+        total_out += len(output)
+        total_cpu += cpu_ms
+        count += 1
+        print(f"{name:<32}{len(data):>12}{len(output):>12}{len(output) / len(data):>8.2f}{cpu_ms:>10.1f}  {mime_type}")
+
+    if count:
+        print(f"{'TOTAL':<32}{total_in:>12}{total_out:>12}{total_out / total_in:>8.2f}{total_cpu / count:>10.1f}  (mean cpu_ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Stress test for the join path's per-bet slot reservations.
+
+Thousands of concurrent joiners hit pool bets while the simulated on-chain
+transfer takes --transfer-ms and fails --failure-rate of the time. Checks
+that no bet is ever overbooked and that throughput grows with the number of
+bets, compared with serializing every join behind one global lock.
+Pass --redis-url to run against the shared Redis backend.
+
+    python -m benchmarks.bench_join_reservations [--bets 1 10 100 1000] [--capacity 8]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from app.services.bet_repository import BetJoinRejected
+from app.services.join_reservations import (
+    InMemoryReservationBackend, JoinReservations, RedisReservationBackend
+)
+
+
+async def join(reservations, joined, bet_id, user_id, capacity, args, rng, lock=None):
+    async def attempt():
+        try:
+            await reservations.reserve(bet_id, user_id, [], capacity)
+        except BetJoinRejected:
+            return False
+        await asyncio.sleep(args.transfer_ms / 1000)
+        if rng.random() < args.failure_rate:
+            await reservations.release(bet_id, user_id)
+            return False
+        if not await reservations.confirm(bet_id, user_id):
+            return False
+        joined.setdefault(bet_id, set()).add(user_id)
+        return True
+
+    if lock is None:
+        return await attempt()
+    async with lock:
+        return await attempt()
+
+
+async def run_round(args, num_bets, backend_factory, global_lock=False):
+    reservations = JoinReservations(backend=backend_factory(), ttl_seconds=30)
+    rng = random.Random(num_bets)
+    joined = {}
+    lock = asyncio.Lock() if global_lock else None
+    # Oversubscribe every bet so the full path is exercised too
+    joiners = [
+        (bet_id, bet_id * 100_000 + joiner)
+        for bet_id in range(num_bets)
+        for joiner in range(args.capacity + args.extra_joiners)
+    ]
+    rng.shuffle(joiners)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        join(reservations, joined, bet_id, user_id, args.capacity, args, rng, lock)
+        for bet_id, user_id in joiners
+    ))
+    elapsed = time.perf_counter() - start
+
+    overbooked = [bet_id for bet_id, users in joined.items() if len(users) > args.capacity]
+    assert not overbooked, f"overbooked bets: {overbooked[:10]}"
+    for bet_id in range(num_bets):
+        await reservations.forget(bet_id)
+    return len(joiners), sum(results), elapsed
+
+
+async def check_ttl(backend_factory) -> None:
+    # A joiner that dies mid-transfer holds its slot only until the TTL
+    reservations = JoinReservations(backend=backend_factory(), ttl_seconds=0.2)
+    await reservations.reserve(-1, 1, [], 1)
+    try:
+        await reservations.reserve(-1, 2, [], 1)
+        raise AssertionError("second reservation should be rejected while the first is live")
+    except BetJoinRejected:
+        pass
+    await asyncio.sleep(0.3)
+    await reservations.reserve(-1, 2, [], 1)
+    await reservations.forget(-1)
+    print("abandoned reservation released after TTL: ok")
+
+
+async def run(args) -> None:
+    if args.redis_url:
+        backend_factory = lambda: RedisReservationBackend(args.redis_url, prefix="bench:join:")
+    else:
+        backend_factory = InMemoryReservationBackend
+
+    await check_ttl(backend_factory)
+    print(f"{'bets':>6}{'joiners':>9}{'joined':>8}{'wall_ms':>10}{'joins/s':>10}{'locked_ms':>11}")
+    for num_bets in args.bets:
+        attempts, successes, elapsed = await run_round(args, num_bets, backend_factory)
+        locked = ""
+        if num_bets <= args.max_locked_bets:
+            _, _, locked_elapsed = await run_round(args, num_bets, backend_factory, global_lock=True)
+            locked = f"{locked_elapsed * 1000:.0f}"
+        print(f"{num_bets:>6}{attempts:>9}{successes:>8}{elapsed * 1000:>10.0f}"
+              f"{successes / elapsed:>10.0f}{locked:>11}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bets", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--capacity", type=int, default=8)
+    parser.add_argument("--extra-joiners", type=int, default=4)
+    parser.add_argument("--transfer-ms", type=float, default=20.0)
+    parser.add_argument("--failure-rate", type=float, default=0.1)
+    parser.add_argument("--max-locked-bets", type=int, default=10,
+                        help="only run the global-lock baseline up to this many bets")
+    parser.add_argument("--redis-url")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,186 @@
+"""
+Benchmark the local scoreboard OCR tier on a labeled screenshot set.
+
+For every screenshot the local tier either answers or escalates to the
+vision model. Reports local latency, accuracy of the answers it gave
+(exact match on player stats, team scores and game info), escalation rate
+and the blended latency against sending everything to the model
+(--model-latency-ms, since the model call isn't made here).
+
+Without --dataset a synthetic set is rendered: two known layouts at
+several resolutions and JPEG qualities, plus screens from a mode with no
+layout, which should escalate. --dataset takes a directory with
+labels.jsonl ({"image": "file.png", "stats": {...}} per line) and
+--layouts the matching layout directory.
+
+    python -m benchmarks.bench_local_ocr [--screens 200] [--model-latency-ms 2500]
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from app.services.local_ocr import LocalOCRExtractor, extract_scoreboard
+from app.services.stats_parser import normalize_stats
+
+REFERENCE_SIZE = (1920, 1080)
+ANCHOR_BOX = [660, 40, 1260, 120]
+MAP_BOX = [760, 140, 1160, 200]
+PLAYER_BOXES = {"kills": [900, 520, 1020, 580], "deaths": [1080, 520, 1200, 580], "assists": [1260, 520, 1380, 580]}
+TEAM_BOXES = {"Allies": [300, 240, 460, 320], "Axis": [1460, 240, 1620, 320]}
+KNOWN_MODES = {"tdm": "TEAM DEATHMATCH", "dom": "DOMINATION"}
+UNKNOWN_MODES = ["HARDPOINT", "SEARCH AND DESTROY"]
+MAPS = ["SHIPMENT", "NUKETOWN", "RUST", "TERMINAL"]
+
+
+def font(size: int):
+    return ImageFont.load_default(size=size)
+
+
+def render_text(text: str, box, size: int, color=(235, 235, 235), background=(18, 22, 30)) -> Image.Image:
+    width, height = box[2] - box[0], box[3] - box[1]
+    img = Image.new("RGB", (width, height), background)
+    draw = ImageDraw.Draw(img)
+    left, top, right, bottom = draw.textbbox((0, 0), text, font=font(size))
+    draw.text(((width - (right - left)) / 2 - left, (height - (bottom - top)) / 2 - top), text, fill=color, font=font(size))
+    return img
+
+
+def build_layouts(directory: str) -> None:
+    os.makedirs(os.path.join(directory, "glyphs"), exist_ok=True)
+    for digit in range(10):
+        render_text(str(digit), [0, 0, 40, 60], 44).save(os.path.join(directory, "glyphs", f"{digit}.png"))
+    for map_name in MAPS:
+        render_text(map_name, MAP_BOX, 40).save(os.path.join(directory, f"map_{map_name.lower()}.png"))
+    for key, banner in KNOWN_MODES.items():
+        render_text(banner, ANCHOR_BOX, 52).save(os.path.join(directory, f"{key}_anchor.png"))
+        with open(os.path.join(directory, f"{key}.json"), "w") as f:
+            json.dump({
+                "name": f"{key}_postgame",
+                "reference_size": list(REFERENCE_SIZE),
+                "anchor": {"box": ANCHOR_BOX, "template": f"{key}_anchor.png"},
+                "game_info": {"mode": banner.title()},
+                "labels": {"map": {
+                    "box": MAP_BOX,
+                    "templates": {name.title(): f"map_{name.lower()}.png" for name in MAPS},
+                }},
+                "player_stats": PLAYER_BOXES,
+                "team_scores": TEAM_BOXES,
+                "glyphs": "glyphs",
+            }, f)
+
+
+def render_screen(rng: random.Random, banner: str, map_name: str, stats) -> bytes:
+    img = Image.new("RGB", REFERENCE_SIZE, (18, 22, 30))
+    for box, text, size in [(ANCHOR_BOX, banner, 52), (MAP_BOX, map_name, 40)]:
+        img.paste(render_text(text, box, size), box[:2])
+    for name, box in PLAYER_BOXES.items():
+        img.paste(render_text(str(stats["player_stats"][name]), box, 44), box[:2])
+    for team, box in TEAM_BOXES.items():
+        img.paste(render_text(str(stats["team_scores"][team]), box, 44), box[:2])
+
+    scale = rng.choice([(1280, 720), (1920, 1080), (2560, 1440)])
+    img = img.resize(scale, Image.BILINEAR)
+    if rng.random() < 0.3:
+        img = img.filter(ImageFilter.GaussianBlur(rng.uniform(0.5, 1.5)))
+    output = io.BytesIO()
+    img.save(output, format="JPEG", quality=rng.randint(60, 90))
+    return output.getvalue()
+
+
+def build_dataset(rng: random.Random, count: int):
+    dataset = []
+    for _ in range(count):
+        known = rng.random() < 0.8
+        banner = rng.choice(list(KNOWN_MODES.values()) if known else UNKNOWN_MODES)
+        map_name = rng.choice(MAPS)
+        stats = {
+            "team_scores": {"Allies": rng.randint(0, 75), "Axis": rng.randint(0, 75)},
+            "player_stats": {
+                "kills": rng.randint(0, 60), "deaths": rng.randint(0, 40), "assists": rng.randint(0, 25)
+            },
+            "game_info": {"mode": banner.title(), "map": map_name.title()},
+        }
+        dataset.append((render_screen(rng, banner, map_name, stats), stats))
+    return dataset
+
+
+def load_dataset(directory: str):
+    dataset = []
+    with open(os.path.join(directory, "labels.jsonl")) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                with open(os.path.join(directory, entry["image"]), "rb") as image:
+                    dataset.append((image.read(), normalize_stats(entry["stats"])))
+    return dataset
+
+
+async def pool_throughput(dataset, layouts_dir: str, min_confidence: float) -> float:
+    extractor = LocalOCRExtractor(layouts_dir, min_confidence=min_confidence)
+    # First pass spawns the workers and loads layouts in each of them
+    await asyncio.gather(*(extractor.extract(image) for image, _ in dataset))
+    start = time.perf_counter()
+    await asyncio.gather(*(extractor.extract(image) for image, _ in dataset))
+    elapsed = time.perf_counter() - start
+    extractor.shutdown()
+    return len(dataset) / elapsed
+
+
+def main(args) -> None:
+    with tempfile.TemporaryDirectory() as scratch:
+        if args.dataset:
+            dataset, layouts_dir = load_dataset(args.dataset), args.layouts
+        else:
+            layouts_dir = scratch
+            build_layouts(layouts_dir)
+            dataset = build_dataset(random.Random(42), args.screens)
+
+        # Warm the layout cache so the first screen isn't charged for loading
+        extract_scoreboard(dataset[0][0], layouts_dir)
+
+        latencies, answered, correct, wrong_fields = [], 0, 0, {}
+        for image, label in dataset:
+            start = time.perf_counter()
+            result = extract_scoreboard(image, layouts_dir, args.min_confidence)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if result is None or result["confidence"] < args.min_confidence:
+                continue
+            answered += 1
+            stats = normalize_stats(result["stats"])
+            if stats == label:
+                correct += 1
+            for section in ("player_stats", "team_scores", "game_info"):
+                if stats[section] != label[section]:
+                    wrong_fields[section] = wrong_fields.get(section, 0) + 1
+
+        throughput = asyncio.run(pool_throughput(dataset, layouts_dir, args.min_confidence))
+
+    escalated = len(dataset) - answered
+    local_mean = statistics.mean(latencies)
+    blended = local_mean + escalated / len(dataset) * args.model_latency_ms
+    latencies.sort()
+    print(f"screens            {len(dataset)}")
+    print(f"local p50/p99 ms   {statistics.median(latencies):.1f} / {latencies[int(len(latencies) * 0.99) - 1]:.1f}")
+    print(f"pool screens/s     {throughput:.0f}")
+    print(f"answered locally   {answered} ({answered / len(dataset):.1%})")
+    print(f"local accuracy     {correct / max(answered, 1):.1%}  wrong: {wrong_fields or 'none'}")
+    print(f"escalation rate    {escalated / len(dataset):.1%}")
+    print(f"mean latency ms    {blended:.0f} tiered vs {args.model_latency_ms:.0f} model only")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--screens", type=int, default=200)
+    parser.add_argument("--min-confidence", type=float, default=0.8)
+    parser.add_argument("--model-latency-ms", type=float, default=2500.0)
+    parser.add_argument("--dataset")
+    parser.add_argument("--layouts")
+    main(parser.parse_args())
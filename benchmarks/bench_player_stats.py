@@ -0,0 +1,177 @@
+"""
+Benchmark PlayerStatsStore: backfill from stored verifications and the
+K/D check on the join path.
+
+Generates --verifications rows shaped like BetRepository.iter_match_stats
+output for --players players (activity is skewed, a few players submit
+thousands of matches) over --days days, spread across game modes and maps, with
+some mode/map fields missing as OCR leaves them. Reports:
+- backfill: rebuild() against applying the same rows one by one with
+  merge(), which is what the store would otherwise do at startup
+- record: one live match through record()
+- check: kd_ratio() for a random player and bet scope, against summing
+  that player's match history, as a lookup without aggregates would
+- memory: slots and bytes of the slot array
+
+Both backfills are compared slot by slot before timing is reported.
+
+    python -m benchmarks.bench_player_stats [--verifications 1000000] [--players 100000] [--checks 100000]
+"""
+import argparse
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.services.player_stats import MAX_SCOPES, SCOPE_BITS, PlayerStatsStore
+
+GAME_MODES = ["Team Deathmatch", "Domination", "Hardpoint", "Search and Destroy", "Kill Confirmed", None]
+MAPS = ["Shipment", "Nuketown", "Rust", "Terminal", "Highrise", "Scrapyard", "Favela", "Karachi", None]
+
+
+def make_rows(args, rng: np.random.Generator):
+    count = args.verifications
+    # Log-normal activity: most players have a handful of matches, a few
+    # have thousands
+    activity = rng.lognormal(0, 1.5, args.players)
+    players = rng.choice(args.players, count, p=activity / activity.sum()).astype(np.int64) + 1_000
+    kills = rng.poisson(15, count)
+    deaths = rng.poisson(12, count)
+    modes = rng.integers(0, len(GAME_MODES), count)
+    maps = rng.integers(0, len(MAPS), count)
+    offsets = np.sort(rng.uniform(0, args.days * 86400, count))
+    start = datetime.utcnow() - timedelta(days=args.days)
+    return [
+        (f"job-{index}", int(player), int(kill), int(death), GAME_MODES[mode], MAPS[map_index],
+         start + timedelta(seconds=float(offset)))
+        for index, (player, kill, death, mode, map_index, offset) in enumerate(
+            zip(players, kills, deaths, modes, maps, offsets)
+        )
+    ]
+
+
+def named_slots(store: PlayerStatsStore) -> dict:
+    scopes = {scope_id: scope for scope, scope_id in store._scope_ids.items()}
+    return {
+        (key >> SCOPE_BITS, scopes[key & (MAX_SCOPES - 1)]): slot for key, slot in store._slots.items()
+    }
+
+
+def percentile(values, q: float) -> float:
+    return float(np.percentile(values, q)) * 1e6
+
+
+def run(args) -> None:
+    rng = np.random.default_rng(args.seed)
+    start = time.perf_counter()
+    rows = make_rows(args, rng)
+    print(f"{len(rows):,} verifications generated in {time.perf_counter() - start:.1f}s")
+
+    vectorized = PlayerStatsStore(min_matches=args.min_matches)
+    start = time.perf_counter()
+    vectorized.rebuild(rows)
+    rebuild_seconds = time.perf_counter() - start
+
+    incremental = PlayerStatsStore(min_matches=args.min_matches)
+    start = time.perf_counter()
+    incremental.merge(rows)
+    merge_seconds = time.perf_counter() - start
+
+    size = len(vectorized)
+    # Scope ids are allocated in a different order, so compare by name
+    left = named_slots(vectorized)
+    mismatched = 0
+    for key, slot in named_slots(incremental).items():
+        a, b = vectorized._cells[left[key]], incremental._cells[slot]
+        if a["matches"] != b["matches"] or a["kills"] != b["kills"] or a["deaths"] != b["deaths"]:
+            mismatched += 1
+        elif not np.isclose(
+            a["recent_kills"],
+            b["recent_kills"] * 0.5 ** ((a["updated"] - b["updated"]) / incremental.half_life)
+        ):
+            # rebuild() decays every slot to the newest match
+            mismatched += 1
+    if size != len(incremental) or mismatched:
+        raise SystemExit(f"Backfills disagree: {size} vs {len(incremental)} slots, {mismatched} differ")
+
+    print(f"{'backfill':<14}{'seconds':>10}{'rows/s':>14}")
+    print(f"{'rebuild':<14}{rebuild_seconds:>10.2f}{len(rows) / rebuild_seconds:>14,.0f}")
+    print(f"{'per-row merge':<14}{merge_seconds:>10.2f}{len(rows) / merge_seconds:>14,.0f}")
+    print(
+        f"{vectorized.players:,} players, {size:,} slots, "
+        f"{vectorized._cells[:size].nbytes / size:.0f} bytes/slot in the array, "
+        f"{vectorized._cells.nbytes / 2**20:.1f} MiB allocated"
+    )
+
+    # Live matches after the backfill
+    pyrng = random.Random(args.seed)
+    record_latencies = []
+    for index in range(args.checks // 10):
+        match = {
+            "player_stats": {"kills": pyrng.randint(0, 40), "deaths": pyrng.randint(0, 30)},
+            "game_info": {"mode": pyrng.choice(GAME_MODES), "map": pyrng.choice(MAPS)},
+        }
+        user_id = pyrng.randint(1_000, 1_000 + args.players)
+        start = time.perf_counter()
+        vectorized.record(user_id, match, match_id=f"live-{index}")
+        record_latencies.append(time.perf_counter() - start)
+
+    history = defaultdict(list)
+    for _, user_id, kills, deaths, mode, map_name, _ in rows:
+        history[user_id].append((kills, deaths, mode, map_name))
+    active = list(history)
+
+    store_latencies, scan_latencies = [], []
+    for _ in range(args.checks):
+        user_id = pyrng.choice(active)
+        mode, map_name = pyrng.choice(GAME_MODES), pyrng.choice(MAPS)
+        start = time.perf_counter()
+        vectorized.kd_ratio(user_id, mode, map_name)
+        store_latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        kills = deaths = 0
+        for match_kills, match_deaths, match_mode, match_map in history[user_id]:
+            if (mode is None or match_mode == mode) and (map_name is None or match_map == map_name):
+                kills += match_kills
+                deaths += match_deaths
+        kills / max(deaths, 1)
+        scan_latencies.append(time.perf_counter() - start)
+
+    print(f"{'operation':<14}{'p50_us':>10}{'p99_us':>10}{'max_us':>10}")
+    for name, latencies in (
+        ("record", record_latencies),
+        ("check", store_latencies),
+        ("history scan", scan_latencies),
+    ):
+        print(
+            f"{name:<14}{percentile(latencies, 50):>10.2f}{percentile(latencies, 99):>10.2f}"
+            f"{max(latencies) * 1e6:>10.1f}"
+        )
+    print(f"checks without enough matches: {vectorized.insufficient / vectorized.checks:.0%}")
+
+    heaviest = max(history, key=lambda user_id: len(history[user_id]))
+    start = time.perf_counter()
+    vectorized.kd_ratio(heaviest)
+    check = time.perf_counter() - start
+    start = time.perf_counter()
+    kills = sum(match[0] for match in history[heaviest])
+    kills / max(sum(match[1] for match in history[heaviest]), 1)
+    scan = time.perf_counter() - start
+    print(
+        f"heaviest player ({len(history[heaviest]):,} matches): "
+        f"check {check * 1e6:.1f} us, history scan {scan * 1e6:.1f} us"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--verifications", type=int, default=1_000_000)
+    parser.add_argument("--players", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--checks", type=int, default=100_000)
+    parser.add_argument("--min-matches", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    run(parser.parse_args())
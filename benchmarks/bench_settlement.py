@@ -0,0 +1,68 @@
+"""
+Benchmark settling many bets at once against the local mock RPC.
+
+Compares one settle transaction per bet with SettlementScheduler packing
+bets into batched settle_bets transactions. The mock confirms every
+signature immediately. --rpc-url and --program-id point it at a
+solana-test-validator instead, but the bench_<n> bets must already exist
+there as Active bets, otherwise every settlement fails preflight.
+
+    python -m benchmarks.bench_settlement [--bets 200] [--latency-ms 20]
+"""
+import argparse
+import asyncio
+import time
+
+from solders.keypair import Keypair
+from solders.pubkey import Pubkey
+
+from app.services.settlement_scheduler import MAX_COMPUTE_UNITS, SettlementScheduler
+from app.services.solana_rpc import SolanaRPCClient
+from benchmarks.mock_solana_rpc import MockSolanaRPC
+
+
+async def settle_all(client, program_id, winners, **kwargs):
+    scheduler = SettlementScheduler(
+        client, program_id, Keypair().pubkey(), Keypair(), poll_interval_seconds=0.1, **kwargs
+    )
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        scheduler.settle(f"bench_{index}", winner) for index, winner in enumerate(winners)
+    ))
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    await scheduler.close()
+    return scheduler.transactions, elapsed_ms
+
+
+async def run(args) -> None:
+    runner = None
+    if args.rpc_url is None:
+        mock = MockSolanaRPC(latency_ms=args.latency_ms)
+        runner = await mock.start(port=args.port)
+        args.rpc_url = f"http://127.0.0.1:{args.port}"
+
+    client = SolanaRPCClient([args.rpc_url])
+    program_id = Pubkey.from_string(args.program_id) if args.program_id else Keypair().pubkey()
+    winners = [str(Keypair().pubkey()) for _ in range(args.bets)]
+    try:
+        # A per-bet compute budget over half the limit forces one bet per transaction
+        single = await settle_all(client, program_id, winners, compute_units_per_bet=MAX_COMPUTE_UNITS // 2 + 1)
+        batched = await settle_all(client, program_id, winners)
+
+        print(f"{'mode':<10}{'bets':>6}{'txs':>6}{'wall_ms':>10}")
+        print(f"{'single':<10}{args.bets:>6}{single[0]:>6}{single[1]:>10.1f}")
+        print(f"{'batched':<10}{args.bets:>6}{batched[0]:>6}{batched[1]:>10.1f}")
+    finally:
+        await client.close()
+        if runner is not None:
+            await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bets", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--port", type=int, default=8899)
+    parser.add_argument("--rpc-url")
+    parser.add_argument("--program-id")
+    asyncio.run(run(parser.parse_args()))
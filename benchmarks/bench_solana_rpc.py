@@ -0,0 +1,71 @@
+"""
+Benchmark SolanaService balance lookups against the local mock RPC.
+
+Compares one RPC per wallet with a single JSON-RPC batch for all
+participants of a pool bet, then the same lookups served from the
+account-state cache, and checks failover when the first endpoint is down.
+
+    python -m benchmarks.bench_solana_rpc [--participants 16] [--latency-ms 20]
+"""
+import argparse
+import asyncio
+import time
+
+from solders.keypair import Keypair
+
+from app.services.solana_service import SolanaService
+from benchmarks.mock_solana_rpc import MockSolanaRPC
+
+
+async def run(args) -> None:
+    mock = MockSolanaRPC(latency_ms=args.latency_ms)
+    runner = await mock.start(port=args.port)
+    wallets = [str(Keypair().pubkey()) for _ in range(args.participants)]
+
+    # First endpoint refuses connections, so every service starts with a failover
+    service = SolanaService(
+        rpc_url=f"http://127.0.0.1:1,http://127.0.0.1:{args.port}",
+        token_mint=str(Keypair().pubkey())
+    )
+    service.client.backoff_seconds = 0.01
+    try:
+        await service.get_token_balance(wallets[0])
+
+        start = time.perf_counter()
+        before = mock.http_requests
+        sequential = [await service.get_token_balance(wallet) for wallet in wallets]
+        sequential_ms = (time.perf_counter() - start) * 1000
+        sequential_requests = mock.http_requests - before
+
+        # Start the batched run cold, as the sequential one was
+        service.cache.invalidate(*wallets)
+        start = time.perf_counter()
+        before = mock.http_requests
+        batched = await service.get_token_balances(wallets)
+        batched_ms = (time.perf_counter() - start) * 1000
+        batched_requests = mock.http_requests - before
+
+        start = time.perf_counter()
+        before = mock.http_requests
+        cached = await service.get_token_balances(wallets)
+        cached_ms = (time.perf_counter() - start) * 1000
+        cached_requests = mock.http_requests - before
+
+        assert sequential == [batched[wallet] for wallet in wallets] == [cached[wallet] for wallet in wallets]
+        print(f"{'mode':<12}{'wallets':>8}{'http_reqs':>10}{'wall_ms':>10}")
+        print(f"{'sequential':<12}{len(wallets):>8}{sequential_requests:>10}{sequential_ms:>10.1f}")
+        print(f"{'batched':<12}{len(wallets):>8}{batched_requests:>10}{batched_ms:>10.1f}")
+        print(f"{'cached':<12}{len(wallets):>8}{cached_requests:>10}{cached_ms:>10.1f}")
+        print(f"client stats: {service.client.stats()}")
+        print(f"cache stats: {service.cache.stats()}")
+    finally:
+        await service.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--participants", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--port", type=int, default=8899)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,175 @@
+"""
+Benchmark worker cold start: time until a fresh uvicorn worker answers,
+and the latency of its first requests.
+
+Starts the mock OpenAI and Solana RPC servers (benchmarks.mock_openai,
+benchmarks.mock_solana_rpc), then launches --runs fresh workers for each
+SERVICE_WARMUP mode. For each worker it reports:
+- ready_s: seconds from process spawn until GET / answers
+- first_active_ms: the first GET /bets/active
+- first_verify_ms and next_verify_ms: the first verification from upload
+  to final job status, then a second one with a different screenshot
+- warm_s: how long the worker's client warm-up took, from /metrics
+- rss_mb: worker memory once idle
+
+The mocks are plain HTTP on localhost, so the warm-up gain measured here
+is the SDK import, client construction and pooled connection. Against
+the real API, each warmed connection also saves a TLS handshake.
+
+    python -m benchmarks.bench_startup [--runs 3] [--modes off,background,startup]
+
+To measure a checkout from before the service container existed, run
+this file from that tree with
+--app benchmarks.load_test:create_app --factory.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+from benchmarks.load_test import TERMINAL_JOB_STATUSES, render_screens, rss_mb
+from benchmarks.mock_openai import MockOpenAIVision
+from benchmarks.mock_solana_rpc import MockSolanaRPC
+
+
+async def wait_until_up(session: aiohttp.ClientSession, base_url: str, process: subprocess.Popen) -> None:
+    deadline = time.perf_counter() + 60
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Server exited with code {process.returncode}")
+        try:
+            async with session.get(base_url + "/") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.01)
+    raise SystemExit("Server did not start in time")
+
+
+async def warm_seconds(session: aiohttp.ClientSession, base_url: str):
+    """
+    Longest component warm-up, or None while warm-up is still running.
+    """
+    async with session.get(base_url + "/metrics") as response:
+        lines = (await response.text()).splitlines()
+    if "cod_services_ready 1" not in lines:
+        return None
+    return max(
+        (float(line.split()[1]) for line in lines if line.startswith("cod_services_warm_seconds_")),
+        default=0.0,
+    )
+
+
+async def verify(session: aiohttp.ClientSession, base_url: str, screen: bytes, user_id: int) -> float:
+    verification = {
+        "bet_id": 1, "match_stats": {}, "verified_by": user_id,
+        "game_mode": None, "map_name": None, "match_duration": None, "player_stats": {},
+    }
+    form = aiohttp.FormData()
+    form.add_field("bet_verification", json.dumps(verification))
+    form.add_field("screenshot", screen, filename="scoreboard.png", content_type="image/png")
+
+    start = time.perf_counter()
+    async with session.post(base_url + "/bets/verify", data=form) as response:
+        job = await response.json()
+    while True:
+        async with session.get(base_url + f"/bets/verify/{job['job_id']}", params={"wait": "10"}) as response:
+            if (await response.json())["status"] in TERMINAL_JOB_STATUSES:
+                return (time.perf_counter() - start) * 1000
+
+
+async def cold_start(args, mode: str, env: dict, screens) -> dict:
+    command = [sys.executable, "-m", "uvicorn", args.app, "--port", str(args.port),
+               "--log-level", "warning", "--no-access-log"]
+    if args.factory:
+        command.append("--factory")
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    start = time.perf_counter()
+    process = subprocess.Popen(command, env=dict(env, SERVICE_WARMUP=mode))
+    try:
+        # A fresh session per worker, so no connection carries over
+        async with aiohttp.ClientSession() as session:
+            await wait_until_up(session, base_url, process)
+            result = {"ready_s": time.perf_counter() - start}
+
+            request = time.perf_counter()
+            async with session.get(base_url + "/bets/active") as response:
+                await response.read()
+            result["first_active_ms"] = (time.perf_counter() - request) * 1000
+
+            # Verify as a user would, right after the worker came up
+            result["first_verify_ms"] = await verify(session, base_url, screens[0], 1)
+            result["next_verify_ms"] = await verify(session, base_url, screens[1], 2)
+
+            result["warm_s"] = None
+            while mode != "off" and result["warm_s"] is None:
+                result["warm_s"] = await warm_seconds(session, base_url)
+                await asyncio.sleep(0.01)
+            result["rss_mb"] = rss_mb(process.pid)
+        return result
+    finally:
+        process.terminate()
+        process.wait()
+
+
+async def run(args) -> None:
+    openai_mock = MockOpenAIVision(args.openai_latency_ms, jitter=0.0)
+    rpc_mock = MockSolanaRPC(args.rpc_latency_ms)
+    openai_runner = await openai_mock.start(port=args.openai_port)
+    rpc_runner = await rpc_mock.start(port=args.rpc_port)
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY="bench",
+        OPENAI_BASE_URL=f"http://127.0.0.1:{args.openai_port}/v1",
+        SOLANA_RPC_URL=f"http://127.0.0.1:{args.rpc_port}",
+        LOG_LEVEL="WARNING",
+    )
+    env.pop("DATABASE_URL", None)
+    screens = render_screens(2 * args.runs, args.seed)
+
+    print(f"{args.runs} cold starts per mode, model {args.openai_latency_ms:.0f} ms, median of runs")
+    print(
+        f"{'mode':<12}{'ready_s':>9}{'warm_s':>10}{'active_ms':>11}"
+        f"{'verify1_ms':>12}{'verify2_ms':>12}{'rss_mb':>8}"
+    )
+    try:
+        for mode in args.modes.split(","):
+            runs = []
+            for run_index in range(args.runs):
+                runs.append(await cold_start(args, mode, env, screens[2 * run_index:]))
+
+            def median(key: str) -> float:
+                values = [result[key] for result in runs if result[key] is not None]
+                return statistics.median(values) if values else float("nan")
+
+            print(
+                f"{mode:<12}{median('ready_s'):>9.2f}{median('warm_s'):>10.2f}"
+                f"{median('first_active_ms'):>11.1f}{median('first_verify_ms'):>12.1f}"
+                f"{median('next_verify_ms'):>12.1f}{median('rss_mb'):>8.0f}"
+            )
+    finally:
+        await openai_runner.cleanup()
+        await rpc_runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--modes", default="off,background,startup")
+    parser.add_argument("--app", default="app.main:app")
+    parser.add_argument("--factory", action="store_true")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--openai-port", type=int, default=8765)
+    parser.add_argument("--rpc-port", type=int, default=8899)
+    parser.add_argument("--openai-latency-ms", type=float, default=300.0)
+    parser.add_argument("--rpc-latency-ms", type=float, default=20.0)
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(run(parser.parse_args()))
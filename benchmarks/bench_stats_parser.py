@@ -0,0 +1,161 @@
+"""
+Benchmark parsing and validating model replies for match stats.
+
+Runs a corpus of chat completion replies through the old path (split on
+```json, json.loads, reshape, dict-walking validate_stats) and the
+current one (stats_parser with repair, MatchStats validation). Reports
+per-reply parse and validate cost and the retry rate: replies that
+yield nothing usable and cost the user another upload and model call.
+
+Without --corpus a synthetic corpus is generated that mixes the reply
+styles seen in practice: fenced, bare, prose-wrapped, flat shapes and
+replies cut off by max_tokens. --corpus takes a JSONL file of recorded
+replies, one {"content": "..."} per line.
+
+    python -m benchmarks.bench_stats_parser [--replies 20000] [--corpus replies.jsonl]
+"""
+import argparse
+import json
+import random
+import time
+
+from app.services.stats_parser import normalize_stats, parse_json, validate_match_stats
+
+MODES = ["Team Deathmatch", "Search and Destroy", "Domination", "Hardpoint"]
+MAPS = ["Shipment", "Nuketown", "Rust", "Terminal", "Highrise"]
+
+
+def old_extract_json(content: str):
+    if "```json" in content:
+        json_str = content.split("```json")[1].split("```")[0]
+    else:
+        json_str = content
+    return json.loads(json_str)
+
+
+def old_normalize_stats(stats):
+    normalized = {"team_scores": {}, "player_stats": {}, "game_info": {}}
+    if "team_scores" in stats:
+        normalized["team_scores"] = stats["team_scores"]
+    elif "teams" in stats:
+        normalized["team_scores"] = stats["teams"]
+    if "player_stats" in stats:
+        normalized["player_stats"] = stats["player_stats"]
+    else:
+        for key in ["kills", "deaths", "assists"]:
+            if key in stats:
+                normalized["player_stats"][key] = stats[key]
+    if "game_info" in stats:
+        normalized["game_info"] = stats["game_info"]
+    else:
+        for key in ["mode", "map"]:
+            if key in stats:
+                normalized["game_info"][key] = stats[key]
+    return normalized
+
+
+def old_validate_stats(stats) -> bool:
+    if not stats:
+        return False
+    try:
+        player_stats = stats.get("player_stats", {})
+        if not all(key in player_stats for key in ["kills", "deaths", "assists"]):
+            return False
+        if not (0 <= player_stats["kills"] <= 100 and
+                0 <= player_stats["deaths"] <= 100 and
+                0 <= player_stats["assists"] <= 50):
+            return False
+        for score in (stats.get("team_scores") or {}).values():
+            if not isinstance(score, (int, float)) or score < 0:
+                return False
+        game_info = stats.get("game_info", {})
+        if "mode" in game_info and not isinstance(game_info["mode"], str):
+            return False
+        if "map" in game_info and not isinstance(game_info["map"], str):
+            return False
+        return True
+    except Exception:
+        return False
+
+
+def old_parse(content: str):
+    try:
+        return old_normalize_stats(old_extract_json(content))
+    except (json.JSONDecodeError, IndexError, TypeError):
+        return None
+
+
+def new_parse(content: str):
+    try:
+        stats, _ = parse_json(content)
+    except json.JSONDecodeError:
+        return None
+    return normalize_stats(stats)
+
+
+def make_reply(rng: random.Random) -> str:
+    stats = {
+        "team_scores": {"Allies": rng.randint(0, 75), "Axis": rng.randint(0, 75)},
+        "player_stats": {
+            "kills": rng.randint(0, 40), "deaths": rng.randint(0, 30), "assists": rng.randint(0, 15)
+        },
+        "game_info": {"mode": rng.choice(MODES), "map": rng.choice(MAPS)},
+    }
+    text = json.dumps(stats, indent=2)
+    style = rng.random()
+    if style < 0.35:
+        return f"```json\n{text}\n```"
+    if style < 0.55:
+        return text
+    if style < 0.65:
+        return f"Here are the extracted statistics:\n{text}\nLet me know if you need more."
+    if style < 0.75:
+        flat = {**stats["player_stats"], **stats["game_info"], "teams": stats["team_scores"]}
+        return f"```json\n{json.dumps(flat)}\n```"
+    if style < 0.9:
+        # Cut off by max_tokens somewhere after the player stats
+        cut = text.index('"game_info"') + rng.randint(0, len(text) - text.index('"game_info"') - 2)
+        return "```json\n" + text[:cut]
+    if style < 0.95:
+        # Cut off before the player stats are complete
+        return "```json\n" + text[:text.index('"player_stats"') + 30]
+    stats["player_stats"]["kills"] = 250
+    return json.dumps(stats)
+
+
+def measure(name, replies, parse, validate):
+    start = time.perf_counter()
+    parsed = [parse(reply) for reply in replies]
+    parse_us = (time.perf_counter() - start) / len(replies) * 1e6
+
+    usable = [stats for stats in parsed if stats is not None]
+    start = time.perf_counter()
+    valid = sum(1 for stats in usable if validate(stats))
+    validate_us = (time.perf_counter() - start) / max(len(usable), 1) * 1e6
+
+    # Unparseable replies and ones missing player stats need another upload
+    retries = len(replies) - valid
+    print(
+        f"{name:<8}{len(replies):>8}{parse_us:>11.1f}{validate_us:>13.1f}"
+        f"{valid:>8}{retries / len(replies):>10.1%}"
+    )
+
+
+def main(args) -> None:
+    if args.corpus:
+        with open(args.corpus) as f:
+            replies = [json.loads(line)["content"] for line in f if line.strip()]
+    else:
+        rng = random.Random(42)
+        replies = [make_reply(rng) for _ in range(args.replies)]
+
+    print(f"{'path':<8}{'replies':>8}{'parse_us':>11}{'validate_us':>13}{'valid':>8}{'retry':>10}")
+    measure("old", replies, old_parse, old_validate_stats)
+    measure("new", replies, new_parse, lambda stats: validate_match_stats(stats) is not None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--replies", type=int, default=20_000)
+    parser.add_argument("--corpus")
+    main(parser.parse_args())
@@ -0,0 +1,91 @@
+"""
+Peak RSS of the verify upload path under N concurrent screenshot uploads.
+
+"before" is the original path: screenshot.read(), a base64 copy and an
+f-string data URL. "after" streams through read_screenshot and builds
+the data URL with encode_data_url. Each mode runs in a fresh subprocess
+so ru_maxrss isn't shared between them. Preprocessing is left out so only
+the upload/encoding copies are measured.
+
+    python -m benchmarks.bench_upload_memory [--concurrency 8] [--size-mb 10]
+"""
+import argparse
+import asyncio
+import base64
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+from starlette.datastructures import UploadFile
+
+from app.services.image_preprocessing import encode_data_url
+from app.services.screenshot_upload import read_screenshot
+
+
+def max_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_upload(size: int) -> UploadFile:
+    # Same spooling Starlette applies to multipart file parts
+    spooled = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    chunk = os.urandom(1024 * 1024)
+    written = 0
+    while written < size:
+        spooled.write(chunk[:size - written])
+        written += min(len(chunk), size - written)
+    spooled.seek(0)
+    return UploadFile(spooled, size=size, filename="screenshot.png")
+
+
+async def before(upload: UploadFile) -> int:
+    contents = await upload.read()
+    encoded_image = base64.b64encode(contents).decode()
+    url = f"data:image/jpeg;base64,{encoded_image}"
+    await asyncio.sleep(0.05)  # held while the model call is in flight
+    return len(url)
+
+
+async def after(upload: UploadFile) -> int:
+    screenshot = await read_screenshot(upload, max_bytes=64 * 1024 * 1024)
+    url = encode_data_url(screenshot.data, screenshot.mime_type)
+    await asyncio.sleep(0.05)
+    return len(url)
+
+
+async def run(mode: str, concurrency: int, size: int) -> None:
+    uploads = [make_upload(size) for _ in range(concurrency)]
+    baseline = max_rss_mb()
+    handler = before if mode == "before" else after
+    await asyncio.gather(*(handler(upload) for upload in uploads))
+    peak = max_rss_mb()
+    print(f"{mode:<8}{concurrency:>6}{size // (1024 * 1024):>8}{peak - baseline:>16.1f}{(peak - baseline) / concurrency:>16.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--size-mb", type=int, default=10)
+    parser.add_argument("--mode", choices=["before", "after"])
+    args = parser.parse_args()
+
+    if args.mode:
+        asyncio.run(run(args.mode, args.concurrency, args.size_mb * 1024 * 1024))
+        return
+
+    print(f"{'mode':<8}{'N':>6}{'MB':>8}{'peak_rss_mb':>16}{'per_upload_mb':>16}")
+    for mode in ("before", "after"):
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_upload_memory",
+             "--mode", mode,
+             "--concurrency", str(args.concurrency),
+             "--size-mb", str(args.size_mb)],
+            check=True
+        )
+
+
+if __name__ == "__main__":
+    main()
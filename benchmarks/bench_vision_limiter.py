@@ -0,0 +1,150 @@
+"""
+Benchmark vision API admission control under a burst above the quota.
+
+Fires --requests screenshot OCR calls at once at the mock OpenAI server
+(benchmarks.mock_openai), which enforces --rpm like the real API. The
+"unlimited" run calls the model directly and relies on the client's own
+429 retries. This was the old behaviour: throttled calls surfaced as None
+and, to the user, a failed verification. The "adaptive" run goes through
+VisionRateLimiter.
+
+Reports goodput against the quota ceiling, upstream 429s, calls that
+ended without stats, calls shed at their deadline, and latency for
+high-stake (top 20%) against other calls.
+
+    python -m benchmarks.bench_vision_limiter [--requests 300] [--rpm 1200] [--latency-ms 400]
+"""
+import argparse
+import asyncio
+import io
+import logging
+import os
+import random
+import time
+
+from openai import AsyncOpenAI
+from PIL import Image
+
+from benchmarks.mock_openai import MockOpenAIVision
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from app.services.llm_ocr_service import LLMOCRService  # noqa: E402
+from app.services.ocr_cache import OCRResultCache  # noqa: E402
+from app.services.vision_limiter import VisionRateLimiter, VisionRequestShed  # noqa: E402
+
+
+class _Unlimited:
+    """
+    Stand-in limiter that admits everything, as before the limiter existed.
+    """
+
+    def acquire(self, priority=0.0, deadline=None, tokens=0.0):
+        return self
+
+    def throttled(self, retry_after=None):
+        pass
+
+    def failed(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+
+def screenshots(count: int, seed: int):
+    rng = random.Random(seed)
+    images = []
+    for _ in range(count):
+        output = io.BytesIO()
+        Image.new("RGB", (64, 36), tuple(rng.randint(0, 255) for _ in range(3))).save(output, format="PNG")
+        images.append(output.getvalue())
+    return images
+
+
+async def run_mode(name: str, args, images, stakes) -> None:
+    mock = MockOpenAIVision(args.latency_ms, jitter=0.2, requests_per_minute=args.rpm)
+    runner = await mock.start(port=args.port)
+    base_url = f"http://127.0.0.1:{args.port}/v1"
+
+    if name == "unlimited":
+        service = LLMOCRService(cache=OCRResultCache(max_entries=1), limiter=_Unlimited())
+        service.client = AsyncOpenAI(api_key="bench", base_url=base_url)  # default 2 retries
+        service.max_attempts = 1
+    else:
+        limiter = VisionRateLimiter(
+            requests_per_minute=args.rpm,
+            tokens_per_minute=0,
+            initial_concurrency=8,
+            max_concurrency=64,
+            latency_target_seconds=args.latency_ms / 1000 * 4,
+            max_wait_seconds=args.deadline,
+        )
+        service = LLMOCRService(cache=OCRResultCache(max_entries=1), limiter=limiter)
+        service.client = AsyncOpenAI(api_key="bench", base_url=base_url, max_retries=0)
+        service.max_attempts = 5
+
+    latencies = {"high": [], "low": []}
+    outcomes = {"ok": 0, "failed": 0, "shed": 0}
+    threshold = sorted(stakes)[int(len(stakes) * 0.8)]
+
+    async def one(image: bytes, stake: float) -> None:
+        start = time.perf_counter()
+        try:
+            stats = await service.process_image(image, check_cache=False, use_local=False, priority=stake)
+        except VisionRequestShed:
+            outcomes["shed"] += 1
+            return
+        if stats is None:
+            outcomes["failed"] += 1
+            return
+        outcomes["ok"] += 1
+        latencies["high" if stake >= threshold else "low"].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(image, stake) for image, stake in zip(images, stakes)))
+    elapsed = time.perf_counter() - start
+    await runner.cleanup()
+
+    def p(values, q):
+        values = sorted(values)
+        return values[int(q * (len(values) - 1))] if values else 0.0
+
+    ceiling = args.rpm / 60
+    print(
+        f"{name:<10}{elapsed:>8.1f}{outcomes['ok'] / elapsed:>10.1f}{outcomes['ok'] / elapsed / ceiling:>9.0%}"
+        f"{mock.throttled:>7}{outcomes['failed']:>8}{outcomes['shed']:>6}"
+        f"{p(latencies['high'], 0.5):>9.1f}{p(latencies['high'], 0.95):>9.1f}"
+        f"{p(latencies['low'], 0.5):>9.1f}{p(latencies['low'], 0.95):>9.1f}"
+    )
+    if name == "adaptive":
+        print(f"limiter: {service.limiter.stats()}")
+
+
+async def run(args) -> None:
+    # Every failed call in the unlimited run logs an error
+    logging.getLogger("app").setLevel(logging.CRITICAL)
+    rng = random.Random(args.seed)
+    images = screenshots(args.requests, args.seed)
+    stakes = [rng.choice([5, 10, 25, 50, 100, 500]) for _ in images]
+    print(f"{args.requests} calls at once, quota {args.rpm:.0f} rpm ({args.rpm / 60:.0f}/s), model {args.latency_ms:.0f} ms")
+    print(
+        f"{'mode':<10}{'wall_s':>8}{'ok/s':>10}{'of_quota':>9}{'429s':>7}{'failed':>8}{'shed':>6}"
+        f"{'high_p50':>9}{'high_p95':>9}{'low_p50':>9}{'low_p95':>9}"
+    )
+    for name in ("unlimited", "adaptive"):
+        await run_mode(name, args, images, stakes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--rpm", type=float, default=1200)
+    parser.add_argument("--latency-ms", type=float, default=400)
+    parser.add_argument("--deadline", type=float, default=30.0, help="seconds a call may wait for a slot")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,427 @@
+"""
+End-to-end load test of the HTTP API against local stand-ins.
+
+Boots the app under uvicorn in a subprocess, pointed at a mock OpenAI
+vision server (benchmarks.mock_openai) and a mock Solana JSON-RPC node
+(benchmarks.mock_solana_rpc), then drives it with concurrent clients.
+Each phase runs for --duration seconds: one phase per endpoint on its own,
+then the --mix of create/join/verify/active traffic. Reports RPS and
+p50/p95/p99 per endpoint, plus the server's RSS (start, end, peak) per
+phase. For verify, "verify" is the upload and "verify_result" is the time
+until the job finished (long-polling GET /bets/verify/{job_id}).
+
+Results are written as JSON to --output. Pass --compare with an earlier
+results file to print the change per phase and endpoint.
+
+    python -m benchmarks.load_test [--duration 15] [--concurrency 32]
+        [--mix create=2,join=2,verify=1,active=15] [--phases solo,mix]
+        [--openai-latency-ms 1500] [--openai-error-rate 0.0] [--openai-rpm 0]
+        [--rpc-latency-ms 20] [--database] [--output load_test.json] [--compare old.json]
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import aiohttp
+from PIL import Image, ImageDraw
+
+from benchmarks.mock_openai import MockOpenAIVision
+from benchmarks.mock_solana_rpc import MockSolanaRPC
+
+ENDPOINTS = ["create", "join", "verify", "active"]
+# FAILED is a verdict (e.g. conditions not met); dead-lettered jobs got none
+TERMINAL_JOB_STATUSES = {"SUCCEEDED", "FAILED", "DEAD_LETTERED"}
+GAME_MODES = ["Team Deathmatch", "Domination", "Hardpoint", None]
+
+
+def create_app():
+    """
+    uvicorn factory: the app from app.main, with the bet routes mounted
+    if main doesn't mount them itself.
+    """
+    from app.main import app
+
+    if not any(getattr(route, "path", "").startswith("/bets/active") for route in app.routes):
+        from app.routers import bet
+
+        app.include_router(bet.router, prefix="/bets", tags=["bets"])
+    return app
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    return values[max(math.ceil(q * len(values)) - 1, 0)]
+
+
+def render_screens(count: int, seed: int) -> List[bytes]:
+    rng = random.Random(seed)
+    screens = []
+    for index in range(count):
+        img = Image.new("RGB", (960, 540), (rng.randint(0, 40), rng.randint(0, 40), rng.randint(20, 60)))
+        draw = ImageDraw.Draw(img)
+        for row in range(8):
+            draw.text((80, 60 + row * 50), f"PLAYER{row} {rng.randint(0, 40)} {rng.randint(0, 30)} {index}", fill=(230, 230, 230))
+        output = io.BytesIO()
+        img.save(output, format="PNG")
+        screens.append(output.getvalue())
+    return screens
+
+
+def is_error(status: str) -> bool:
+    # 4xx (full bets, bad input) are answers; 5xx and transport errors aren't
+    if status in TERMINAL_JOB_STATUSES:
+        return status == "DEAD_LETTERED"
+    return status.startswith("5") or not status[:1].isdigit()
+
+
+def rss_mb(pid: int) -> float:
+    # Linux only; the load test reports 0 elsewhere
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+
+    def record(self, endpoint: str, seconds: float, status) -> None:
+        self.latencies.setdefault(endpoint, []).append(seconds * 1000)
+        counts = self.statuses.setdefault(endpoint, {})
+        counts[str(status)] = counts.get(str(status), 0) + 1
+
+    def summary(self, elapsed: float) -> Dict:
+        endpoints = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            latencies.sort()
+            statuses = self.statuses[endpoint]
+            errors = sum(count for status, count in statuses.items() if is_error(status))
+            endpoints[endpoint] = {
+                "requests": len(latencies),
+                "errors": errors,
+                "status": statuses,
+                "rps": round(len(latencies) / elapsed, 2),
+                "mean_ms": round(sum(latencies) / len(latencies), 2),
+                "p50_ms": round(percentile(latencies, 0.50), 2),
+                "p95_ms": round(percentile(latencies, 0.95), 2),
+                "p99_ms": round(percentile(latencies, 0.99), 2),
+            }
+        return endpoints
+
+
+class LoadClient:
+    """
+    One simulated user per worker task: picks an endpoint by weight and
+    calls it in a loop until the phase ends.
+    """
+
+    def __init__(self, base_url: str, session: aiohttp.ClientSession, screens: List[bytes], rng: random.Random):
+        self.base_url = base_url
+        self.session = session
+        self.screens = screens
+        self.rng = rng
+        # Open bets (id, stake) that joins and verifications pick from
+        self.open_bets: deque = deque(maxlen=500)
+        self.user_ids = iter(range(10_000, 10**9))
+
+    async def call(self, recorder: Recorder, endpoint: str, method: str, path: str, **kwargs) -> Optional[Dict]:
+        start = time.perf_counter()
+        try:
+            async with self.session.request(method, self.base_url + path, **kwargs) as response:
+                body = await response.read()
+                recorder.record(endpoint, time.perf_counter() - start, response.status)
+                return json.loads(body) if response.status < 300 and body else None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            recorder.record(endpoint, time.perf_counter() - start, type(e).__name__)
+            return None
+
+    async def create(self, recorder: Recorder) -> None:
+        stake = float(self.rng.choice([5, 10, 25, 50, 100]))
+        bet = await self.call(recorder, "create", "POST", "/bets/create", json={
+            "match_id": f"match-{self.rng.randint(1, 10**6)}",
+            "stake_amount": stake,
+            "user_id": next(self.user_ids),
+            "conditions": [{
+                "type": "KILLS", "target_value": self.rng.randint(5, 25), "comparison": ">",
+                "description": "Kill target",
+            }],
+            "time_limit_minutes": 30,
+            "required_game_mode": self.rng.choice(GAME_MODES),
+            "max_participants": self.rng.choice([2, 2, 4, 8]),
+        })
+        if bet:
+            self.open_bets.append((bet["id"], stake))
+
+    async def join(self, recorder: Recorder) -> None:
+        if not self.open_bets:
+            return await self.create(recorder)
+        bet_id, stake = self.rng.choice(self.open_bets)
+        await self.call(recorder, "join", "POST", "/bets/join", json={
+            "bet_id": bet_id, "user_id": next(self.user_ids), "stake_amount": stake,
+        })
+
+    async def verify(self, recorder: Recorder) -> None:
+        if not self.open_bets:
+            return await self.create(recorder)
+        bet_id, _ = self.rng.choice(self.open_bets)
+        verification = {
+            "bet_id": bet_id, "match_stats": {}, "verified_by": next(self.user_ids),
+            "game_mode": None, "map_name": None, "match_duration": None, "player_stats": {},
+        }
+        form = aiohttp.FormData()
+        form.add_field("bet_verification", json.dumps(verification))
+        form.add_field("screenshot", self.rng.choice(self.screens), filename="scoreboard.png", content_type="image/png")
+
+        start = time.perf_counter()
+        job = await self.call(recorder, "verify", "POST", "/bets/verify", data=form)
+        if not job:
+            return
+        while True:
+            result = await self.call(recorder, "verify_poll", "GET", f"/bets/verify/{job['job_id']}", params={"wait": "10"})
+            if result is None or result["status"] in TERMINAL_JOB_STATUSES:
+                recorder.record("verify_result", time.perf_counter() - start, result["status"] if result else "lost")
+                return
+
+    async def active(self, recorder: Recorder) -> None:
+        params = {}
+        if self.rng.random() < 0.5:
+            params["game_mode"] = self.rng.choice(GAME_MODES[:-1])
+        if self.rng.random() < 0.3:
+            params["min_stake"] = "10"
+        await self.call(recorder, "active", "GET", "/bets/active", params=params)
+
+    async def run(self, recorder: Recorder, weights: Dict[str, float], deadline: float) -> None:
+        endpoints = [endpoint for endpoint in ENDPOINTS if weights.get(endpoint)]
+        choices = [weights[endpoint] for endpoint in endpoints]
+        while time.perf_counter() < deadline:
+            endpoint = self.rng.choices(endpoints, choices)[0]
+            await getattr(self, endpoint)(recorder)
+
+
+async def run_phase(name: str, client: LoadClient, weights: Dict[str, float], args, server_pid: int) -> Dict:
+    recorder = Recorder()
+    rss_start = rss_peak = rss_mb(server_pid)
+    start = time.perf_counter()
+    deadline = start + args.duration
+    workers = [asyncio.create_task(client.run(recorder, weights, deadline)) for _ in range(args.concurrency)]
+    pending = set(workers)
+    while pending:
+        _, pending = await asyncio.wait(pending, timeout=0.25)
+        rss_peak = max(rss_peak, rss_mb(server_pid))
+    elapsed = time.perf_counter() - start
+
+    phase = {
+        "name": name,
+        "duration_s": round(elapsed, 2),
+        "concurrency": args.concurrency,
+        "mix": weights,
+        "endpoints": recorder.summary(elapsed),
+        "memory": {
+            "rss_start_mb": round(rss_start, 1),
+            "rss_end_mb": round(rss_mb(server_pid), 1),
+            "rss_peak_mb": round(rss_peak, 1),
+        },
+    }
+    requests = sum(endpoint["requests"] for endpoint in phase["endpoints"].values())
+    phase["memory"]["growth_kb_per_request"] = round(
+        (phase["memory"]["rss_end_mb"] - rss_start) * 1024 / max(requests, 1), 2
+    )
+    return phase
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        endpoint, _, weight = part.partition("=")
+        if endpoint not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint in --mix: {endpoint}")
+        weights[endpoint] = float(weight or 1)
+    return weights
+
+
+async def wait_until_up(base_url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.perf_counter() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise SystemExit(f"Server exited with code {process.returncode}")
+            try:
+                async with session.get(base_url + "/") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.1)
+    raise SystemExit("Server did not start in time")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_phase(phase: Dict) -> None:
+    memory = phase["memory"]
+    print(
+        f"\n{phase['name']}  ({phase['duration_s']}s, {phase['concurrency']} clients, "
+        f"rss {memory['rss_start_mb']} -> {memory['rss_end_mb']} MB, peak {memory['rss_peak_mb']} MB)"
+    )
+    print(f"{'endpoint':<15}{'reqs':>8}{'errors':>8}{'rps':>9}{'p50_ms':>9}{'p95_ms':>9}{'p99_ms':>9}")
+    for endpoint, result in phase["endpoints"].items():
+        print(
+            f"{endpoint:<15}{result['requests']:>8}{result['errors']:>8}{result['rps']:>9.1f}"
+            f"{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}"
+        )
+
+
+def print_comparison(results: Dict, path: str) -> None:
+    with open(path) as f:
+        baseline = {phase["name"]: phase for phase in json.load(f)["phases"]}
+    print(f"\nchange vs {path}")
+    print(f"{'phase':<14}{'endpoint':<15}{'rps':>10}{'p95_ms':>10}{'p99_ms':>10}")
+    for phase in results["phases"]:
+        before = baseline.get(phase["name"])
+        if not before:
+            continue
+        for endpoint, result in phase["endpoints"].items():
+            old = before["endpoints"].get(endpoint)
+            if not old:
+                continue
+
+            def change(key: str) -> str:
+                return f"{(result[key] - old[key]) / old[key]:+.1%}" if old[key] else "n/a"
+
+            print(f"{phase['name']:<14}{endpoint:<15}{change('rps'):>10}{change('p95_ms'):>10}{change('p99_ms'):>10}")
+
+
+async def run(args) -> Dict:
+    openai_mock = MockOpenAIVision(
+        args.openai_latency_ms, args.openai_per_image_ms,
+        error_rate=args.openai_error_rate, requests_per_minute=args.openai_rpm
+    )
+    rpc_mock = MockSolanaRPC(args.rpc_latency_ms, args.rpc_error_rate)
+    openai_runner = await openai_mock.start(port=args.openai_port)
+    rpc_runner = await rpc_mock.start(port=args.rpc_port)
+
+    scratch = tempfile.TemporaryDirectory()
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY="load-test",
+        OPENAI_BASE_URL=f"http://127.0.0.1:{args.openai_port}/v1",
+        SOLANA_RPC_URL=f"http://127.0.0.1:{args.rpc_port}",
+        LOG_LEVEL="WARNING",
+    )
+    if args.database:
+        env["DATABASE_URL"] = f"sqlite:///{os.path.join(scratch.name, 'load_test.db')}"
+    else:
+        env.pop("DATABASE_URL", None)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.load_test:create_app", "--factory",
+         "--port", str(args.port), "--log-level", "warning", "--no-access-log"],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        },
+        "phases": [],
+    }
+    try:
+        await wait_until_up(base_url, process)
+        results["meta"]["rss_idle_mb"] = round(rss_mb(process.pid), 1)
+        connector = aiohttp.TCPConnector(limit=args.concurrency * 2)
+        timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            client = LoadClient(base_url, session, render_screens(args.screens, args.seed), random.Random(args.seed))
+            mix = parse_mix(args.mix)
+            phases = args.phases.split(",")
+            if "solo" in phases:
+                # Seed a few bets so joins and verifications have targets
+                seed_recorder = Recorder()
+                for _ in range(20):
+                    await client.create(seed_recorder)
+                for endpoint in ENDPOINTS:
+                    if mix.get(endpoint):
+                        results["phases"].append(await run_phase(endpoint, client, {endpoint: 1}, args, process.pid))
+                        print_phase(results["phases"][-1])
+            if "mix" in phases:
+                results["phases"].append(await run_phase("mix", client, mix, args, process.pid))
+                print_phase(results["phases"][-1])
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+        await openai_runner.cleanup()
+        await rpc_runner.cleanup()
+        scratch.cleanup()
+
+    results["mocks"] = {
+        "openai_requests": openai_mock.requests,
+        "openai_images": openai_mock.images,
+        "openai_throttled": openai_mock.throttled,
+        "openai_max_in_flight": openai_mock.max_in_flight,
+        "rpc_http_requests": rpc_mock.http_requests,
+        "rpc_calls": rpc_mock.rpc_calls,
+    }
+    return results
+
+
+def main(args) -> None:
+    results = asyncio.run(run(args))
+    print(f"\nmocks: {results['mocks']}")
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.output}")
+    if args.compare:
+        print_comparison(results, args.compare)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per phase")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--mix", default="create=2,join=2,verify=1,active=15")
+    parser.add_argument("--phases", default="solo,mix", help="solo (each endpoint alone), mix, or both")
+    parser.add_argument("--screens", type=int, default=50, help="distinct screenshots to upload")
+    parser.add_argument("--openai-latency-ms", type=float, default=1500.0)
+    parser.add_argument("--openai-per-image-ms", type=float, default=150.0)
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--openai-rpm", type=float, default=0.0, help="quota the mock enforces (0 = none)")
+    parser.add_argument("--rpc-latency-ms", type=float, default=20.0)
+    parser.add_argument("--rpc-error-rate", type=float, default=0.0)
+    parser.add_argument("--database", action="store_true", help="use a scratch SQLite database")
+    parser.add_argument("--request-timeout", type=float, default=60.0)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--openai-port", type=int, default=8765)
+    parser.add_argument("--rpc-port", type=int, default=8899)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="load_test.json")
+    parser.add_argument("--compare")
+    main(parser.parse_args())
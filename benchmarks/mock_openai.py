@@ -0,0 +1,147 @@
+"""
+Local mock of the OpenAI chat completions endpoint for benchmarks.
+
+Answers vision requests with plausible match stats for every attached
+image (a JSON array when a request carries several), with configurable
+latency per request and per image, and a 429 rate of upstream throttling.
+--rpm enforces a requests-per-minute quota the way the real API does,
+answering 429 with Retry-After once its short-term burst is spent.
+
+    python -m benchmarks.mock_openai [--port 8765] [--latency-ms 1500] [--error-rate 0.0] [--rpm 0]
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+
+from aiohttp import web
+
+MODES = ["Team Deathmatch", "Domination", "Hardpoint", "Search and Destroy"]
+MAPS = ["Shipment", "Nuketown", "Rust", "Terminal"]
+
+
+class MockOpenAIVision:
+    def __init__(
+        self,
+        latency_ms: float = 1500.0,
+        per_image_ms: float = 150.0,
+        jitter: float = 0.2,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        requests_per_minute: float = 0.0,
+    ):
+        self.latency = latency_ms / 1000
+        self.per_image = per_image_ms / 1000
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.images = 0
+        self.throttled = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        # Quota bucket holding 3 seconds' worth of requests; 0 means unlimited
+        self.quota_rate = requests_per_minute / 60
+        self.quota_capacity = max(self.quota_rate * 3, 1)
+        self.quota = self.quota_capacity
+        self.quota_updated = time.monotonic()
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.handle)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765) -> web.AppRunner:
+        runner = web.AppRunner(self.app())
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        body = await request.json()
+        retry_after = self.over_quota()
+        if retry_after is None and self.random.random() < self.error_rate:
+            retry_after = 1.0
+        if retry_after is not None:
+            self.throttled += 1
+            return web.json_response(
+                {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                status=429,
+                headers={"retry-after": str(math.ceil(retry_after)), "retry-after-ms": str(int(retry_after * 1000))},
+            )
+
+        images = sum(
+            1 for message in body.get("messages", []) if isinstance(message.get("content"), list)
+            for part in message["content"] if part.get("type") == "image_url"
+        )
+        self.images += images
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            delay = self.latency + self.per_image * max(images - 1, 0)
+            await asyncio.sleep(delay * self.random.uniform(1 - self.jitter, 1 + self.jitter))
+        finally:
+            self.in_flight -= 1
+
+        results = [self.stats() for _ in range(max(images, 1))]
+        content = json.dumps(results[0] if len(results) == 1 else results)
+        return web.json_response({
+            "id": f"chatcmpl-mock{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": f"```json\n{content}\n```"},
+            }],
+            "usage": {
+                "prompt_tokens": 85 + 765 * images,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": 85 + 765 * images + len(content) // 4,
+            },
+        })
+
+    def over_quota(self):
+        if not self.quota_rate:
+            return None
+        now = time.monotonic()
+        self.quota = min(self.quota_capacity, self.quota + (now - self.quota_updated) * self.quota_rate)
+        self.quota_updated = now
+        if self.quota >= 1:
+            self.quota -= 1
+            return None
+        return (1 - self.quota) / self.quota_rate
+
+    def stats(self) -> dict:
+        return {
+            "team_scores": {"Allies": self.random.randint(0, 75), "Axis": self.random.randint(0, 75)},
+            "player_stats": {
+                "kills": self.random.randint(5, 40),
+                "deaths": self.random.randint(1, 30),
+                "assists": self.random.randint(0, 15),
+            },
+            "game_info": {"mode": self.random.choice(MODES), "map": self.random.choice(MAPS)},
+        }
+
+
+async def serve(args) -> None:
+    mock = MockOpenAIVision(
+        args.latency_ms, args.per_image_ms, error_rate=args.error_rate, requests_per_minute=args.rpm
+    )
+    await mock.start(port=args.port)
+    print(f"Mock OpenAI on http://127.0.0.1:{args.port}/v1")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=1500.0)
+    parser.add_argument("--per-image-ms", type=float, default=150.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=float, default=0.0)
+    asyncio.run(serve(parser.parse_args()))
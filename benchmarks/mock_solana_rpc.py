@@ -0,0 +1,122 @@
+"""
+Local mock Solana JSON-RPC server for benchmarks and manual testing.
+
+Answers single and batched requests for the handful of methods the
+services use, with configurable latency and HTTP 503 error rate.
+
+    python -m benchmarks.mock_solana_rpc [--port 8899] [--latency-ms 20] [--error-rate 0.0]
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+
+from aiohttp import web
+
+
+class MockSolanaRPC:
+    def __init__(self, latency_ms: float = 20.0, error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency_ms / 1000
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.http_requests = 0
+        self.rpc_calls = 0
+        self.slot = 1000
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/", self.handle)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8899) -> web.AppRunner:
+        runner = web.AppRunner(self.app())
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.http_requests += 1
+        body = await request.json()
+        # One round trip regardless of batch size, like a real node
+        await asyncio.sleep(self.latency)
+        if self.random.random() < self.error_rate:
+            return web.Response(status=503, text="mock overloaded")
+
+        if isinstance(body, list):
+            return web.json_response([self.dispatch(item) for item in body])
+        return web.json_response(self.dispatch(body))
+
+    def dispatch(self, request: dict) -> dict:
+        self.rpc_calls += 1
+        method = request.get("method")
+        params = request.get("params") or []
+        handler = getattr(self, "rpc_" + method, None) if method else None
+        if handler is None:
+            return {"jsonrpc": "2.0", "id": request.get("id"),
+                    "error": {"code": -32601, "message": "Method not found"}}
+        return {"jsonrpc": "2.0", "id": request.get("id"), "result": handler(params)}
+
+    def context(self) -> dict:
+        self.slot += 1
+        return {"slot": self.slot}
+
+    def rpc_getHealth(self, params):
+        return "ok"
+
+    def rpc_getSlot(self, params):
+        return self.slot
+
+    def rpc_getTokenAccountsByOwner(self, params):
+        owner = params[0]
+        # Deterministic balance per owner so results can be checked
+        balance = int(hashlib.sha256(owner.encode()).hexdigest()[:6], 16) % 10_000
+        return {
+            "context": self.context(),
+            "value": [{
+                "pubkey": owner,
+                "account": {"data": {"parsed": {"info": {"tokenAmount": {
+                    "amount": str(balance * 1_000_000),
+                    "decimals": 6,
+                    "uiAmount": float(balance),
+                }}}}}
+            }],
+        }
+
+    def rpc_getAccountInfo(self, params):
+        return {"context": self.context(), "value": None}
+
+    def rpc_getMultipleAccounts(self, params):
+        return {"context": self.context(), "value": [None for _ in params[0]]}
+
+    def rpc_getLatestBlockhash(self, params):
+        return {
+            "context": self.context(),
+            "value": {"blockhash": "11111111111111111111111111111111", "lastValidBlockHeight": self.slot + 150},
+        }
+
+    def rpc_sendTransaction(self, params):
+        return hashlib.sha256(str(params[0]).encode()).hexdigest()
+
+    def rpc_getSignatureStatuses(self, params):
+        return {
+            "context": self.context(),
+            "value": [
+                {"slot": self.slot, "confirmations": None, "err": None, "confirmationStatus": "finalized"}
+                for _ in params[0]
+            ],
+        }
+
+
+async def serve(args) -> None:
+    mock = MockSolanaRPC(args.latency_ms, args.error_rate)
+    await mock.start(port=args.port)
+    print(f"Mock Solana RPC on http://127.0.0.1:{args.port}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8899)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    asyncio.run(serve(parser.parse_args()))
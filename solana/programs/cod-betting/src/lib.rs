@@ -1,9 +1,15 @@
 use anchor_lang::prelude::*;
+use anchor_lang::solana_program::pubkey;
 use anchor_spl::token::{self, Token, TokenAccount, Mint, Transfer};
 use anchor_spl::associated_token::AssociatedToken;
 
 declare_id!("Fg6PaFpoGXkYsidMpWTK6W2BeZ7FEfcYkg476zPFsLnS");
 
+/// The only key allowed to settle or cancel bets: the public key of the
+/// backend's SOLANA_SETTLER_KEYPAIR. Set it before deploying. The default
+/// (the system program id) can never sign, so payouts stay disabled.
+pub const SETTLER: Pubkey = pubkey!("11111111111111111111111111111111");
+
 #[program]
 pub mod cod_betting {
     use super::*;
@@ -12,11 +18,14 @@ pub mod cod_betting {
         ctx: Context<InitializeBet>,
         amount: u64,
         bet_seed: String,
+        deadline: i64,
     ) -> Result<()> {
+        require!(deadline > Clock::get()?.unix_timestamp, BetError::InvalidDeadline);
         let bet = &mut ctx.accounts.bet;
         bet.creator = ctx.accounts.creator.key();
         bet.amount = amount;
         bet.state = BetState::Created;
+        bet.deadline = deadline;
         bet.seed = bet_seed;
         
         // Transfer tokens to escrow
@@ -39,6 +48,7 @@ pub mod cod_betting {
     ) -> Result<()> {
         let bet = &mut ctx.accounts.bet;
         require!(bet.state == BetState::Created, BetError::InvalidBetState);
+        require!(Clock::get()?.unix_timestamp < bet.deadline, BetError::BetExpired);
         require!(amount == bet.amount, BetError::AmountMismatch);
 
         // Transfer matching tokens to escrow
@@ -58,6 +68,35 @@ pub mod cod_betting {
         Ok(())
     }
 
+    /// Give a joiner's stake back and reopen the bet, for joins the
+    /// backend failed to record after the transfer.
+    pub fn unjoin_bet(ctx: Context<UnjoinBet>) -> Result<()> {
+        let bet = &mut ctx.accounts.bet;
+        require!(bet.state == BetState::Active, BetError::InvalidBetState);
+        let joiner = bet.joiner.ok_or(error!(BetError::InvalidBetState))?;
+        require_keys_eq!(ctx.accounts.joiner_token.owner, joiner, BetError::InvalidSettlementAccounts);
+
+        let transfer_ctx = CpiContext::new_with_signer(
+            ctx.accounts.token_program.to_account_info(),
+            Transfer {
+                from: ctx.accounts.escrow_token.to_account_info(),
+                to: ctx.accounts.joiner_token.to_account_info(),
+                authority: ctx.accounts.escrow_token.to_account_info(),
+            },
+            &[&[
+                b"escrow",
+                bet.seed.as_bytes(),
+                &[ctx.bumps.escrow_token],
+            ]],
+        );
+        token::transfer(transfer_ctx, bet.amount)?;
+
+        bet.joiner = None;
+        bet.state = BetState::Created;
+
+        Ok(())
+    }
+
     pub fn settle_bet(
         ctx: Context<SettleBet>,
         winner: Pubkey,
@@ -93,6 +132,113 @@ pub mod cod_betting {
         
         Ok(())
     }
+
+    /// Settle several bets in one transaction. `remaining_accounts` holds
+    /// one (bet, escrow_token, winner_token) triple per settlement, in order.
+    pub fn settle_bets<'info>(
+        ctx: Context<'_, '_, 'info, 'info, SettleBets<'info>>,
+        settlements: Vec<BatchSettlement>,
+    ) -> Result<()> {
+        require!(
+            ctx.remaining_accounts.len() == settlements.len() * 3,
+            BetError::InvalidSettlementAccounts
+        );
+
+        for (settlement, accounts) in settlements.iter().zip(ctx.remaining_accounts.chunks(3)) {
+            let escrow_info = &accounts[1];
+            let winner_info = &accounts[2];
+
+            let mut bet: Account<'info, Bet> = Account::try_from(&accounts[0])?;
+            require!(bet.state == BetState::Active, BetError::InvalidBetState);
+            require!(
+                settlement.winner == bet.creator || Some(settlement.winner) == bet.joiner,
+                BetError::InvalidWinner
+            );
+
+            // The client supplies the escrow bump so we only pay for
+            // create_program_address rather than a bump search per bet
+            let signer_seeds: &[&[u8]] = &[
+                b"escrow",
+                bet.seed.as_bytes(),
+                &[settlement.escrow_bump],
+            ];
+            let escrow_key = Pubkey::create_program_address(signer_seeds, ctx.program_id)
+                .map_err(|_| error!(BetError::InvalidSettlementAccounts))?;
+            require_keys_eq!(escrow_key, escrow_info.key(), BetError::InvalidSettlementAccounts);
+
+            let winner_token: Account<'info, TokenAccount> = Account::try_from(winner_info)?;
+            require_keys_eq!(winner_token.owner, settlement.winner, BetError::InvalidWinner);
+
+            let transfer_ctx = CpiContext::new_with_signer(
+                ctx.accounts.token_program.to_account_info(),
+                Transfer {
+                    from: escrow_info.clone(),
+                    to: winner_info.clone(),
+                    authority: escrow_info.clone(),
+                },
+                &[signer_seeds],
+            );
+            token::transfer(transfer_ctx, bet.amount * 2)?;
+
+            bet.state = BetState::Completed;
+            bet.winner = Some(settlement.winner);
+            // Remaining accounts aren't written back automatically
+            bet.exit(ctx.program_id)?;
+        }
+
+        Ok(())
+    }
+
+    /// Refund the creators of bets nobody joined before their deadline.
+    /// `remaining_accounts` holds one (bet, escrow_token, creator_token)
+    /// triple per bet, in the same order as `escrow_bumps`.
+    pub fn cancel_bets<'info>(
+        ctx: Context<'_, '_, 'info, 'info, CancelBets<'info>>,
+        escrow_bumps: Vec<u8>,
+    ) -> Result<()> {
+        require!(
+            ctx.remaining_accounts.len() == escrow_bumps.len() * 3,
+            BetError::InvalidSettlementAccounts
+        );
+        let now = Clock::get()?.unix_timestamp;
+
+        for (escrow_bump, accounts) in escrow_bumps.iter().zip(ctx.remaining_accounts.chunks(3)) {
+            let escrow_info = &accounts[1];
+            let creator_info = &accounts[2];
+
+            let mut bet: Account<'info, Bet> = Account::try_from(&accounts[0])?;
+            require!(bet.state == BetState::Created, BetError::InvalidBetState);
+            require!(now >= bet.deadline, BetError::DeadlineNotReached);
+
+            let signer_seeds: &[&[u8]] = &[
+                b"escrow",
+                bet.seed.as_bytes(),
+                &[*escrow_bump],
+            ];
+            let escrow_key = Pubkey::create_program_address(signer_seeds, ctx.program_id)
+                .map_err(|_| error!(BetError::InvalidSettlementAccounts))?;
+            require_keys_eq!(escrow_key, escrow_info.key(), BetError::InvalidSettlementAccounts);
+
+            let creator_token: Account<'info, TokenAccount> = Account::try_from(creator_info)?;
+            require_keys_eq!(creator_token.owner, bet.creator, BetError::InvalidSettlementAccounts);
+
+            let transfer_ctx = CpiContext::new_with_signer(
+                ctx.accounts.token_program.to_account_info(),
+                Transfer {
+                    from: escrow_info.clone(),
+                    to: creator_info.clone(),
+                    authority: escrow_info.clone(),
+                },
+                &[signer_seeds],
+            );
+            token::transfer(transfer_ctx, bet.amount)?;
+
+            bet.state = BetState::Cancelled;
+            bet.exit(ctx.program_id)?;
+        }
+
+        Ok(())
+    }
 }
 
 #[derive(Accounts)]
@@ -156,8 +302,28 @@ pub struct JoinBet<'info> {
     pub token_program: Program<'info, Token>,
 }
 
+#[derive(Accounts)]
+pub struct UnjoinBet<'info> {
+    #[account(address = SETTLER @ BetError::Unauthorized)]
+    pub settler: Signer<'info>,
+
+    #[account(mut)]
+    pub bet: Account<'info, Bet>,
+
+    #[account(mut, seeds = [b"escrow", bet.seed.as_bytes()], bump)]
+    pub escrow_token: Account<'info, TokenAccount>,
+
+    #[account(mut)]
+    pub joiner_token: Account<'info, TokenAccount>,
+
+    pub token_program: Program<'info, Token>,
+}
+
 #[derive(Accounts)]
 pub struct SettleBet<'info> {
+    #[account(address = SETTLER @ BetError::Unauthorized)]
+    pub settler: Signer<'info>,
+
     #[account(mut)]
     pub bet: Account<'info, Bet>,
     
@@ -170,6 +336,26 @@ pub struct SettleBet<'info> {
     pub token_program: Program<'info, Token>,
 }
 
+#[derive(Accounts)]
+pub struct SettleBets<'info> {
+    #[account(address = SETTLER @ BetError::Unauthorized)]
+    pub settler: Signer<'info>,
+    pub token_program: Program<'info, Token>,
+}
+
+#[derive(Accounts)]
+pub struct CancelBets<'info> {
+    #[account(address = SETTLER @ BetError::Unauthorized)]
+    pub settler: Signer<'info>,
+    pub token_program: Program<'info, Token>,
+}
+
+#[derive(AnchorSerialize, AnchorDeserialize, Clone)]
+pub struct BatchSettlement {
+    pub winner: Pubkey,
+    pub escrow_bump: u8,
+}
+
 #[account]
 pub struct Bet {
     pub creator: Pubkey,
@@ -177,6 +363,7 @@ pub struct Bet {
     pub winner: Option<Pubkey>,
     pub amount: u64,
     pub state: BetState,
+    pub deadline: i64,
     pub seed: String,
 }
 
@@ -188,6 +375,7 @@ impl Bet {
         33 + // winner (Option)
         8 +  // amount
         1 +  // state
+        8 +  // deadline (unix seconds)
         36   // seed (String)
     }
 }
@@ -197,6 +385,7 @@ pub enum BetState {
     Created,
     Active,
     Completed,
+    Cancelled,
 }
 
 #[error_code]
@@ -207,4 +396,14 @@ pub enum BetError {
     AmountMismatch,
     #[msg("Winner must be either creator or joiner")]
     InvalidWinner,
+    #[msg("Settlement accounts don't match the bets being settled")]
+    InvalidSettlementAccounts,
+    #[msg("Only the configured settler can settle or cancel bets")]
+    Unauthorized,
+    #[msg("Deadline must be in the future")]
+    InvalidDeadline,
+    #[msg("Bet can no longer be joined")]
+    BetExpired,
+    #[msg("Bet can't be cancelled before its deadline")]
+    DeadlineNotReached,
 } 
\ No newline at end of file
@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+from app.services.expiry_scheduler import ExpiryScheduler
+
+
+async def ignore(bet_ids):
+    pass
+
+
+def test_pop_due_returns_deadlines_in_order_and_skips_stale_entries():
+    scheduler = ExpiryScheduler(ignore)
+    for bet_id, deadline in [(1, 30.0), (2, 10.0), (3, 20.0), (4, 40.0)]:
+        scheduler.schedule(bet_id, deadline)
+    scheduler.schedule(3, 50.0)  # Rescheduled; the old entry is stale
+    scheduler.cancel(2)
+
+    assert scheduler.pop_due(35.0) == [1]
+    assert scheduler.pop_due(45.0) == [4]
+    assert scheduler.pop_due(100.0) == [3]
+    assert len(scheduler) == 0
+
+
+def test_heap_is_rebuilt_once_stale_entries_dominate():
+    scheduler = ExpiryScheduler(ignore)
+    for bet_id in range(3000):
+        scheduler.schedule(bet_id, float(bet_id))
+    for bet_id in range(2000):
+        scheduler.cancel(bet_id)
+
+    assert scheduler.stats()["heap_entries"] <= 2 * len(scheduler)
+    assert scheduler.pop_due(2500.0) == list(range(2000, 2501))
+
+
+def test_deadlines_in_one_window_fire_together():
+    fired = []
+
+    async def on_expire(bet_ids):
+        fired.append(sorted(bet_ids))
+
+    async def run():
+        scheduler = ExpiryScheduler(on_expire, resolution_ms=100)
+        await scheduler.start()
+        now = time.time()
+        for bet_id in range(50):
+            scheduler.schedule(bet_id, now + 0.05 + bet_id / 1000)
+        scheduler.schedule(99, now + 10)
+        await asyncio.sleep(0.4)
+        await scheduler.stop()
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert fired == [list(range(50))]
+    assert scheduler.stats()["wakeups"] == 1
+    assert len(scheduler) == 1
+
+
+def test_failed_expiry_is_retried():
+    calls = []
+
+    async def on_expire(bet_ids):
+        calls.append(list(bet_ids))
+        if len(calls) == 1:
+            raise RuntimeError("DB down")
+
+    async def run():
+        scheduler = ExpiryScheduler(on_expire, resolution_ms=10, retry_seconds=0.05)
+        await scheduler.start()
+        scheduler.schedule(7, time.time())
+        await asyncio.sleep(0.3)
+        await scheduler.stop()
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert calls == [[7], [7]]
+    assert scheduler.stats()["failures"] == 1
+    assert scheduler.stats()["expired"] == 1
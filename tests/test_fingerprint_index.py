@@ -0,0 +1,52 @@
+import asyncio
+import io
+import os
+
+from PIL import Image, ImageDraw
+
+from app.services.fingerprint_index import FingerprintIndex, ScreenshotReuseDetector
+
+
+def scoreboard(seed: int, quality: int = 90) -> bytes:
+    image = Image.new("RGB", (320, 180), (20, 20, 20))
+    draw = ImageDraw.Draw(image)
+    for row in range(8):
+        width = 40 + (seed * 37 + row * 53) % 220
+        draw.rectangle((20, 15 + row * 20, 20 + width, 27 + row * 20), fill=(230, 230, 230))
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=quality)
+    return output.getvalue()
+
+
+def test_concurrent_workers_add_a_screen_once(tmp_path):
+    # Two workers sharing a directory check the same screen for different bets
+    detectors = [ScreenshotReuseDetector(FingerprintIndex(str(tmp_path))) for _ in range(2)]
+
+    async def check_all():
+        # Re-encoded copies of one scoreboard, submitted for eight bets at once
+        checks = [
+            detectors[bet_id % 2].check(scoreboard(1, quality=95 - bet_id * 5), bet_id, user_id=bet_id)
+            for bet_id in range(1, 9)
+        ]
+        return await asyncio.gather(*checks)
+
+    results = asyncio.run(check_all())
+    # Only the first check saw nothing; every later one saw the earlier bets
+    assert sorted(len(reused) for reused, _ in results) == list(range(8))
+    # Every copy is keyed on the first one
+    assert len({key for _, key in results}) == 1
+    assert len(detectors[0].index) == 8
+
+
+def test_compaction_keeps_the_previous_generation(tmp_path):
+    index = FingerprintIndex(str(tmp_path))
+    generations = []
+    for seed in range(3):
+        index.add(seed * 0x1234567 << 128, bet_id=seed, user_id=seed)
+        index.compact()
+        generations.append(sorted(name for name in os.listdir(tmp_path) if name.endswith(".npy")))
+
+    assert generations[0] == ["ids-1.npy", "keys-1.npy"]
+    assert generations[1] == ["ids-1.npy", "ids-2.npy", "keys-1.npy", "keys-2.npy"]
+    assert generations[2] == ["ids-2.npy", "ids-3.npy", "keys-2.npy", "keys-3.npy"]
+    assert [match["bet_id"] for match in index.query(0x1234567 << 128, 0)] == [1]
@@ -0,0 +1,94 @@
+import asyncio
+import random
+import time
+
+import pytest
+
+from app.services.bet_repository import BetJoinRejected
+from app.services.join_reservations import JoinReservations
+
+
+async def join(reservations, joined, bet_id, user_id, capacity, transfer_seconds, rng):
+    try:
+        await reservations.reserve(bet_id, user_id, [], capacity)
+    except BetJoinRejected:
+        return
+    async with reservations.hold(bet_id, user_id):
+        await asyncio.sleep(transfer_seconds)
+    if rng.random() < 0.2:
+        # Failed transfer
+        await reservations.release(bet_id, user_id)
+        return
+    if await reservations.confirm(bet_id, user_id):
+        joined.setdefault(bet_id, set()).add(user_id)
+
+
+async def stress(num_bets, joiners_per_bet, capacity, transfer_seconds=0.02):
+    reservations = JoinReservations(ttl_seconds=30)
+    rng = random.Random(num_bets)
+    joined = {}
+    joiners = [
+        (bet_id, bet_id * 100_000 + joiner)
+        for bet_id in range(num_bets)
+        for joiner in range(joiners_per_bet)
+    ]
+    rng.shuffle(joiners)
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        join(reservations, joined, bet_id, user_id, capacity, transfer_seconds, rng)
+        for bet_id, user_id in joiners
+    ))
+    return joined, time.perf_counter() - start
+
+
+def test_concurrent_joins_never_overbook():
+    joined, _ = asyncio.run(stress(num_bets=200, joiners_per_bet=25, capacity=8))
+    assert joined
+    assert max(len(users) for users in joined.values()) <= 8
+
+
+def test_joins_on_different_bets_run_in_parallel():
+    # 5000 joins with a 20 ms transfer each would take 100 s serialized;
+    # in parallel the slowest bet needs a few transfers at most
+    _, elapsed = asyncio.run(stress(num_bets=1000, joiners_per_bet=5, capacity=4))
+    assert elapsed < 2.0
+
+
+def test_released_slot_can_be_taken_again():
+    async def run():
+        reservations = JoinReservations()
+        await reservations.reserve(1, 10, [1], 2)
+        with pytest.raises(BetJoinRejected):
+            await reservations.reserve(1, 11, [1], 2)
+        await reservations.release(1, 10)
+        await reservations.reserve(1, 11, [1], 2)
+        assert await reservations.confirm(1, 11)
+
+    asyncio.run(run())
+
+
+def test_expired_reservation_is_not_confirmed():
+    async def run():
+        reservations = JoinReservations(ttl_seconds=0.05)
+        await reservations.reserve(1, 10, [1], 2)
+        await asyncio.sleep(0.1)
+        # The lapsed slot goes to the next joiner, and the first can't confirm
+        await reservations.reserve(1, 11, [1], 2)
+        assert not await reservations.confirm(1, 10)
+        assert await reservations.confirm(1, 11)
+        assert reservations.stats()["expired"] == 1
+
+    asyncio.run(run())
+
+
+def test_hold_keeps_a_slow_transfer_reserved():
+    async def run():
+        reservations = JoinReservations(ttl_seconds=0.1)
+        await reservations.reserve(1, 10, [1], 2)
+        async with reservations.hold(1, 10):
+            await asyncio.sleep(0.3)
+        with pytest.raises(BetJoinRejected):
+            await reservations.reserve(1, 11, [1], 2)
+        assert await reservations.confirm(1, 10)
+
+    asyncio.run(run())
@@ -0,0 +1,204 @@
+import asyncio
+import io
+import json
+
+from aiohttp import web
+from openai import AsyncOpenAI
+from PIL import Image
+
+from app.services.image_preprocessing import ImagePreprocessor
+from app.services.llm_ocr_service import LLMOCRService
+from app.services.ocr_batcher import OCRRequestCoalescer
+from app.services.ocr_cache import OCRResultCache, image_digest
+
+
+class FakeOpenAI:
+    """
+    Local chat completions endpoint. The i-th image of a request is read as
+    i + 1 kills, so results can be matched back to images; the first
+    bad_replies requests get a reply that isn't JSON.
+    """
+
+    def __init__(self, latency: float = 0.05, bad_replies: int = 0):
+        self.latency = latency
+        self.bad_replies = bad_replies
+        # Images attached to each request, in arrival order
+        self.requests = []
+
+    async def handle(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        images = sum(
+            1 for message in body["messages"] if isinstance(message["content"], list)
+            for part in message["content"] if part["type"] == "image_url"
+        )
+        self.requests.append(images)
+        await asyncio.sleep(self.latency)
+
+        if len(self.requests) <= self.bad_replies:
+            content = "Sorry, I can't read these screens."
+        else:
+            results = [self.stats(index + 1) for index in range(images)]
+            content = json.dumps(results[0] if images == 1 else {"results": results})
+        return web.json_response({
+            "id": f"chatcmpl-{len(self.requests)}",
+            "object": "chat.completion",
+            "created": 0,
+            "model": body["model"],
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150},
+        })
+
+    @staticmethod
+    def stats(kills: int) -> dict:
+        return {
+            "team_scores": {"Allies": 75, "Axis": 60},
+            "player_stats": {"kills": kills, "deaths": 5, "assists": 2},
+            "game_info": {"mode": "Domination", "map": "Rust"},
+        }
+
+
+def screenshot(shade: int) -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", (32, 18), (shade, shade, shade)).save(output, format="PNG")
+    return output.getvalue()
+
+
+class MisreadingLocalOCR:
+    """
+    Local tier that recognizes every screen but misses required fields.
+    """
+
+    async def extract(self, image_bytes: bytes) -> dict:
+        return {"player_stats": {"kills": 99}}
+
+    def shutdown(self) -> None:
+        pass
+
+
+async def with_coalescer(fake: FakeOpenAI, test, local_ocr=None, **options) -> None:
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", fake.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+
+    service = LLMOCRService(
+        api_key="test",
+        cache=OCRResultCache(),
+        preprocessor=ImagePreprocessor(enabled=False),
+    )
+    service.local_ocr = local_ocr
+    service.client = AsyncOpenAI(api_key="test", base_url=f"http://127.0.0.1:{port}/v1", max_retries=0)
+    try:
+        await test(OCRRequestCoalescer(service, **options))
+    finally:
+        await service.close()
+        await runner.cleanup()
+
+
+def test_identical_screenshots_share_one_call():
+    fake = FakeOpenAI()
+
+    async def test(coalescer):
+        image = screenshot(10)
+        results = await asyncio.gather(*(coalescer.process_image(image) for _ in range(5)))
+        assert fake.requests == [1]
+        assert all(result == results[0] for result in results)
+        assert results[0]["player_stats"]["kills"] == 1
+        assert coalescer.stats()["coalesced"] == 4
+
+    asyncio.run(with_coalescer(fake, test))
+
+
+def test_distinct_screenshots_are_batched_and_split_in_order():
+    fake = FakeOpenAI()
+
+    async def test(coalescer):
+        images = [screenshot(shade) for shade in (10, 20, 30)]
+        results = await asyncio.gather(*(coalescer.process_image(image) for image in images))
+        assert fake.requests == [3]
+        assert [result["player_stats"]["kills"] for result in results] == [1, 2, 3]
+        # Later requests for the same screens come from the cache
+        assert await coalescer.process_image(images[1]) == results[1]
+        assert fake.requests == [3]
+
+    asyncio.run(with_coalescer(fake, test, batch_window_ms=50, max_batch_size=4))
+
+
+def test_full_batch_is_sent_without_waiting_for_the_window():
+    fake = FakeOpenAI()
+
+    async def test(coalescer):
+        images = [screenshot(shade) for shade in (10, 20)]
+        await asyncio.wait_for(asyncio.gather(*(coalescer.process_image(image) for image in images)), 1.0)
+        assert fake.requests == [2]
+
+    asyncio.run(with_coalescer(fake, test, batch_window_ms=10_000, max_batch_size=2))
+
+
+def test_failed_batch_is_retried_once_as_a_batch():
+    fake = FakeOpenAI(bad_replies=1)
+
+    async def test(coalescer):
+        images = [screenshot(shade) for shade in (10, 20, 30)]
+        results = await asyncio.gather(*(coalescer.process_image(image) for image in images))
+        # Never split into per-image calls
+        assert fake.requests == [3, 3]
+        assert [result["player_stats"]["kills"] for result in results] == [1, 2, 3]
+        assert coalescer.stats()["batch_retries"] == 1
+
+    asyncio.run(with_coalescer(fake, test))
+
+
+def test_batch_that_fails_twice_returns_none_for_every_image():
+    fake = FakeOpenAI(bad_replies=2)
+
+    async def test(coalescer):
+        images = [screenshot(shade) for shade in (10, 20)]
+        results = await asyncio.gather(*(coalescer.process_image(image) for image in images))
+        assert fake.requests == [2, 2]
+        assert results == [None, None]
+        assert coalescer.stats()["failed_batches"] == 1
+        # Nothing was cached, so the next attempt calls the model again
+        assert (await coalescer.process_image(images[0]))["player_stats"]["kills"] == 1
+
+    asyncio.run(with_coalescer(fake, test))
+
+
+def test_batch_results_are_cached_under_the_request_digests():
+    fake = FakeOpenAI()
+
+    async def test(coalescer):
+        cache = coalescer.llm_service.cache
+        stored = []
+        original_set = cache.set
+
+        async def recording_set(image_bytes, stats, digest=None):
+            stored.append(digest)
+            await original_set(image_bytes, stats, digest)
+
+        cache.set = recording_set
+        images = [screenshot(shade) for shade in (10, 20)]
+        await asyncio.gather(*(coalescer.process_image(image) for image in images))
+        assert sorted(stored) == sorted(image_digest(image) for image in images)
+
+    asyncio.run(with_coalescer(fake, test))
+
+
+def test_local_misread_is_escalated_and_not_cached():
+    fake = FakeOpenAI()
+
+    async def test(coalescer):
+        image = screenshot(10)
+        result = await coalescer.process_image(image)
+        assert fake.requests == [1]
+        assert result["player_stats"]["kills"] == 1
+        assert await coalescer.llm_service.cache.get(image) == result
+
+    asyncio.run(with_coalescer(fake, test, local_ocr=MisreadingLocalOCR()))
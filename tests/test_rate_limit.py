@@ -0,0 +1,49 @@
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from app.services.rate_limit import RateLimitMiddleware, UserRateLimiter
+
+
+def make_client(burst: int = 2):
+    app = FastAPI()
+    limiter = UserRateLimiter(per_minute=1, burst=burst)
+    app.add_middleware(RateLimitMiddleware, limiter=limiter)
+    app.state.reads = 0
+
+    @app.post("/bets/verify")
+    async def verify(screenshot: UploadFile = File(...)):
+        app.state.reads += 1
+        return {}
+
+    @app.get("/bets/verify/{job_id}")
+    async def get_verification(job_id: str):
+        return {"id": job_id}
+
+    return app, TestClient(app)
+
+
+def upload(client, user_id=None):
+    headers = {"X-User-Id": str(user_id)} if user_id is not None else {}
+    return client.post("/bets/verify", files={"screenshot": ("a.png", b"x" * 100, "image/png")}, headers=headers)
+
+
+def test_storm_is_refused_before_the_body_is_read():
+    app, client = make_client()
+    assert [upload(client, 1).status_code for _ in range(4)] == [200, 200, 429, 429]
+    assert app.state.reads == 2
+
+    response = upload(client, 1)
+    assert response.headers["retry-after"] == "60"
+    # Another user has their own bucket
+    assert upload(client, 2).status_code == 200
+
+
+def test_requests_without_a_user_share_the_client_bucket():
+    app, client = make_client(burst=1)
+    assert [upload(client).status_code for _ in range(2)] == [200, 429]
+    assert upload(client, 1).status_code == 200
+
+
+def test_reads_are_not_limited():
+    app, client = make_client(burst=1)
+    assert [client.get("/bets/verify/abc").status_code for _ in range(3)] == [200, 200, 200]
@@ -0,0 +1,61 @@
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from app.services.screenshot_upload import UploadSizeLimitMiddleware, read_screenshot
+
+
+def make_client(max_bytes: int = 1024):
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimitMiddleware, max_bytes=max_bytes)
+    app.state.reads = 0
+
+    @app.post("/bets/verify")
+    async def verify(screenshot: UploadFile = File(...)):
+        upload = await read_screenshot(screenshot, max_bytes=max_bytes)
+        app.state.reads += 1
+        return {"size": upload.size}
+
+    @app.get("/bets/verify/{job_id}")
+    async def get_verification(job_id: str):
+        return {"id": job_id}
+
+    return app, TestClient(app)
+
+
+def test_upload_within_the_limit_is_read():
+    app, client = make_client()
+    response = client.post("/bets/verify", files={"screenshot": ("a.png", b"x" * 1000, "image/png")})
+    assert response.status_code == 200
+    assert response.json() == {"size": 1000}
+
+
+def test_content_length_over_the_limit_is_rejected_up_front():
+    app, client = make_client()
+    response = client.post("/bets/verify", files={"screenshot": ("a.png", b"x" * 200_000, "image/png")})
+    assert response.status_code == 413
+    assert app.state.reads == 0
+
+
+def test_chunked_upload_is_cut_off_with_a_413():
+    app, client = make_client()
+    body = b"x" * 70_000
+
+    def chunks():
+        for start in range(0, len(body), 8192):
+            yield body[start:start + 8192]
+
+    response = client.post(
+        "/bets/verify",
+        content=chunks(),
+        headers={"content-type": "multipart/form-data; boundary=b"},
+    )
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Screenshot too large"}
+    assert app.state.reads == 0
+
+
+def test_other_methods_under_the_prefix_pass_through():
+    app, client = make_client()
+    response = client.request("GET", "/bets/verify/abc", content=b"x" * 200_000)
+    assert response.status_code == 200
+    assert response.json() == {"id": "abc"}
@@ -0,0 +1,105 @@
+import asyncio
+
+from app.schemas.bet_schemas import VerificationJobStatus
+from app.services.verification_queue import (
+    InMemoryJobBackend, VerificationQueue, VerificationRejected
+)
+
+
+async def run_job(queue, payload, timeout=5.0):
+    await queue.start()
+    try:
+        job_id = await queue.enqueue(payload)
+        return await queue.wait(job_id, timeout)
+    finally:
+        await queue.stop()
+
+
+def test_failed_stage_is_retried_without_rerunning_completed_stages():
+    calls = {"ocr": 0, "settle": 0}
+
+    async def ocr(context):
+        calls["ocr"] += 1
+        context["match_stats"] = {"kills": 12}
+
+    async def settle(context):
+        calls["settle"] += 1
+        if calls["settle"] == 1:
+            raise RuntimeError("RPC timeout")
+        context["result"] = {"kills": context["match_stats"]["kills"]}
+
+    queue = VerificationQueue([("ocr", ocr), ("settle", settle)], retry_backoff_seconds=0.01)
+    job = asyncio.run(run_job(queue, {"bet_id": 1}))
+
+    assert job["status"] == VerificationJobStatus.SUCCEEDED
+    assert job["attempts"] == 2
+    assert calls == {"ocr": 1, "settle": 2}
+    assert job["result"] == {"kills": 12}
+
+
+def test_rejected_job_fails_without_retrying():
+    calls = []
+
+    async def conditions(context):
+        calls.append(context["job_id"])
+        raise VerificationRejected("Bet conditions not met")
+
+    queue = VerificationQueue([("conditions", conditions)], retry_backoff_seconds=0.01)
+    job = asyncio.run(run_job(queue, {"bet_id": 1}))
+
+    assert job["status"] == VerificationJobStatus.FAILED
+    assert job["error"] == "Bet conditions not met"
+    assert len(calls) == 1
+
+
+def test_exhausted_job_is_dead_lettered_with_its_screenshot():
+    async def ocr(context):
+        raise RuntimeError("upstream down")
+
+    async def run():
+        queue = VerificationQueue([("ocr", ocr)], max_attempts=3, retry_backoff_seconds=0.01)
+        job = await run_job(queue, {"image": b"png"})
+        return job, await queue.dead_letters()
+
+    job, dead_letters = asyncio.run(run())
+    assert job["status"] == VerificationJobStatus.DEAD_LETTERED
+    assert job["attempts"] == 3
+    assert dead_letters == [job["id"]]
+    # Kept so the job can be replayed
+    assert job["payload"]["image"] == b"png"
+
+
+def test_stop_cancels_pending_retries():
+    async def ocr(context):
+        raise RuntimeError("upstream down")
+
+    async def run():
+        backend = InMemoryJobBackend()
+        queue = VerificationQueue([("ocr", ocr)], backend=backend, retry_backoff_seconds=60)
+        await queue.start()
+        job_id = await queue.enqueue({})
+        await asyncio.sleep(0.1)
+        assert len(backend._delayed) == 1
+        await queue.stop()
+        return backend, await queue.get(job_id)
+
+    backend, job = asyncio.run(run())
+    assert not backend._delayed
+    assert job["status"] == VerificationJobStatus.RETRYING
+
+
+def test_memory_backend_evicts_the_oldest_finished_jobs():
+    async def ocr(context):
+        pass
+
+    async def run():
+        queue = VerificationQueue([("ocr", ocr)], backend=InMemoryJobBackend(max_finished_jobs=2))
+        await queue.start()
+        job_ids = []
+        for _ in range(4):
+            job_ids.append(await queue.enqueue({}))
+            await queue.wait(job_ids[-1], 5)
+        await queue.stop()
+        return [await queue.get(job_id) is not None for job_id in job_ids]
+
+    assert asyncio.run(run()) == [False, False, True, True]